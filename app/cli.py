@@ -0,0 +1,174 @@
+"""
+Modo em lote (sem interface): planeja todos os comandos SQL de arquivos ou da
+entrada padrão e escreve um objeto JSON por consulta (JSON Lines) com a
+álgebra relacional, a álgebra otimizada, o plano de execução, a estimativa
+de linhas/custo e o tempo de cada etapa.
+
+Os comandos são lidos em fluxo (separados por ';'), as consultas idênticas
+depois da normalização são planejadas uma única vez e o trabalho é
+distribuído em blocos entre processos (ProcessPoolExecutor). Nada de
+streamlit/matplotlib é importado.
+
+Uso (a partir de app/):
+    python cli.py consultas.sql [outros.sql ...] [-o planos.jsonl] [--workers N]
+    cat log.sql | python cli.py - > planos.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from utils.plan_cache import normalize_sql
+from utils.profiling import collect
+
+DEFAULT_CHUNK_SIZE = 256
+
+
+def iter_statements(stream):
+    """Comandos SQL de um arquivo texto, separados por ';' fora de strings."""
+    buffer, quote = [], None
+    for line in stream:
+        start = 0
+        for i, char in enumerate(line):
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in ("'", '"'):
+                quote = char
+            elif char == ';':
+                buffer.append(line[start:i])
+                statement = ''.join(buffer).strip()
+                if statement:
+                    yield statement
+                buffer, start = [], i + 1
+        buffer.append(line[start:])
+    statement = ''.join(buffer).strip()
+    if statement:
+        yield statement
+
+
+def iter_sources(paths):
+    """(origem, comando) de cada arquivo, na ordem; '-' é a entrada padrão."""
+    for path in paths:
+        if path == '-':
+            for n, statement in enumerate(iter_statements(sys.stdin), 1):
+                yield f"<stdin>:{n}", statement
+            continue
+        with open(path, encoding='utf-8') as f:
+            for n, statement in enumerate(iter_statements(f), 1):
+                yield f"{path}:{n}", statement
+
+
+def plan_record(sql: str) -> dict:
+    """Planeja uma consulta e devolve o registro JSON (executado nos processos filhos)."""
+    from utils.planner import build_plan
+    from utils.join_order import estimate
+
+    timings = {}
+    plan = build_plan(sql, with_graph=False, timings=timings)
+    record = {'valid': plan.is_valid}
+    if plan.is_valid:
+        with collect(timings):
+            rows, cost = estimate(plan.optimized)
+        record.update({
+            'algebra': str(plan.algebra),
+            'optimized': str(plan.optimized),
+            'execution_plan': plan.execution_plan,
+            'estimated_rows': round(rows, 2),
+            'estimated_cost': round(cost, 2),
+        })
+    else:
+        record['errors'] = [{'message': e.message, 'pos': e.pos} for e in plan.errors]
+    record['timings_ms'] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+    return record
+
+
+def plan_chunk(chunk):
+    """Bloco de (id, origem, sql) -> registros, na mesma ordem."""
+    return [
+        {'id': query_id, 'source': source, 'sql': sql, **plan_record(sql)}
+        for query_id, source, sql in chunk
+    ]
+
+
+def iter_chunks(statements, chunk_size: int, summary: dict):
+    """
+    Blocos de consultas únicas: a primeira ocorrência de cada forma
+    normalizada (utils.plan_cache.normalize_sql) recebe um id sequencial.
+    """
+    seen = set()
+    chunk = []
+    for source, sql in statements:
+        summary['statements'] += 1
+        normalized = normalize_sql(sql)
+        if normalized in seen:
+            summary['duplicates'] += 1
+            continue
+        seen.add(normalized)
+        chunk.append((len(seen), source, sql))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(statements, out, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Planeja os comandos e escreve os registros em `out`, na ordem de entrada."""
+    summary = {'statements': 0, 'duplicates': 0, 'planned': 0, 'invalid': 0}
+
+    def write(records):
+        for record in records:
+            summary['planned'] += 1
+            summary['invalid'] += not record['valid']
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    chunks = iter_chunks(statements, chunk_size, summary)
+    if workers <= 1:
+        for chunk in chunks:
+            write(plan_chunk(chunk))
+        return summary
+
+    # No máximo 2 blocos por processo em andamento: a entrada é lida em fluxo
+    # e a memória não cresce com o tamanho do log
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(plan_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help="arquivos .sql ('-' para a entrada padrão)")
+    parser.add_argument('-o', '--output', help='arquivo JSON Lines de saída (padrão: saída padrão)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processos de planejamento (1 = no próprio processo)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='consultas por bloco enviado a um processo')
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error('--chunk-size deve ser maior que zero')
+
+    start = time.perf_counter()
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        summary = run(iter_sources(args.files), out, args.workers, args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{summary['statements']} comando(s), {summary['duplicates']} duplicado(s), "
+          f"{summary['planned']} planejado(s), {summary['invalid']} inválido(s) "
+          f"em {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return 1 if summary['invalid'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
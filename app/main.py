@@ -1,13 +1,33 @@
+import json
+import os
+import uuid
 import streamlit as st
-import matplotlib.pyplot as plt
-from models.query.parser import QueryParser
-from models.query.manager import QueryManager
-from utils.graphs import Graph
-from utils.algebra import sql_to_algebra, optimize_algebra
+from dataclasses import asdict
+from utils.plan_cache import PLAN_CACHE
+from utils.graphs import render_graph, available_backends
+from utils.profiling import METRICS, collect, serve_metrics
+from utils.service import SERVICE, QueryCancelled, ServiceBusy
+from utils.result_cache import RESULT_CACHE
 
 st.set_page_config('Trabalho Consultas', page_icon='👨‍💻', layout='wide')
 st.title('Envio e Otimização de Consultas')
 
+# Quantidade máxima de linhas mantidas na tabela exibida durante o streaming
+DISPLAY_ROWS = 1000
+
+if os.environ.get('QUERY_METRICS_PORT'):
+    serve_metrics(int(os.environ['QUERY_METRICS_PORT']))
+
+# Identifica a sessão no serviço: reenviar uma consulta cancela a anterior desta sessão
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+with st.sidebar:
+    streaming = st.checkbox('Execução em streaming (memória limitada)', value=True)
+    graph_backend = st.selectbox('Desenho do grafo de operadores', available_backends())
+    profile_cpu = st.checkbox('Perfil de CPU por consulta (cProfile)')
+    profile_memory = st.checkbox('Perfil de memória por consulta (tracemalloc)')
+
 with st.form('Formulário de Envio de consultas'):
     # A string com a consulta SQL é entrada na interface gráfica 
     user_query = st.text_area(
@@ -19,31 +39,108 @@ if submit:
         st.warning('Requisição vazia não pode ser realizada', icon='❗')
         st.stop()
     
-    # A string é parseada e o comando SQL é validado além de validar se as tabelas existem e se 
-    # os campos informados no select existem nas tabelas 
-    parsed_query = QueryParser.parse_sql(user_query) 
-    manager = QueryManager()
-    
-    if manager.is_query_valid(parsed_query):
-        st.write(parsed_query)
-        # O comando SQL é convertido para álgebra relacional 
-        relational_query = sql_to_algebra(parsed_query)
-        # Mostrar na Interface a conversão do SQL para álgebra relacional 
-        st.write('### _Álgebra Relacional_')
-        st.write(relational_query)
-        
-        optimized_query = optimize_algebra(relational_query)
+    # A consulta é entregue ao serviço compartilhado pelas sessões (utils.service): um pool
+    # limitado de workers planeja e executa, consultas idênticas em andamento são feitas uma
+    # vez só e consultas repetidas reaproveitam o plano completo do cache (PLAN_CACHE).
+    # Todas as etapas são medidas; cProfile e tracemalloc só quando ligados na barra lateral
+    try:
+        job = SERVICE.submit(user_query, session=st.session_state.session_id, streaming=streaming,
+                             max_rows=DISPLAY_ROWS, cpu=profile_cpu, memory=profile_memory)
+    except ServiceBusy as error:
+        st.warning(f'{error}. Tente novamente em instantes.', icon='❗')
+        st.stop()
+    # Em streaming, os lotes chegam à tabela conforme o pipeline os produz
+    status, table = st.empty(), st.empty()
+    shown = 0
+    while not job.wait(0.1):
+        if len(job.batches) > shown:
+            # Executor já carregado pelo worker que produziu os lotes
+            from utils.executor import concat_relations
+            shown = len(job.batches)
+            table.dataframe(concat_relations(job.batches[:shown]).to_pandas())
+        status.write(f'_Consulta {"na fila" if job.state == "queued" else "em execução"}: '
+                     f'{job.rows} linha(s) produzidas..._')
+    status.empty()
+    table.empty()
+    try:
+        result = job.result()
+    except QueryCancelled:
+        st.info('Consulta cancelada por um novo envio desta sessão.')
+        st.stop()
+    except FileNotFoundError as error:
+        st.warning(str(error), icon='❗')
+        st.stop()
+    plan, profile = result.plan, result.profile
+
+    # Desenho do grafo medido junto com as etapas do serviço
+    with collect(profile.stages):
+        if plan.is_valid:
+            st.write(plan.parsed)
+            # O comando SQL é convertido para álgebra relacional 
+            # Mostrar na Interface a conversão do SQL para álgebra relacional 
+            st.write('### _Álgebra Relacional_')
+            st.write(str(plan.algebra))
         
-        # TODO A álgebra relacional é otimizada conforme as heurísticas solicitadas (ver item 5) 
-        st.write('### _Álgebra Relacional - Otimizada_')
-        st.write(optimized_query)
+            # A álgebra relacional é otimizada (junções ordenadas por custo, seleções e projeções empurradas)
+            st.write('### _Álgebra Relacional - Otimizada_')
+            st.write(str(plan.optimized))
         
-        # TODO O grafo de operadores é construído em memória 
-        graph = Graph().build_operator_graph(parsed_query)
-        # TODO O grafo de operadores deve ser mostrado na Interface gráfica 
-        st.write('### _Gráfico de Operadores_')    
-        st.write(graph)
-        # TODO O resultado da consulta mostrando cada operação e a ordem que será executada, é exibido 
-        # na interface gráfica (plano de execução) 
-        st.write('### _Plano de Execução_')
-        
\ No newline at end of file
+            st.write('### _Gráfico de Operadores_')
+            # Grafo construído a partir do plano otimizado; desenhos em cache por plano (utils.graphs.render_graph)
+            if graph_backend == 'graphviz':
+                st.graphviz_chart(render_graph(plan.optimized, 'dot'))
+            elif graph_backend == 'plotly':
+                st.plotly_chart(render_graph(plan.optimized, 'plotly'))
+            else:
+                st.image(render_graph(plan.optimized, 'png'))
+                st.download_button('Baixar SVG', render_graph(plan.optimized, 'svg'),
+                                   file_name='grafo.svg', mime='image/svg+xml')
+            # Cada operação, na ordem em que será executada (plano de execução)
+            st.write('### _Plano de Execução_')
+            for step in plan.execution_plan:
+                st.write(step)
+
+            # O plano otimizado é executado sobre os dados locais (app/data ou $QUERY_DATA_DIR);
+            # o serviço guarda só as DISPLAY_ROWS primeiras linhas, mas conta todas
+            st.write('### _Resultado_')
+            if result.tree is not plan.optimized:
+                # Subárvores de junção lidas do cache de resultados (utils.result_cache)
+                st.write(f'_Reaproveitando resultados materializados:_ {result.tree}')
+            st.dataframe(result.relation.to_pandas())
+            st.write(f'_{result.rows} linha(s) em {result.seconds * 1000:.2f} ms_'
+                     + (f' (exibindo as {DISPLAY_ROWS} primeiras)' if result.truncated else ''))
+            st.write('### _Tempo por Operador_')
+            st.dataframe([asdict(op) for op in result.operators])
+        else:
+            # Todos os erros de sintaxe/validação, com a posição na consulta
+            for error in plan.errors:
+                st.error(str(error), icon='❗')
+
+    st.write('### _Tempo por Etapa_')
+    if 'parse' not in profile.stages:
+        st.write('_Plano reaproveitado do cache_')
+    st.dataframe([{'etapa': stage, 'ms': round(seconds * 1000, 3)} for stage, seconds in profile.stages.items()]
+                 + [{'etapa': 'total', 'ms': round(profile.seconds * 1000, 3)}])
+    if profile.cpu:
+        with st.expander('Perfil de CPU (cProfile)'):
+            st.code(profile.cpu)
+    if profile.memory_peak is not None:
+        with st.expander(f'Perfil de memória (tracemalloc): pico de {profile.memory_peak / 2 ** 20:.2f} MB'):
+            st.dataframe([{'linha': line, 'KB': round(size / 1024, 1), 'blocos': count}
+                          for line, size, count in profile.allocations])
+
+    with st.sidebar:
+        st.write('### _Cache de Planos_')
+        st.json(PLAN_CACHE.stats())
+        st.write('### _Serviço de Consultas_')
+        st.json(SERVICE.stats())
+        st.write('### _Cache de Resultados_')
+        st.json(RESULT_CACHE.stats())
+
+with st.sidebar:
+    # Histogramas e contadores do processo (também em /metrics se QUERY_METRICS_PORT estiver definida)
+    st.write('### _Métricas_')
+    st.download_button('Exportar (Prometheus)', METRICS.to_prometheus(),
+                       file_name='metrics.txt', mime='text/plain')
+    st.download_button('Exportar (JSON)', json.dumps(METRICS.to_json(), ensure_ascii=False),
+                       file_name='metrics.json', mime='application/json')
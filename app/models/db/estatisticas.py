@@ -0,0 +1,288 @@
+"""
+Catálogo de estatísticas das tabelas de METADADOS: número de linhas e, por
+coluna, valores distintos, fração de nulos, mínimo/máximo, valores mais
+comuns (MCV) e histograma equi-depth. É persistido em JSON compacto
+(estatisticas.json) e pode ser atualizado de forma incremental a partir dos
+arquivos de dados (<Tabela>.csv ou <Tabela>.parquet).
+"""
+import csv
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import Counter
+from models.db.metadados import METADADOS
+from models.query.ast import ColumnRef, Literal, Comparison, BoolOp
+
+STATS_PATH = os.path.join(os.path.dirname(__file__), 'estatisticas.json')
+
+HISTOGRAM_BUCKETS = 20
+MCV_SIZE = 10
+
+_FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '=': '=', '<>': '<>', '!=': '!='}
+
+
+def _coerce(value):
+    """Converte texto lido de CSV para int/float quando possível; '' vira nulo."""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        return value
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _comparable(a, b) -> bool:
+    numeric = (int, float)
+    return (isinstance(a, numeric) and isinstance(b, numeric)) or type(a) is type(b)
+
+
+class ColumnStats:
+    __slots__ = ('distinct', 'null_frac', 'min', 'max', 'mcv', 'histogram')
+
+    def __init__(self, distinct=0, null_frac=0.0, min=None, max=None, mcv=(), histogram=()):
+        self.distinct = distinct
+        self.null_frac = null_frac
+        self.min = min
+        self.max = max
+        self.mcv = [tuple(pair) for pair in mcv]     # [(valor, frequência), ...]
+        self.histogram = list(histogram)              # limites dos buckets equi-depth
+
+    @classmethod
+    def analyze(cls, values):
+        values = [_coerce(v) for v in values]
+        total = len(values)
+        present = [v for v in values if v is not None]
+        if not present:
+            return cls(0, 1.0 if total else 0.0)
+        try:
+            present.sort()
+        except TypeError:
+            # Tipos misturados: ordena pela representação textual
+            present = sorted(present, key=str)
+
+        counts = Counter(present)
+        mcv = [(v, n / total) for v, n in counts.most_common(MCV_SIZE) if n > 1]
+
+        buckets = min(HISTOGRAM_BUCKETS, len(present))
+        step = (len(present) - 1) / buckets if buckets else 0
+        histogram = [present[round(i * step)] for i in range(buckets + 1)]
+
+        return cls(len(counts), 1 - len(present) / total, present[0], present[-1], mcv, histogram)
+
+    def to_dict(self) -> dict:
+        return {
+            'distinct': self.distinct, 'null_frac': round(self.null_frac, 6),
+            'min': self.min, 'max': self.max,
+            'mcv': [[v, round(f, 6)] for v, f in self.mcv], 'histogram': self.histogram,
+        }
+
+    # Estimativas
+    def eq_selectivity(self, value):
+        if self.min is not None and _comparable(value, self.min) and (value < self.min or value > self.max):
+            return 0.0
+        for v, freq in self.mcv:
+            if v == value:
+                return freq
+        rest = 1.0 - self.null_frac - sum(f for _, f in self.mcv)
+        return max(rest, 0.0) / max(self.distinct - len(self.mcv), 1)
+
+    def range_selectivity(self, op, value):
+        """Fração de linhas com `coluna op valor`, para op em <, <=, >, >=."""
+        hist = self.histogram
+        if len(hist) < 2 or not _comparable(value, hist[0]):
+            return None
+        buckets = len(hist) - 1
+
+        # Fração (entre os não nulos) estritamente menor que o valor
+        if value <= hist[0]:
+            below = 0.0
+        elif value > hist[-1]:
+            below = 1.0
+        else:
+            i = bisect_left(hist, value) - 1
+            lo, hi = hist[i], hist[i + 1]
+            inside = 0.5
+            if isinstance(value, (int, float)) and hi != lo:
+                inside = (value - lo) / (hi - lo)
+            below = (i + inside) / buckets
+        equal = self.eq_selectivity(value) / max(1 - self.null_frac, 1e-9)
+
+        fraction = {
+            '<': below, '<=': below + equal, '>': 1 - below - equal, '>=': 1 - below,
+        }[op]
+        return min(max(fraction, 0.0), 1.0) * (1 - self.null_frac)
+
+
+class TableStats:
+    __slots__ = ('rows', 'columns', 'source')
+
+    def __init__(self, rows=0, columns=None, source=None):
+        self.rows = rows
+        self.columns = columns or {}
+        self.source = source or {}
+
+    def to_dict(self) -> dict:
+        return {
+            'rows': self.rows, 'source': self.source,
+            'columns': {name: col.to_dict() for name, col in self.columns.items()},
+        }
+
+
+class StatisticsCatalog:
+    """
+    Estatísticas por tabela, com busca sem distinção de maiúsculas. O atributo
+    `version` muda a cada atualização, para que caches de planos sejam
+    invalidados quando as cardinalidades mudam.
+    """
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # Persistência
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        tables = {
+            name: TableStats(
+                t['rows'],
+                {col: ColumnStats(**stats) for col, stats in t['columns'].items()},
+                t.get('source'))
+            for name, t in data.get('tables', {}).items()
+        }
+        return cls(tables)
+
+    def save(self, path=STATS_PATH):
+        data = {'version': 1, 'tables': {name: t.to_dict() for name, t in self.tables.items()}}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    # Coleta
+    def analyze_table(self, table: str, columns: dict, source=None):
+        """Recalcula as estatísticas de `table` a partir de {coluna: valores}."""
+        rows = len(next(iter(columns.values()), []))
+        stats = TableStats(rows, {col: ColumnStats.analyze(values) for col, values in columns.items()}, source)
+        with self._lock:
+            self.tables[table] = stats
+            self.version += 1
+        return stats
+
+    def refresh(self, data_dir: str) -> list:
+        """
+        Atualização incremental: reanalisa apenas as tabelas cujo arquivo de
+        dados mudou (tamanho ou data de modificação) desde a última coleta.
+        Devolve a lista de tabelas atualizadas.
+        """
+        updated = []
+        for table in METADADOS:
+            path = _data_file(data_dir, table)
+            if path is None:
+                continue
+            info = os.stat(path)
+            source = {'file': os.path.basename(path), 'size': info.st_size, 'mtime': info.st_mtime}
+            current = self.tables.get(table)
+            if current is not None and current.source == source:
+                continue
+            self.analyze_table(table, _read_columns(path), source)
+            updated.append(table)
+        return updated
+
+    # Consulta
+    def table(self, name: str):
+        stats = self.tables.get(name)
+        if stats is None:
+            stats = next((t for n, t in self.tables.items() if n.upper() == name.upper()), None)
+        return stats
+
+    def row_count(self, table: str):
+        stats = self.table(table)
+        return stats.rows if stats is not None else None
+
+    def column(self, ref: ColumnRef):
+        stats = self.table(ref.table) if ref.table else None
+        if stats is None:
+            return None
+        col = stats.columns.get(ref.column)
+        if col is None:
+            col = next((c for n, c in stats.columns.items() if n.upper() == ref.column.upper()), None)
+        return col
+
+    def selectivity(self, pred, fallback):
+        """
+        Seletividade estimada do predicado. `fallback(comparação)` é usado para
+        comparações sem estatísticas disponíveis.
+        """
+        if isinstance(pred, BoolOp):
+            parts = [self.selectivity(arg, fallback) for arg in pred.args]
+            result = parts[0]
+            for s in parts[1:]:
+                result = result * s if pred.op == 'AND' else result + s - result * s
+            return result
+        if not isinstance(pred, Comparison):
+            return fallback(pred)
+
+        left, op, right = pred.left, pred.op, pred.right
+        if isinstance(left, Literal) and isinstance(right, ColumnRef):
+            left, right, op = right, left, _FLIPPED[op]
+
+        if isinstance(left, ColumnRef) and isinstance(right, ColumnRef):
+            a, b = self.column(left), self.column(right)
+            if a is None or b is None:
+                return fallback(pred)
+            if op == '=':
+                return 1.0 / max(a.distinct, b.distinct, 1)
+            return fallback(pred)
+
+        stats = self.column(left) if isinstance(left, ColumnRef) else None
+        if stats is None or not isinstance(right, Literal):
+            return fallback(pred)
+        if op == '=':
+            return stats.eq_selectivity(right.value)
+        if op in ('<>', '!='):
+            return max(1.0 - stats.null_frac - stats.eq_selectivity(right.value), 0.0)
+        estimate = stats.range_selectivity(op, right.value)
+        return estimate if estimate is not None else fallback(pred)
+
+
+def _data_file(data_dir: str, table: str):
+    for ext in ('.parquet', '.csv'):
+        for name in (table, table.lower()):
+            path = os.path.join(data_dir, name + ext)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _read_columns(path: str) -> dict:
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pydict()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = {name: [] for name in header}
+        for row in reader:
+            for name, value in zip(header, row):
+                columns[name].append(value)
+    return columns
+
+
+# Catálogo compartilhado, carregado do arquivo ao lado de metadados.py
+ESTATISTICAS = StatisticsCatalog.load()
+
+
+if __name__ == '__main__':
+    # python -m models.db.estatisticas <diretório de dados>  (a partir de app/)
+    import sys
+    updated = ESTATISTICAS.refresh(sys.argv[1])
+    ESTATISTICAS.save()
+    print(f"Estatísticas atualizadas: {', '.join(updated) or 'nenhuma tabela alterada'}")
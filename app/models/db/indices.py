@@ -0,0 +1,52 @@
+import os
+from models.db.metadados import CHAVES_PRIMARIAS, CHAVES_ESTRANGEIRAS
+from models.query.ast import ColumnRef, Literal, Comparison, conjuncts
+
+# Índices secundários mantidos em disco, por (tabela, coluna):
+#   'hash'   — buscas por igualdade;
+#   'sorted' — igualdade e faixas (<, <=, >, >=) sobre o array ordenado.
+INDICES = {
+    ("Cliente", "Email"): "hash",
+    ("Endereco", "Cidade"): "hash",
+    ("Status", "Descricao"): "hash",
+    ("Produto", "Preco"): "sorted",
+}
+
+# Diretório dos arquivos de índice (<dados>/.indices por padrão)
+INDEX_DIR = os.environ.get('QUERY_INDEX_DIR')
+
+
+def secondary_index(table: str, column: str):
+    """Tipo do índice secundário declarado para a coluna, ou None."""
+    return INDICES.get((table, column))
+
+
+def index_kind(table: str, column: str):
+    """Índice de chave da coluna: 'hash' (PK de uma coluna), 'sorted' (FK/parte da PK) ou None."""
+    primary = CHAVES_PRIMARIAS.get(table, [])
+    if primary == [column]:
+        return 'hash'
+    if (table, column) in CHAVES_ESTRANGEIRAS or column in primary:
+        return 'sorted'
+    return None
+
+
+SARGABLE_OPS = ('=', '<', '<=', '>', '>=')
+FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '=': '='}
+
+
+def sargable_terms(pred, table: str) -> dict:
+    """
+    Termos `coluna op literal` do predicado que um índice pode atender,
+    agrupados por coluna de `table` e normalizados com a coluna à esquerda.
+    """
+    terms = {}
+    for term in conjuncts(pred):
+        if not isinstance(term, Comparison) or term.op not in SARGABLE_OPS:
+            continue
+        left, op, right = term.left, term.op, term.right
+        if isinstance(left, Literal) and isinstance(right, ColumnRef):
+            left, right, op = right, left, FLIPPED[op]
+        if isinstance(left, ColumnRef) and isinstance(right, Literal) and left.table == table:
+            terms.setdefault(left.column, []).append(term)
+    return terms
@@ -11,6 +11,34 @@ METADADOS = {
     "Pedido_has_Produto": ["idPedidoProduto", "Pedido_idPedido", "Produto_idProduto", "Quantidade", "PrecoUnitario"]
 }
 
+# Chaves declaradas, seguindo a convenção de nomes de METADADOS: a chave
+# primária de X é idX e uma coluna X_idX referencia X.idX.
+CHAVES_PRIMARIAS = {
+    "Categoria": ["idCategoria"],
+    "Produto": ["idProduto"],
+    "TipoCliente": ["idTipoCliente"],
+    "Cliente": ["idCliente"],
+    "TipoEndereco": ["idTipoEndereco"],
+    "Endereco": ["idEndereco"],
+    "Telefone": ["Numero", "Cliente_idCliente"],
+    "Status": ["idStatus"],
+    "Pedido": ["idPedido"],
+    "Pedido_has_Produto": ["idPedidoProduto"]
+}
+
+CHAVES_ESTRANGEIRAS = {
+    # (tabela, coluna): (tabela referenciada, coluna referenciada)
+    ("Produto", "Categoria_idCategoria"): ("Categoria", "idCategoria"),
+    ("Cliente", "TipoCliente_idTipoCliente"): ("TipoCliente", "idTipoCliente"),
+    ("Endereco", "TipoEndereco_idTipoEndereco"): ("TipoEndereco", "idTipoEndereco"),
+    ("Endereco", "Cliente_idCliente"): ("Cliente", "idCliente"),
+    ("Telefone", "Cliente_idCliente"): ("Cliente", "idCliente"),
+    ("Pedido", "Status_idStatus"): ("Status", "idStatus"),
+    ("Pedido", "Cliente_idCliente"): ("Cliente", "idCliente"),
+    ("Pedido_has_Produto", "Pedido_idPedido"): ("Pedido", "idPedido"),
+    ("Pedido_has_Produto", "Produto_idProduto"): ("Produto", "idProduto")
+}
+
 OPERATORS = [
     '=', '<>', '!=',   # operadores de comparação
     '<', '<=', '>', '>=',
@@ -0,0 +1,144 @@
+"""
+Índice dos metadados para validação e resolução de nomes.
+
+METADADOS é uma lista de colunas por tabela; procurar uma coluna nela é
+linear. O índice guarda, com chaves em maiúsculas, um único dicionário
+'TABELA.COLUNA' -> nome canônico, além das tabelas e de quais tabelas têm
+cada coluna (para colunas sem tabela). É construído uma vez por processo e
+compartilhado por todas as sessões (metadata_index()).
+"""
+import threading
+from models.db.metadados import METADADOS
+from models.query.ast import ColumnRef
+
+
+class MetadataIndex:
+    __slots__ = ('tables', 'columns', 'table_columns', 'owners')
+
+    def __init__(self, metadata: dict):
+        self.tables = {}          # 'CLIENTE' -> 'Cliente'
+        self.columns = {}         # 'CLIENTE.IDCLIENTE' -> 'idCliente'
+        self.table_columns = {}   # 'Cliente' -> ('idCliente', 'Nome', ...)
+        owners = {}               # 'IDCLIENTE' -> ['Cliente']
+        for table, cols in metadata.items():
+            upper = table.upper()
+            self.tables[upper] = table
+            self.table_columns[table] = tuple(cols)
+            for col in cols:
+                self.columns[f"{upper}.{col.upper()}"] = col
+                owners.setdefault(col.upper(), []).append(table)
+        self.owners = {col: tuple(tables) for col, tables in owners.items()}
+
+    def table(self, name: str):
+        """Nome canônico da tabela, ou None."""
+        return self.tables.get(name.upper())
+
+    def column(self, table: str, column: str):
+        """Nome canônico da coluna da tabela, ou None."""
+        return self.columns.get(f"{table.upper()}.{column.upper()}")
+
+
+class Scope:
+    """
+    Tabelas visíveis em uma consulta (FROM e JOINs), por nome ou apelido.
+    Resolve referências de colunas para a forma canônica Tabela.Coluna.
+    """
+
+    def __init__(self, index: MetadataIndex, table_refs):
+        self.index = index
+        self.tables = []
+        self.names = {}      # NOME/APELIDO -> tabela canônica
+        self._prefix = {}    # NOME/APELIDO -> 'TABELA.' (chave de index.columns)
+        self.errors = []     # [(mensagem, posição)] das tabelas inválidas
+        for ref in table_refs:
+            canonical = index.table(ref.name)
+            if canonical is None:
+                self.errors.append((f"Tabela inexistente: {ref.name}", ref.pos))
+                continue
+            if canonical in self.tables:
+                # Auto-junção não é suportada: os operadores e colunas são identificados
+                # pela tabela canônica, então as duas ocorrências virariam uma só
+                self.errors.append((f"Tabela repetida: {ref.name} (auto-junção não suportada)", ref.pos))
+            else:
+                self.tables.append(canonical)
+            for name in (ref.name, ref.alias):
+                if not name:
+                    continue
+                previous = self.names.get(name.upper())
+                if previous is not None and previous != canonical:
+                    self.errors.append((f"Apelido repetido: {name}", ref.pos))
+                self.names[name.upper()] = canonical
+                self._prefix[name.upper()] = canonical.upper() + '.'
+
+    def table(self, name: str):
+        """Tabela canônica de um nome ou apelido do escopo, ou None."""
+        return self.names.get(name.upper())
+
+    def lookup(self, ref: ColumnRef):
+        """(tabela, coluna) canônicas da referência, ou a mensagem de erro (str)."""
+        column = ref.column.upper()
+        if ref.table is None:
+            owners = [t for t in self.index.owners.get(column, ()) if t in self.tables]
+            if not owners:
+                return f"Coluna inexistente: {ref.column}"
+            if len(owners) > 1:
+                return f"Coluna ambígua: {ref.column} ({', '.join(owners)})"
+            return owners[0], self.index.columns[f"{owners[0].upper()}.{column}"]
+        prefix = self._prefix.get(ref.table.upper())
+        if prefix is None:
+            return f"Tabela fora da consulta: {ref.table}"
+        canonical = self.index.columns.get(prefix + column)
+        if canonical is None:
+            return f"Coluna inexistente: {ref.table}.{ref.column}"
+        return self.names[ref.table.upper()], canonical
+
+    def resolve(self, ref: ColumnRef) -> ColumnRef:
+        """Referência canônica; LookupError com a mensagem se não existe ou é ambígua."""
+        found = self.lookup(ref)
+        if isinstance(found, str):
+            raise LookupError(found)
+        return ColumnRef(found[0], found[1], ref.pos)
+
+    def expand(self, ref: ColumnRef) -> list:
+        """Colunas de `*` / `tabela.*`, ou a própria coluna resolvida."""
+        if ref.column != '*':
+            return [self.resolve(ref)]
+        if ref.table is None:
+            tables = self.tables
+        else:
+            table = self.table(ref.table)
+            if table is None:
+                raise LookupError(f"Tabela fora da consulta: {ref.table}")
+            tables = [table]
+        return [ColumnRef(t, col, ref.pos) for t in tables for col in self.index.table_columns[t]]
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+# Incrementada a cada reload_metadata_index(): caches derivados de METADADOS
+# (utils.plan_cache) comparam só este número
+_VERSION = 0
+
+
+def metadata_index() -> MetadataIndex:
+    """Índice compartilhado do processo, construído na primeira chamada."""
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = MetadataIndex(METADADOS)
+    return _INDEX
+
+
+def reload_metadata_index() -> MetadataIndex:
+    """Reconstrói o índice (depois de alterar METADADOS) e incrementa a versão."""
+    global _INDEX, _VERSION
+    with _INDEX_LOCK:
+        _INDEX = MetadataIndex(METADADOS)
+        _VERSION += 1
+    return _INDEX
+
+
+def metadata_version() -> int:
+    """Versão de METADADOS: muda a cada reload_metadata_index()."""
+    return _VERSION
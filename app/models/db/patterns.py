@@ -13,4 +13,36 @@ INNER_JOIN_PATTERN =  (
     r'(?P<table>[\w\.]+(?:\s+\w+)?)\s+'           
     r'on\s+(?P<cond>.+?)'                         
     r'(?=\s+(?:inner\s+)?join|\s+where|$)'        
-)
\ No newline at end of file
+)
+
+# Alternativas de token do analisador léxico: NAME e as demais (STRING,
+# NUMBER, OP e PUNCT). Cada tipo começa por caracteres próprios, de modo que o
+# tipo de um token é dado pelo seu primeiro caractere (ver models.query.lexer).
+NAME_TOKEN = r'[A-Za-z_]\w*'
+OTHER_TOKEN = (
+    r"'[^']*(?:''[^']*)*'|\"[^\"]*(?:\"\"[^\"]*)*\""
+    r'|-?\d+(?:\.\d+)?'
+    r'|<>|!=|<=|>=|=|<|>'
+    r'|[.,;()*]'
+)
+TOKEN = rf'{NAME_TOKEN}|{OTHER_TOKEN}'
+# Coluna qualificada sem espaços (Tabela.coluna ou Tabela.*) como um token só
+QUALIFIED_TOKEN = rf'{NAME_TOKEN}(?:\.(?:{NAME_TOKEN}|\*))?|{OTHER_TOKEN}'
+
+# Padrões do analisador léxico: espaços antes do token e o próprio token.
+# Cada alternativa é ancorada e sem quantificadores aninhados, e o \S final
+# casa qualquer outro caractere (rejeitado pelo léxico), de modo que a
+# consulta inteira é varrida por um único findall, sem retrocesso.
+TOKEN_PATTERN = rf'\s*(?:{TOKEN}|\S)'
+QUALIFIED_TOKEN_PATTERN = rf'\s*(?:{QUALIFIED_TOKEN}|\S)'
+
+KEYWORDS = frozenset({
+    'SELECT', 'FROM', 'INNER', 'JOIN', 'ON', 'WHERE', 'AND', 'OR', 'AS', 'LIMIT'
+})
+
+# Palavra-chave como parte de um nome qualificado (FROM.x, t.and), procurada
+# no texto em maiúsculas: nesse caso o léxico não agrupa Tabela.coluna. Os dois
+# padrões começam pelo '.' literal, que o re localiza sem tentar cada posição;
+# por isso a palavra antes do ponto é procurada no texto invertido.
+KEYWORD_COLUMN_PATTERN = rf"\.(?:{'|'.join(sorted(KEYWORDS))})(?!\w)"
+KEYWORD_TABLE_PATTERN = rf"\.(?:{'|'.join(sorted(k[::-1] for k in KEYWORDS))})(?![^\W\d])"
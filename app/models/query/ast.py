@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+# Nós imutáveis por convenção (nada os altera depois do parser) e hasheáveis.
+# Não usam frozen=True: o __init__ de dataclass congelada grava cada campo com
+# object.__setattr__, o que dominava o tempo do parser em consultas longas.
+_node = dataclass(slots=True, unsafe_hash=True)
+
+
+@_node
+class ColumnRef:
+    """Referência a coluna, qualificada (tabela.coluna) ou não."""
+    table: Optional[str]
+    column: str
+    pos: int = field(default=-1, compare=False)
+
+    def __str__(self):
+        return f"{self.table}.{self.column}" if self.table else self.column
+
+
+@_node
+class Literal:
+    """Valor literal: int, float ou str."""
+    value: Union[int, float, str]
+    pos: int = field(default=-1, compare=False)
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return "'" + self.value.replace("'", "''") + "'"
+        return str(self.value)
+
+
+@_node
+class Comparison:
+    """Predicado atômico `esquerda op direita` (op em OPERATORS)."""
+    op: str
+    left: Union[ColumnRef, Literal]
+    right: Union[ColumnRef, Literal]
+    pos: int = field(default=-1, compare=False)
+
+    def __str__(self):
+        return f"{self.left} {self.op} {self.right}"
+
+
+@_node
+class BoolOp:
+    """Conjunção (AND) ou disjunção (OR) de dois ou mais predicados."""
+    op: str
+    args: tuple
+
+    def __str__(self):
+        parts = []
+        for arg in self.args:
+            if isinstance(arg, BoolOp) and arg.op != self.op:
+                parts.append(f"({arg})")
+            else:
+                parts.append(str(arg))
+        return f" {self.op} ".join(parts)
+
+
+Predicate = Union[Comparison, BoolOp]
+
+
+def conjuncts(predicate) -> list:
+    """Lista de termos da conjunção de nível superior (a AND b AND c -> [a, b, c])."""
+    if predicate is None:
+        return []
+    if isinstance(predicate, BoolOp) and predicate.op == 'AND':
+        return list(predicate.args)
+    return [predicate]
+
+
+def make_conjunction(predicates):
+    """Inverso de conjuncts: None, o próprio predicado ou um BoolOp AND."""
+    predicates = list(predicates)
+    if not predicates:
+        return None
+    if len(predicates) == 1:
+        return predicates[0]
+    flat = []
+    for pred in predicates:
+        flat.extend(conjuncts(pred))
+    return BoolOp('AND', tuple(flat))
+
+
+def column_refs(predicate) -> list:
+    """Colunas referenciadas no predicado, na ordem em que aparecem."""
+    if isinstance(predicate, ColumnRef):
+        return [predicate]
+    if isinstance(predicate, Comparison):
+        return column_refs(predicate.left) + column_refs(predicate.right)
+    if isinstance(predicate, BoolOp):
+        return [col for arg in predicate.args for col in column_refs(arg)]
+    return []
+
+
+@_node
+class TableRef:
+    """Tabela do FROM/JOIN, com apelido opcional."""
+    name: str
+    alias: Optional[str] = None
+    pos: int = field(default=-1, compare=False)
+
+    def __str__(self):
+        return f"{self.name} {self.alias}" if self.alias else self.name
+
+
+@_node
+class Join:
+    """INNER JOIN <tabela> ON <predicado>."""
+    table: TableRef
+    condition: Predicate
+    pos: int = field(default=-1, compare=False)
+
+
+@_node
+class Query:
+    """
+    Árvore sintática de uma consulta SELECT … FROM … [JOIN … ON …]* [WHERE …]
+    [LIMIT n].
+    """
+    select: tuple
+    from_table: TableRef
+    joins: tuple = ()
+    where: Optional[Predicate] = None
+    limit: Optional[int] = None
+
+    def to_legacy(self) -> dict:
+        """
+        Adaptador para o formato de dicionário usado por QueryManager e
+        sql_to_algebra: {'select': [...], 'from': str, 'joins': [...], 'where': str}.
+        A chave 'limit' só aparece quando a consulta tem LIMIT.
+        """
+        legacy = {
+            'select': [str(col) for col in self.select],
+            'from': str(self.from_table),
+            'joins': [
+                {'table': str(j.table), 'condition': str(j.condition)}
+                for j in self.joins
+            ],
+            'where': str(self.where) if self.where is not None else ''
+        }
+        if self.limit is not None:
+            legacy['limit'] = self.limit
+        return legacy
@@ -0,0 +1,103 @@
+import re
+import string
+from itertools import accumulate
+from operator import itemgetter, sub
+from typing import NamedTuple
+from models.db.patterns import (TOKEN_PATTERN, QUALIFIED_TOKEN_PATTERN, KEYWORD_COLUMN_PATTERN,
+                                KEYWORD_TABLE_PATTERN, KEYWORDS)
+
+_TOKEN_RE = re.compile(TOKEN_PATTERN)
+_QUALIFIED_TOKEN_RE = re.compile(QUALIFIED_TOKEN_PATTERN)
+_KEYWORD_COLUMN_RE = re.compile(KEYWORD_COLUMN_PATTERN)
+_KEYWORD_TABLE_RE = re.compile(KEYWORD_TABLE_PATTERN)
+
+NAME_START = frozenset(string.ascii_letters + '_')
+NUMBER_START = frozenset(string.digits + '-')
+QUOTES = frozenset('\'"')
+OPS = frozenset({'<>', '!=', '<=', '>=', '=', '<', '>'})
+PUNCT = frozenset('.,;()*')
+# Primeiros caracteres válidos e caracteres soltos casados só pelo \S do padrão
+# (começo de token que não se completou)
+_STARTS = NAME_START | NUMBER_START | QUOTES | PUNCT | frozenset('<>=!')
+_STRAY = frozenset({"'", '"', '-', '!'})
+
+
+class SQLSyntaxError(ValueError):
+    """
+    Erro de sintaxe na consulta, com a posição (offset) em que ocorreu.
+    """
+    def __init__(self, message: str, pos: int):
+        super().__init__(f"{message} (posição {pos})")
+        self.message = message
+        self.pos = pos
+
+
+class Token(NamedTuple):
+    kind: str    # KEYWORD, NAME, NUMBER, STRING, OP, EOF ou o próprio símbolo ('.', ',', '(', ...)
+    value: str
+    pos: int
+
+
+def scan(sql: str, qualified: bool = True) -> tuple:
+    """
+    Analisador léxico de passada única: um findall percorre a string uma vez e
+    textos, maiúsculas e posições saem de map sobre o resultado, sem laço nem
+    objeto por token. Devolve listas paralelas (textos, textos em maiúsculas,
+    posições) terminadas pelo EOF (texto vazio).
+
+    Com `qualified`, colunas qualificadas escritas sem espaços (Tabela.coluna,
+    Tabela.*) são um token só; sem, viram NAME '.' NAME como os demais. Se
+    alguma palavra-chave aparece junto a um ponto (FROM.x, t.and), nenhuma é
+    agrupada: as partes de um token composto nunca são palavras-chave.
+    """
+    if qualified and '.' in sql:
+        upper = sql.upper()
+        if _KEYWORD_COLUMN_RE.search(upper) or _KEYWORD_TABLE_RE.search(upper[::-1]):
+            qualified = False
+    words = (_QUALIFIED_TOKEN_RE if qualified else _TOKEN_RE).findall(sql)
+    texts = list(map(str.lstrip, words))
+    positions = list(map(sub, accumulate(map(len, words)), map(len, texts)))
+    if not _STARTS.issuperset(map(itemgetter(0), texts)) or not _STRAY.isdisjoint(texts):
+        _check_characters(texts, positions)
+    uppers = list(map(str.upper, texts))
+
+    texts.append('')
+    uppers.append('')
+    positions.append(len(sql))
+    return texts, uppers, positions
+
+
+def _check_characters(texts, positions):
+    """
+    Rejeita o primeiro caractere que não começa nenhum token. Números com
+    dígitos decimais fora do ASCII (que \\d também aceita) são válidos.
+    """
+    for text, pos in zip(texts, positions):
+        if text in _STRAY or (text[0] not in _STARTS and not text[0].isdecimal()):
+            raise SQLSyntaxError(f"Caractere inesperado {text[0]!r}", pos)
+
+
+def token_kind(text: str, upper: str) -> str:
+    """Tipo (como em Token.kind) de um token devolvido por scan."""
+    if not text:
+        return 'EOF'
+    first = text[0]
+    if first in NAME_START:
+        return 'KEYWORD' if upper in KEYWORDS else 'NAME'
+    if first in QUOTES:
+        return 'STRING'
+    if text in OPS:
+        return 'OP'
+    if text in PUNCT:
+        return text
+    return 'NUMBER'
+
+
+def tokenize(sql: str) -> list:
+    """Lista de tokens da consulta (Token), terminada por um token EOF."""
+    texts, uppers, positions = scan(sql, qualified=False)
+    tokens = []
+    for text, upper, pos in zip(texts, uppers, positions):
+        kind = token_kind(text, upper)
+        tokens.append(Token(kind, upper if kind == 'KEYWORD' else text, pos))
+    return tokens
@@ -1,81 +1,78 @@
-import regex as re
-from models.db.metadados import METADADOS, OPERATORS
+from dataclasses import dataclass
+from models.db.metadata_index import MetadataIndex, Scope, metadata_index
+from models.query.ast import ColumnRef, Comparison, BoolOp, Query
+from models.query.parser import QueryParser
+from utils.profiling import timed
+
+
+@dataclass(frozen=True)
+class ValidationError:
+    """Erro de validação com a posição (caractere) na consulta, quando conhecida."""
+    message: str
+    pos: int = -1
+
+    def __str__(self):
+        return f"{self.message} (posição {self.pos})" if self.pos >= 0 else self.message
+
 
 class QueryManager:
     """
     Valida SELECT, FROM, JOIN e WHERE com base nos metadados.
+
+    A validação é uma única passada pela árvore sintática: cada tabela e
+    coluna é consultada no índice compartilhado dos metadados (dicionários,
+    O(1) por nome) e todos os erros são reunidos com suas posições, em vez
+    de parar no primeiro.
     """
-    def is_where_valid(self, parsed):
-        if not parsed.get('where'):
-            return True  # WHERE é opcional
-        
-        # Extrair condições usando regex
-        conditions = re.split(r'(?i)\s+and\s+', parsed['where'])
-        
-        for condition in conditions:
-            # Verificar cada operador lógico
-            matches = re.findall(r'([\w\.]+)\s*([<>=!]+)\s*([\w\.\'\"]+)', condition)
-            if not matches:
-                return False
-                
-            for left, op, right in matches:
-                # Se o lado esquerdo é uma coluna (tem formato table.column)
-                if '.' in left:
-                    table, column = left.split('.')
-                    if not self.is_valid_table(table) or not self.is_valid_value(column, table):
-                        return False
-                
-                # Se o lado direito é uma coluna (não é um valor literal)
-                if '.' in right and not (right.startswith("'") or right.startswith('"')):
-                    table, column = right.split('.')
-                    if not self.is_valid_table(table) or not self.is_valid_value(column, table):
-                        return False
-        
-        return True
 
-    def __init__(self):
-        # Padroniza nomes de tabelas e colunas em UPPER
-        self._metadata = {
-            tbl.upper(): [col.upper() for col in cols]
-            for tbl, cols in METADADOS.items()
-        }
-        self._logic_ops = {op.upper() for op in OPERATORS}
+    def __init__(self, index: MetadataIndex = None):
+        self.index = index or metadata_index()
 
     def is_valid_table(self, table):
-        return table.upper() in self._metadata
+        return self.index.table(table) is not None
 
     def is_valid_value(self, value, table):
-        return value.upper() in self._metadata.get(table.upper(), [])
+        return self.index.column(table, value) is not None
 
-    def is_select_valid(self, parsed):
-        for param in parsed['select']:
-            clean = param.strip().strip(',;')
-            if '.' not in clean:
-                return False
-            table, value = clean.split('.', 1)
-            if not self.is_valid_table(table) or not self.is_valid_value(value, table):
-                return False
-        return True
+    @timed('validate')
+    def validate(self, parsed) -> list:
+        """Lista de ValidationError da consulta (Query ou dicionário legado); vazia se válida."""
+        if not isinstance(parsed, Query):
+            parsed = QueryParser.from_legacy(parsed)
 
-    def is_from_valid(self, parsed):
-        return self.is_valid_table(parsed['from'])
+        # 1) FROM e JOINs: tabelas e apelidos visíveis na consulta
+        scope = Scope(self.index, (parsed.from_table, *(j.table for j in parsed.joins)))
+        errors = [ValidationError(message, pos) for message, pos in scope.errors]
 
-    def is_join_valid(self, parsed):
-        for join in parsed['joins']:
-            if not self.is_valid_table(join['table']):
-                return False
+        # 2) Colunas do SELECT, das condições de junção e do WHERE
+        for ref in parsed.select:
+            self._check(scope, ref, errors, expand=True)
+        for join in parsed.joins:
+            self._check(scope, join.condition, errors)
+        self._check(scope, parsed.where, errors)
+        return sorted(errors, key=lambda error: error.pos)
 
-            # extrai só table.column
-            pairs = re.findall(r'([\w]+)\.([\w]+)', join['condition'])
-            for table, value in pairs:
-                if not self.is_valid_table(table) or not self.is_valid_value(value, table):
-                    return False
-        return True
+    def _check(self, scope, node, errors, expand=False):
+        if isinstance(node, ColumnRef):
+            if expand and node.column == '*':
+                try:
+                    scope.expand(node)
+                except LookupError as error:
+                    errors.append(ValidationError(error.args[0], node.pos))
+                return
+            found = scope.lookup(node)
+            if isinstance(found, str):
+                errors.append(ValidationError(found, node.pos))
+        elif isinstance(node, Comparison):
+            self._check(scope, node.left, errors)
+            self._check(scope, node.right, errors)
+        elif isinstance(node, BoolOp):
+            for arg in node.args:
+                self._check(scope, arg, errors)
 
     def is_query_valid(self, parsed):
-        return (
-            self.is_select_valid(parsed)
-            and self.is_from_valid(parsed)
-            and self.is_join_valid(parsed)
-            and self.is_where_valid(parsed) 
-        )
\ No newline at end of file
+        try:
+            return not self.validate(parsed)
+        except ValueError:
+            # Dicionário legado de uma consulta com erro de sintaxe
+            return False
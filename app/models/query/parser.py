@@ -1,37 +1,255 @@
-import re
-from models.db.patterns import SELECT_PATTERN, FROM_PATTERN, WHERE_PATTERN, INNER_JOIN_PATTERN
+from models.db.metadados import OPERATORS
+from models.db.patterns import KEYWORDS
+from models.query.lexer import scan, token_kind, SQLSyntaxError, NAME_START, NUMBER_START, QUOTES, OPS
+from models.query.ast import ColumnRef, Literal, Comparison, BoolOp, TableRef, Join, Query
+from utils.profiling import timed
+
+_COMPARISON_OPS = frozenset(op for op in OPERATORS if op != 'AND')
+
+
+class _RecursiveDescent:
+    """
+    Parser descendente recursivo sobre as listas paralelas de tokens (lexer.scan).
+
+    query      := SELECT columns FROM table join* [WHERE or_expr] [LIMIT NUMBER] [';'] EOF
+    columns    := column (',' column)*
+    table      := NAME [[AS] NAME]
+    join       := [INNER] JOIN table ON or_expr
+    or_expr    := and_expr (OR and_expr)*
+    and_expr   := primary (AND primary)*
+    primary    := '(' or_expr ')' | operand OP operand
+    operand    := column | NUMBER | STRING
+
+    Colunas qualificadas sem espaços (Tabela.coluna) podem chegar como um token
+    só; fora de column() esse token não é aceito, pois NAME '.' ali também não
+    seria. Os erros, nesse caso, não são os da gramática token a token, e por
+    isso QueryParser refaz a análise com os tokens separados (ver _parse).
+    """
+    __slots__ = ('texts', 'uppers', 'positions', 'i')
+
+    def __init__(self, tokens):
+        # Palavras-chave são reconhecidas pelas maiúsculas e símbolos pelo
+        # texto: nenhum NAME, NUMBER ou STRING tem o mesmo texto que eles
+        self.texts, self.uppers, self.positions = tokens
+        self.i = 0
+
+    # Utilitários
+    def is_name(self, i):
+        text = self.texts[i]
+        return text[:1] in NAME_START and '.' not in text and self.uppers[i] not in KEYWORDS
+
+    def expect(self, kind, value=None):
+        """Consome o próximo token, que deve ser do tipo (e valor) dado; devolve seu índice."""
+        i = self.i
+        text = self.texts[i]
+        found = token_kind(text, self.uppers[i])
+        if found != kind or (value is not None and self.uppers[i] != value) or (kind == 'NAME' and '.' in text):
+            text = self.uppers[i] if found == 'KEYWORD' else text
+            raise SQLSyntaxError(f"Esperado {value or kind}, encontrado {text or found!r}", self.positions[i])
+        self.i = i + 1
+        return i
+
+    def keyword(self, word):
+        """Consome a palavra-chave dada (atalho de expect para o caso comum)."""
+        if self.uppers[self.i] != word:
+            self.expect('KEYWORD', word)
+        self.i += 1
+
+    # Regras
+    def query(self):
+        texts, uppers = self.texts, self.uppers
+        column = self.column
+        self.keyword('SELECT')
+        select = [column()]
+        while texts[self.i] == ',':
+            self.i += 1
+            select.append(column())
+
+        self.keyword('FROM')
+        from_table = self.table()
+
+        joins = []
+        while uppers[self.i] in ('JOIN', 'INNER'):
+            start = self.positions[self.i]
+            if uppers[self.i] == 'INNER':
+                self.i += 1
+            self.keyword('JOIN')
+            table = self.table()
+            self.keyword('ON')
+            joins.append(Join(table, self.or_expr(), start))
+
+        where = None
+        if uppers[self.i] == 'WHERE':
+            self.i += 1
+            where = self.or_expr()
+
+        limit = None
+        if uppers[self.i] == 'LIMIT':
+            self.i += 1
+            i = self.expect('NUMBER')
+            if not texts[i].isdigit():
+                raise SQLSyntaxError(f"LIMIT deve ser um inteiro não negativo: {texts[i]}", self.positions[i])
+            limit = int(texts[i])
+
+        if texts[self.i] == ';':
+            self.i += 1
+        self.expect('EOF')
+        return Query(tuple(select), from_table, tuple(joins), where, limit)
+
+    def predicate(self):
+        expr = self.or_expr()
+        self.expect('EOF')
+        return expr
+
+    def column(self):
+        i = self.i
+        text = self.texts[i]
+        if '.' in text and text[0] in NAME_START:
+            # Tabela.coluna ou Tabela.* em um token só (sem palavras-chave, ver lexer.scan)
+            self.i = i + 1
+            table, _, column = text.partition('.')
+            return ColumnRef(table, column, self.positions[i])
+        if self.is_name(i):
+            if self.texts[i + 1] != '.':
+                self.i = i + 1
+                return ColumnRef(None, text, self.positions[i])
+            if self.texts[i + 2] != '*' and not self.is_name(i + 2):
+                self.i = i + 2
+                self.expect('NAME')
+            self.i = i + 3
+            return ColumnRef(text, self.texts[i + 2], self.positions[i])
+        if text == '*':
+            self.i = i + 1
+            return ColumnRef(None, '*', self.positions[i])
+        self.expect('NAME')
+
+    def table(self):
+        i = self.i
+        if not self.is_name(i):
+            self.expect('NAME')
+        self.i = i + 1
+        alias = None
+        if self.uppers[self.i] == 'AS':
+            self.i += 1
+            alias = self.texts[self.expect('NAME')]
+        elif self.is_name(self.i):
+            alias = self.texts[self.i]
+            self.i += 1
+        return TableRef(self.texts[i], alias, self.positions[i])
+
+    def or_expr(self):
+        expr = self.and_expr()
+        if self.uppers[self.i] != 'OR':
+            return expr
+        args = [expr]
+        while self.uppers[self.i] == 'OR':
+            self.i += 1
+            args.append(self.and_expr())
+        return BoolOp('OR', tuple(args))
+
+    def and_expr(self):
+        uppers, primary = self.uppers, self.primary
+        expr = primary()
+        if uppers[self.i] != 'AND':
+            return expr
+        args = [expr]
+        while uppers[self.i] == 'AND':
+            self.i += 1
+            args.append(primary())
+        if BoolOp in map(type, args):
+            # Achata conjunções aninhadas vindas de parênteses: a AND (b AND c)
+            flat = []
+            for arg in args:
+                flat.extend(arg.args if isinstance(arg, BoolOp) and arg.op == 'AND' else (arg,))
+            args = flat
+        return BoolOp('AND', tuple(args))
+
+    def primary(self):
+        if self.texts[self.i] == '(':
+            self.i += 1
+            expr = self.or_expr()
+            self.expect(')')
+            return expr
+        left = self.operand()
+        i = self.i
+        op = self.texts[i]
+        if op not in _COMPARISON_OPS:
+            if op not in OPS:
+                self.expect('OP')
+            raise SQLSyntaxError(f"Operador desconhecido {op!r}", self.positions[i])
+        self.i = i + 1
+        return Comparison(op, left, self.operand(), left.pos)
+
+    def operand(self):
+        i = self.i
+        text = self.texts[i]
+        first = text[:1]
+        if first in NAME_START:
+            if '.' in text:
+                # Caso comum, como em column()
+                self.i = i + 1
+                table, _, column = text.partition('.')
+                return ColumnRef(table, column, self.positions[i])
+            return self.column()
+        if first in QUOTES:
+            self.i = i + 1
+            return Literal(text[1:-1].replace(first * 2, first), self.positions[i])
+        if first in NUMBER_START or first.isdecimal():
+            self.i = i + 1
+            return Literal(float(text) if '.' in text else int(text), self.positions[i])
+        return self.column()
+
+
+def _parse(text: str, rule):
+    """
+    Aplica a regra do parser ao texto, primeiro com as colunas qualificadas em
+    um token só. Se falhar, refaz com os tokens separados, para que o erro seja
+    sempre o da gramática token a token (os erros léxicos são os mesmos).
+    """
+    tokens = scan(text)
+    try:
+        return rule(_RecursiveDescent(tokens))
+    except SQLSyntaxError:
+        return rule(_RecursiveDescent(scan(text, qualified=False)))
+
+
 class QueryParser:
     """
-    Parser SQL simples: SELECT, FROM, zero ou mais INNER JOINs e WHERE.
+    Parser SQL simples: SELECT, FROM, zero ou mais INNER JOINs, WHERE e LIMIT.
     """
 
+    @staticmethod
+    @timed('parse')
+    def parse(sql: str) -> Query:
+        """
+        Analisa a consulta em tempo linear (léxico de passada única + descida
+        recursiva) e devolve a árvore sintática tipada. Lança SQLSyntaxError.
+        """
+        return _parse(sql, _RecursiveDescent.query)
+
+    @staticmethod
+    def parse_predicate(text: str):
+        """Analisa apenas um predicado (condição de WHERE ou de JOIN ON)."""
+        return _parse(text, _RecursiveDescent.predicate)
+
+    @staticmethod
+    def from_legacy(parsed_sql: dict) -> Query:
+        """Árvore sintática a partir do dicionário legado (inverso de Query.to_legacy)."""
+        sql = f"SELECT {', '.join(parsed_sql['select'])} FROM {parsed_sql['from']}"
+        for j in parsed_sql.get('joins', []):
+            sql += f" JOIN {j['table']} ON {j['condition']}"
+        if parsed_sql.get('where'):
+            sql += f" WHERE {parsed_sql['where']}"
+        if parsed_sql.get('limit') is not None:
+            sql += f" LIMIT {parsed_sql['limit']}"
+        return QueryParser.parse(sql)
+
     @staticmethod
     def parse_sql(sql: str) -> dict:
-        # 1) Limpeza: remove ';' final se existir, normaliza múltiplos espaços
-        sql = re.sub(r';\s*$', '', sql.strip())
-        sql = re.sub(r'\s+', ' ', sql)
-
-        # 2) SELECT …
-        select_match = re.search(SELECT_PATTERN, sql)
-
-        # 3) FROM …
-        from_match = re.search(FROM_PATTERN, sql)
-        
-        # 4) ZERO OU MAIS INNER JOINs
-        join_match = re.finditer(INNER_JOIN_PATTERN, sql)
-
-        # 5) WHERE …
-        where_match = re.search(WHERE_PATTERN, sql)
-
-        return {
-            'select': [
-                c.strip() for c in select_match.group('cols').split(',')
-            ] if select_match else [],
-            'from': from_match.group('table') if from_match else '',
-            'joins': [
-                {'table': m.group('table'), 'condition': m.group('cond')}
-                for m in join_match
-            ],
-            'where': where_match.group('cond').strip() if where_match else ''
-
-        }
+        # Formato legado (dicionário) consumido por QueryManager e sql_to_algebra.
+        # Consultas com erro de sintaxe produzem campos vazios, que são
+        # rejeitados na validação.
+        try:
+            return QueryParser.parse(sql).to_legacy()
+        except SQLSyntaxError:
+            return {'select': [], 'from': '', 'joins': [], 'where': ''}
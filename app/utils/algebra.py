@@ -1,214 +1,262 @@
-import regex as re
 from models.db.metadados import METADADOS
+from models.db.indices import secondary_index, sargable_terms
+from models.db.metadata_index import Scope, metadata_index
+from models.query.ast import Query, ColumnRef, Comparison, BoolOp, conjuncts, make_conjunction, column_refs
+from models.query.parser import QueryParser
+from utils.operators import Scan, IndexScan, Select, Project, ThetaJoin, Product, Limit, Empty, output_columns
+from utils.rewrite import rewrite_conjuncts
+from utils.profiling import timed
+from utils.join_order import order_joins, StatisticsCostModel, DEFAULT_DP_THRESHOLD
 
+
+def to_query(parsed_sql) -> Query:
+    """
+    Aceita a árvore sintática (Query) ou o dicionário legado de
+    QueryParser.parse_sql e devolve sempre a árvore sintática.
+    """
+    if isinstance(parsed_sql, Query):
+        return parsed_sql
+    return QueryParser.from_legacy(parsed_sql)
+
+
+class _Resolver:
+    """
+    Resolve tabelas, apelidos e colunas (sem distinção de maiúsculas) para os
+    nomes canônicos de METADADOS, para que 'cliente.idcliente' e
+    'Cliente.idCliente' sejam a mesma coluna na árvore. As buscas usam o
+    índice compartilhado dos metadados; nomes desconhecidos ficam como estão
+    (a validação já os reportou).
+    """
+    def __init__(self, query: Query):
+        self._scope = Scope(metadata_index(), (query.from_table, *(j.table for j in query.joins)))
+
+    def table(self, name: str) -> str:
+        return self._scope.table(name) or name
+
+    def column(self, ref: ColumnRef) -> ColumnRef:
+        try:
+            return self._scope.resolve(ref)
+        except LookupError:
+            return ref
+
+    def columns(self, ref: ColumnRef) -> list:
+        """Colunas do SELECT, com `*` e `tabela.*` expandidos."""
+        try:
+            return self._scope.expand(ref)
+        except LookupError:
+            return [ref]
+
+    def predicate(self, pred):
+        if isinstance(pred, ColumnRef):
+            return self.column(pred)
+        if isinstance(pred, Comparison):
+            return Comparison(pred.op, self.predicate(pred.left), self.predicate(pred.right), pred.pos)
+        if isinstance(pred, BoolOp):
+            return BoolOp(pred.op, tuple(self.predicate(arg) for arg in pred.args))
+        return pred
+
+
+@timed('algebra')
 def sql_to_algebra(parsed_sql):
     """
-    Converte parsed_sql (dicionário com keys 'select', 'from', 'joins', 'where')
-    em uma expressão de álgebra relacional usando projeção (π), seleção (σ)
-    e theta‑join (⋈_{cond}).
+    Converte parsed_sql (árvore sintática ou dicionário com keys 'select',
+    'from', 'joins', 'where') na árvore de operadores da álgebra relacional:
+    projeção (π), seleção (σ) e theta‑join (⋈_{cond}). Use str() na árvore
+    para obter a notação textual.
     """
-    # 1) Projeção
-    proj_cols = ', '.join(parsed_sql['select'])
-    projection = f"π[{proj_cols}]"
-
-    # 2) Construção da expressão de join com predicados (theta‑join)
-    expr = parsed_sql['from']
-    for j in parsed_sql.get('joins', []):
-        table = j['table']
-        cond  = j['condition']
-        # Theta‑join com predicado
-        expr = f"{expr} ⨝[{cond}] {table}"
-
-    # 3) Seleção (WHERE) — opcional
-    if parsed_sql.get('where'):
-        selection = f"σ[{parsed_sql['where']}]"
-        expr = f"{selection}({expr})"
-
-    # 4) Aplicar projeção sobre todo o resultado
-    return f"{projection}({expr})"
-
-def extract_tables(expression: str):
-    return re.findall(r'(\w+)\s*\⨝?', expression)
-
-def extract_tables(expression):
-    """Extrai todas as tabelas da expressão de álgebra relacional"""
-    # Padrão melhorado para capturar tabelas, excluindo operadores e funções da álgebra
-    table_pattern = r'(?:^|\s|\()(\w+)(?=\s*[⨝×]|\s*\)|\s*$)'
-    tables = re.findall(table_pattern, expression)
-    
-    # Filtrar operadores da álgebra relacional e outros não-tabelas
-    return [t for t in tables if t not in ('π', 'σ', 'and', 'or', 'AND', 'OR')]
-    
-def extract_conditions(expression: str):
-    condition_match = re.search(r'σ\[(.*?)\]', expression)
-    if condition_match:
-        return [cond.strip() for cond in re.split(r'(?i) and ', condition_match.group(1))]
-    return []
-
-def extract_projection(expression: str):
-    projection_match = re.search(r'π\[(.*?)\]', expression)
-    if projection_match:
-        return [cond.strip() for cond in re.split(r'(?i) and ', projection_match.group(1))]
-    return []
-
-def optimize_algebra(expression: str) -> str:
-    projection = extract_projection(expression)
-    conditions = extract_conditions(expression)
-    tables = extract_tables(expression)
-
-    # Push-down de seleções
-    selection_map = {table: [] for table in tables}
-    for cond in conditions:
-        for table in tables:
-            if cond.startswith(table + "."):
-                selection_map[table].append(cond)
-                break
-
-    # Construção da árvore otimizada em string
-    join_expr = " ⨝ ".join([
-        f"σ[{ ' and '.join(selection_map[t]) }]({t})" if selection_map[t] else t
-        for t in tables
-    ])
-
-    if projection:
-        return f"π[{', '.join(projection)}]({join_expr})"
-    return join_expr
-
-def optimize_algebra(expression):
+    query = to_query(parsed_sql)
+    resolver = _Resolver(query)
+
+    # 1) Construção da expressão de join com predicados (theta‑join)
+    expr = Scan(resolver.table(query.from_table.name))
+    for j in query.joins:
+        expr = ThetaJoin(resolver.predicate(j.condition), expr, Scan(resolver.table(j.table.name)))
+
+    # 2) Seleção (WHERE) — opcional
+    if query.where is not None:
+        expr = Select(resolver.predicate(query.where), expr)
+
+    # 3) Aplicar projeção sobre todo o resultado
+    expr = Project(tuple(col for c in query.select for col in resolver.columns(c)), expr)
+
+    # 4) LIMIT — opcional
+    if query.limit is not None:
+        expr = Limit(query.limit, expr)
+    return expr
+
+
+def _decompose(node, scans, predicates):
+    """Coleta as tabelas base e os termos de seleção/junção de uma subárvore."""
+    if isinstance(node, Scan):
+        if node.table not in scans:
+            scans.append(node.table)
+    elif isinstance(node, IndexScan):
+        if node.table not in scans:
+            scans.append(node.table)
+        predicates.extend(conjuncts(node.predicate))
+    elif isinstance(node, Select):
+        predicates.extend(conjuncts(node.predicate))
+        _decompose(node.child, scans, predicates)
+    elif isinstance(node, ThetaJoin):
+        _decompose(node.left, scans, predicates)
+        _decompose(node.right, scans, predicates)
+        predicates.extend(conjuncts(node.predicate))
+    elif isinstance(node, Product):
+        _decompose(node.left, scans, predicates)
+        _decompose(node.right, scans, predicates)
+    elif isinstance(node, Project):
+        _decompose(node.child, scans, predicates)
+
+
+def access_path(table: str, conditions: list, cost_model, columns=None):
+    """
+    Leitura da tabela com as suas seleções: Scan + σ ou, se for mais barato
+    pela estimativa do modelo de custo, IndexScan sobre a coluna indexada
+    mais seletiva, com o restante das condições em um σ acima. `columns`
+    limita as colunas lidas (None lê todas).
+    """
+    best, best_cost = None, cost_model.scan_cost(table)
+    pred = make_conjunction(conditions)
+    for column, terms in sargable_terms(pred, table).items() if conditions else ():
+        kind = secondary_index(table, column)
+        if kind is None or (kind == 'hash' and not any(t.op == '=' for t in terms)):
+            continue
+        index_pred = make_conjunction(terms)
+        cost = cost_model.index_scan_cost(table, index_pred, kind)
+        if cost < best_cost:
+            best, best_cost = (IndexScan(table, column, kind, index_pred, columns), terms), cost
+
+    if best is None:
+        return Select(pred, Scan(table, columns)) if conditions else Scan(table, columns)
+    node, used = best
+    rest = [c for c in conditions if c not in used]
+    return Select(make_conjunction(rest), node) if rest else node
+
+
+def _by_table(refs, tables) -> dict:
+    """Nomes das colunas de `refs` agrupados por tabela."""
+    found = {table: set() for table in tables}
+    for col in refs:
+        if col.table in found:
+            found[col.table].add(col.column)
+    return found
+
+
+def prune_columns(node, required: frozenset):
+    """
+    Push-down de projeções sobre a árvore de junções: cada junção abaixo de
+    `node` que produz colunas não usadas acima dela (`required` mais os
+    predicados das junções ancestrais) ganha um π com apenas as usadas, na
+    ordem em que saem da junção. A raiz fica como está (a projeção final a
+    recorta).
+    """
+    if not isinstance(node, (ThetaJoin, Product)):
+        return node
+    if isinstance(node, ThetaJoin):
+        required = required | frozenset(column_refs(node.predicate))
+    children = []
+    for child in (node.left, node.right):
+        pruned = prune_columns(child, required)
+        if isinstance(child, (ThetaJoin, Product)):
+            produced = output_columns(pruned)
+            kept = tuple(col for col in produced if col in required)
+            if kept and len(kept) < len(produced):
+                pruned = Project(kept, pruned)
+        children.append(pruned)
+    if children == [node.left, node.right]:
+        return node
+    # Mesmo operador físico (e demais campos) sobre os filhos podados
+    fields = dict(zip(node._fields, node._args), left=children[0], right=children[1])
+    return type(node)(*fields.values())
+
+
+@timed('optimize')
+def optimize_algebra(tree, cost_model=None, bushy=True, dp_threshold=DEFAULT_DP_THRESHOLD):
     """
-    Otimiza a expressão de álgebra relacional usando as seguintes heurísticas:
-    
-    1. Aplicar seleções o mais cedo possível (push-down de seleções)
-    2. Aplicar projeções o mais cedo possível (push-down de projeções)
-    3. Ordenar junções da mais restritiva para menos restritiva
+    Otimiza a árvore de álgebra relacional usando as seguintes heurísticas:
+
+    0. Normalizar os predicados (CNF, transitividade, propagação de
+       constantes; ver utils.rewrite): contraditórios, o plano é vazio
+    1. Aplicar seleções o mais cedo possível (push-down de seleções), por
+       índice secundário quando for mais barato que ler a tabela
+    2. Aplicar projeções o mais cedo possível: cada tabela é lida só com as
+       colunas usadas e cada junção descarta as que deixam de ser usadas
+    3. Escolher a ordem de junção de menor custo (ver utils.join_order)
     4. Evitar produtos cartesianos quando possível
     """
-    tables = extract_tables(expression)
-    conditions = extract_conditions(expression)
-    joins = extract_joins(expression)
-    projections = extract_projection(expression)
-    
-    # 1. Mapear condições às tabelas específicas (push-down de seleções)
+    if isinstance(tree, Limit):
+        # O LIMIT permanece no topo, sobre a consulta otimizada
+        return Limit(tree.count, optimize_algebra(tree.child, cost_model, bushy, dp_threshold))
+
+    cost_model = cost_model or StatisticsCostModel()
+    projections = tree.columns if isinstance(tree, Project) else ()
+    tables, conditions = [], []
+    _decompose(tree, tables, conditions)
+
+    # 0. Reescrever WHERE + ON: mais termos de uma tabela só, para o push-down
+    conditions = rewrite_conjuncts(conditions)
+    if conditions is None:
+        # Nenhuma linha satisfaz os predicados: não há o que ler
+        return Empty(output_columns(tree))
+
+    # 1. Classificar cada condição: tabela específica, junção ou global
     table_conditions = {table: [] for table in tables}
     join_conditions = []
     remaining_conditions = []
-    
-    # Classificar cada condição: tabela específica, junção ou global
-    for cond in conditions + joins:
-        table_matches = re.findall(r'(\w+)\.(\w+)', cond)
-        tables_in_condition = {table for table, _ in table_matches}
-        
-        if len(tables_in_condition) == 1:
-            # Condição afeta apenas uma tabela - aplicar diretamente à tabela
-            table = list(tables_in_condition)[0]
-            table_conditions[table].append(cond)
-        elif len(tables_in_condition) == 2 and any(op in cond for op in ['=', '<', '>', '<=', '>=', '<>']):
-            # Condição de junção entre duas tabelas
-            join_conditions.append((cond, tables_in_condition))
-        else:
+    for cond in conditions:
+        refs = column_refs(cond)
+        tables_in_condition = frozenset(col.table for col in refs)
+        if not refs or not tables_in_condition <= table_conditions.keys():
             # Condição que não pode ser empurrada para baixo
             remaining_conditions.append(cond)
-    
-    # 2. Identificar colunas necessárias para cada tabela (push-down de projeções)
-    needed_columns = {table: set() for table in tables}
-    
-    # Colunas no SELECT
-    for proj in projections:
-        if '.' in proj:
-            table, column = proj.split('.')
-            if table in needed_columns:
-                needed_columns[table].add(column)
-    
-    # Colunas em condições (WHERE, JOIN)
-    all_conditions = conditions + joins
-    for cond in all_conditions:
-        matches = re.findall(r'(\w+)\.(\w+)', cond)
-        for table, column in matches:
-            if table in needed_columns:
-                needed_columns[table].add(column)
-    
-    # 3. Aplicar seleções e projeções antecipadas às tabelas base
+        elif len(tables_in_condition) == 1:
+            # Condição afeta apenas uma tabela - aplicar diretamente à tabela
+            table_conditions[next(iter(tables_in_condition))].append(cond)
+        else:
+            join_conditions.append((cond, tables_in_condition))
+
+    # 2. Colunas necessárias acima das tabelas base (push-down de projeções)
+    above = [*projections]
+    for cond in [c for c, _ in join_conditions] + remaining_conditions:
+        above.extend(column_refs(cond))
+    needed_columns = _by_table(above, tables)
+    filter_columns = _by_table([col for conds in table_conditions.values()
+                                for cond in conds for col in column_refs(cond)], tables)
+
+    # 3. Aplicar seleções às tabelas base, lendo só as colunas usadas acima
+    #    ou pelas próprias seleções, e descartar logo as usadas só no filtro
     filtered_tables = {}
     for table in tables:
-        table_expr = table
-        
-        # Aplicar seleção se houver condições para esta tabela
-        if table_conditions[table]:
-            conditions_str = " AND ".join(table_conditions[table])
-            table_expr = f"σ[{conditions_str}]({table_expr})"
-        
-        # Aplicar projeção antecipada se tivermos apenas algumas colunas necessárias
-        if needed_columns[table] and len(needed_columns[table]) < len(METADADOS.get(table, [])):
-            columns_str = ", ".join([f"{table}.{col}" for col in needed_columns[table]])
-            table_expr = f"π[{columns_str}]({table_expr})"
-        
+        schema = METADADOS.get(table, [])
+        read = [col for col in schema if col in needed_columns[table] or col in filter_columns[table]]
+        # Sem nenhuma coluna usada, a primeira ainda dá o número de linhas
+        read = read or schema[:1]
+        table_expr = access_path(table, table_conditions[table], cost_model,
+                                 tuple(read) if len(read) < len(schema) else None)
+        kept = tuple(ColumnRef(table, col) for col in read if col in needed_columns[table])
+        # π só quando há colunas lidas apenas para o filtro a descartar
+        if kept and len(kept) < len(read):
+            table_expr = Project(kept, table_expr)
         filtered_tables[table] = table_expr
-    
-    # 4. Ordenar junções por seletividade (mais restritiva primeiro)
-    sorted_joins = []
-    if join_conditions:
-        # Estimar seletividade para cada junção
-        join_selectivity = []
-        for cond, tbls in join_conditions:
-            # Junções de igualdade são mais seletivas que outras
-            selectivity = 0.1 if '=' in cond else 0.3
-            # Junções em colunas-chave (contendo 'id') são mais seletivas
-            if re.search(r'id\w*', cond, re.IGNORECASE):
-                selectivity *= 0.5
-            join_selectivity.append((cond, tbls, selectivity))
-        
-        # Ordenar junções da mais seletiva (menor valor) para menos seletiva
-        join_selectivity.sort(key=lambda x: x[2])
-        sorted_joins = [(cond, tbls) for cond, tbls, _ in join_selectivity]
-    
-    # 5. Construir a árvore de operadores a partir das junções ordenadas
-    # Começar com a tabela mais restritiva ou a primeira se não houver seleções
-    table_order = list(filtered_tables.keys())
-    
-    # Se temos junções, executar primeiro as mais seletivas
-    join_tree = None
-    processed_tables = set()
-    
-    if sorted_joins:
-        # Identificar a primeira junção e as tabelas envolvidas
-        first_join, first_tables = sorted_joins[0]
-        first_tables = list(first_tables)
-        
-        # Iniciar com as duas tabelas da primeira junção
-        join_tree = f"({filtered_tables[first_tables[0]]} ⨝[{first_join}] {filtered_tables[first_tables[1]]})"
-        processed_tables.update(first_tables)
-        
-        # Adicionar as junções restantes na ordem de seletividade
-        for join_cond, join_tables in sorted_joins[1:]:
-            join_tables = list(join_tables)
-            # Verificar se podemos conectar esta junção com o que já processamos
-            if any(table in processed_tables for table in join_tables):
-                # Encontrar a tabela que ainda não foi processada
-                new_table = next((t for t in join_tables if t not in processed_tables), None)
-                if new_table:
-                    join_tree = f"({join_tree} ⨝[{join_cond}] {filtered_tables[new_table]})"
-                    processed_tables.add(new_table)
-        
-        # Para tabelas que não foram incluídas em nenhuma junção, usar produto cartesiano
-        for table in table_order:
-            if table not in processed_tables:
-                if join_tree:
-                    join_tree = f"({join_tree} × {filtered_tables[table]})"
-                else:
-                    join_tree = filtered_tables[table]
-                processed_tables.add(table)
-    else:
-        # Se não há junções, apenas aplicar produto cartesiano entre tabelas filtradas
-        join_tree = " × ".join([filtered_tables[t] for t in table_order])
-    
+
+    # 4. Ordem de junção por custo (DPccp / guloso), sem produtos cartesianos
+    #    quando o grafo de junção é conexo
+    join_tree = order_joins(tables, filtered_tables, join_conditions,
+                            cost_model, bushy, dp_threshold)
+
+    # 5. Descartar, logo após cada junção, as colunas (chaves já usadas) que
+    #    nenhum operador acima dela precisa
+    top = [*projections]
+    for cond in remaining_conditions:
+        top.extend(column_refs(cond))
+    if projections:
+        join_tree = prune_columns(join_tree, frozenset(top))
+
     # 6. Aplicar condições restantes que não puderam ser empurradas para baixo
     if remaining_conditions:
-        remaining_cond_str = " AND ".join(remaining_conditions)
-        join_tree = f"σ[{remaining_cond_str}]({join_tree})"
-    
-    # 7. Aplicar projeção final
-    if projections:
-        projection_str = ", ".join(projections)
-        join_tree = f"π[{projection_str}]({join_tree})"
-    
+        join_tree = Select(make_conjunction(remaining_conditions), join_tree)
+
+    # 7. Aplicar projeção final (se já não for a própria projeção antecipada)
+    if projections and not (isinstance(join_tree, Project) and join_tree.columns == projections):
+        join_tree = Project(projections, join_tree)
     return join_tree
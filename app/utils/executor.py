@@ -0,0 +1,572 @@
+"""
+Executor colunar em memória para a árvore de operadores otimizada.
+
+Cada relação intermediária é um conjunto de colunas NumPy nomeadas
+'Tabela.Coluna'. Seleções aplicam máscaras booleanas vetorizadas (ver
+utils.predicates), projeções apenas escolhem colunas (sem cópia) e junções
+por igualdade são hash joins sobre as chaves fatoradas ou,
+quando o otimizador assim escolhe, buscas pelo índice de chave da tabela
+interna (index nested loop). Scans leem do arquivo só as colunas pedidas
+pelo otimizador e uma junção logo abaixo de um π copia apenas as colunas
+que ainda são usadas. O tempo e o número de linhas de cada operador são
+registrados para exibição no plano de execução.
+
+Com o cache de resultados (utils.result_cache), o resultado de cada junção
+é guardado e, antes da execução, subárvores cobertas por resultados já
+guardados são trocadas por eles.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from models.db.metadados import METADADOS
+from models.query.ast import ColumnRef, Comparison, conjuncts, make_conjunction, column_refs
+from utils.operators import (
+    Scan, IndexScan, Select, Project, ThetaJoin, HashJoin, IndexNestedLoopJoin, Product, Limit, Empty,
+    Materialized, inner_chain, render,
+)
+from utils.predicates import compile_predicate
+from utils.indexes import build_groups, probe_groups, build_index
+from utils.secondary_indexes import IndexManager
+from utils.profiling import timed, record_operators
+from utils.result_cache import RESULT_CACHE
+
+DATA_DIR = os.environ.get('QUERY_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+class Relation:
+    """Relação colunar: {'Tabela.Coluna': np.ndarray}, todas do mesmo tamanho."""
+    __slots__ = ('columns', 'num_rows')
+
+    def __init__(self, columns: dict, num_rows: int = None):
+        self.columns = columns
+        if num_rows is None:
+            num_rows = len(next(iter(columns.values()))) if columns else 0
+        self.num_rows = num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    def column(self, ref) -> np.ndarray:
+        name = str(ref)
+        array = self.columns.get(name)
+        if array is None:
+            upper = name.upper()
+            array = next((a for n, a in self.columns.items() if n.upper() == upper), None)
+            if array is None:
+                raise KeyError(f"Coluna inexistente na relação: {name}")
+        return array
+
+    def take(self, selector) -> 'Relation':
+        """Linhas por máscara booleana ou vetor de índices."""
+        columns = {name: array[selector] for name, array in self.columns.items()}
+        num_rows = int(selector.sum()) if selector.dtype == bool else len(selector)
+        return Relation(columns, num_rows)
+
+    def slice(self, start: int, stop: int) -> 'Relation':
+        """Faixa contígua de linhas, como visão dos mesmos arrays (sem cópia)."""
+        columns = {name: array[start:stop] for name, array in self.columns.items()}
+        return Relation(columns, max(min(stop, self.num_rows) - start, 0))
+
+    def project(self, refs) -> 'Relation':
+        """Subconjunto de colunas, reaproveitando os mesmos arrays (sem cópia)."""
+        return Relation({str(ref): self.column(ref) for ref in refs}, self.num_rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho aproximado em memória (objetos Python contam 64 bytes cada)."""
+        total = 0
+        for array in self.columns.values():
+            total += array.nbytes
+            if array.dtype == object:
+                total += 64 * len(array)
+        return total
+
+    def to_pandas(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns)
+
+
+def concat_relations(relations, columns=()) -> Relation:
+    """Empilha relações com as mesmas colunas (ou uma relação vazia com `columns`)."""
+    relations = [r for r in relations if len(r)] or list(relations[:1])
+    if not relations:
+        return Relation({str(c): np.empty(0, dtype=object) for c in columns}, 0)
+    if len(relations) == 1:
+        return relations[0]
+    names = relations[0].columns
+    return Relation({name: np.concatenate([r.columns[name] for r in relations]) for name in names})
+
+
+class DataSource:
+    """
+    Carrega as tabelas de METADADOS a partir de <dir>/<Tabela>.parquet ou
+    .csv. A leitura é por coluna: só as colunas pedidas são lidas do arquivo
+    (colunas do Parquet, usecols do CSV) e cada uma fica em cache, na versão
+    colunar, enquanto o arquivo não for modificado.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self._cache = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+        # Índices secundários persistentes (models.db.indices)
+        self.secondary = IndexManager(self)
+
+    def path(self, table: str):
+        for ext in ('.parquet', '.csv'):
+            for name in (table, table.lower()):
+                path = os.path.join(self.data_dir, name + ext)
+                if os.path.exists(path):
+                    return path
+        raise FileNotFoundError(f"Sem arquivo de dados para a tabela {table} em {self.data_dir}")
+
+    def version(self, table: str):
+        """Identifica o conteúdo atual do arquivo (caminho, tamanho, modificação)."""
+        path = self.path(table)
+        info = os.stat(path)
+        return (path, info.st_size, info.st_mtime_ns)
+
+    @staticmethod
+    def _qualified(table: str, name: str) -> str:
+        canonical = {col.upper(): col for col in METADADOS.get(table, [])}
+        return f"{table}.{canonical.get(name.upper(), name)}"
+
+    @classmethod
+    def _relation(cls, table: str, frame: pd.DataFrame) -> Relation:
+        columns = {}
+        for name in frame.columns:
+            array = frame[name].to_numpy()
+            # Arrays compartilhados entre consultas (projeção sem cópia): somente leitura
+            array.flags.writeable = False
+            columns[cls._qualified(table, name)] = array
+        return Relation(columns, len(frame))
+
+    def _entry(self, table: str, version):
+        """
+        (cabeçalho, relação em cache) da versão atual do arquivo. O cabeçalho
+        leva 'Tabela.Coluna' ao nome no arquivo, na ordem do arquivo; a
+        relação tem só as colunas já lidas.
+        """
+        with self._lock:
+            cached = self._cache.get(table)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        path = version[0]
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            names = pq.read_schema(path).names
+        else:
+            names = pd.read_csv(path, nrows=0).columns
+        header = {self._qualified(table, name): name for name in names}
+        relation = Relation({}, None)
+        with self._lock:
+            self._cache[table] = (version, header, relation)
+        return header, relation
+
+    def _names(self, table: str, header: dict, columns) -> list:
+        """Colunas pedidas ('Tabela.Coluna') presentes no arquivo; None pede todas."""
+        if columns is None:
+            return list(header)
+        names = [name for name in (f"{table}.{col}" for col in columns) if name in header]
+        # Sem colunas ainda é preciso saber quantas linhas há: lê só a primeira
+        return names or list(header)[:1]
+
+    @staticmethod
+    def _read(path: str, names):
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path, columns=names)
+        return pd.read_csv(path, usecols=names)
+
+    def load(self, table: str, columns=None) -> Relation:
+        """
+        Tabela inteira ou só as colunas `columns` (nomes sem a tabela), na
+        ordem pedida. Colunas ainda fora do cache são lidas numa única
+        leitura do arquivo.
+        """
+        version = self.version(table)
+        header, relation = self._entry(table, version)
+        names = self._names(table, header, columns)
+        missing = [name for name in names if name not in relation.columns]
+        if missing:
+            loaded = self._relation(table, self._read(version[0], [header[n] for n in missing]))
+            with self._lock:
+                cached = self._cache.get(table)
+                if cached is not None and cached[0] == version:
+                    relation = cached[2]
+                relation = Relation({**relation.columns, **loaded.columns}, len(loaded))
+                self._cache[table] = (version, header, relation)
+        return relation.project(names)
+
+    @staticmethod
+    def _read_rows(path: str, names, positions: np.ndarray) -> pd.DataFrame:
+        """Linhas `positions` (crescentes, sem repetição) do arquivo, só com as colunas `names`."""
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            file = pq.ParquetFile(path)
+            sizes = [file.metadata.row_group(i).num_rows for i in range(file.num_row_groups)]
+            starts = np.concatenate(([0], np.cumsum(sizes)))
+            # Só os grupos de linhas que contêm alguma posição pedida são lidos
+            groups, first = np.unique(np.searchsorted(starts, positions, side='right') - 1, return_index=True)
+            read = np.concatenate(([0], np.cumsum(np.asarray(sizes)[groups])))[:-1]
+            offsets = np.repeat(read - starts[groups], np.diff(np.append(first, len(positions))))
+            table = file.read_row_groups(groups.tolist(), columns=names)
+            return table.take(positions + offsets).to_pandas()
+        # CSV não tem acesso direto: as demais linhas são puladas sem ser convertidas
+        wanted = set(positions.tolist())
+        return pd.read_csv(path, usecols=names, nrows=len(positions),
+                           skiprows=lambda line: line > 0 and line - 1 not in wanted)
+
+    def rows(self, table: str, positions: np.ndarray, columns=None) -> Relation:
+        """
+        Linhas `positions` da tabela (na ordem dada, com repetições), como em
+        load(table, columns).take(positions), mas lendo do arquivo só as
+        linhas pedidas e sem guardá-las no cache; colunas já em cache são
+        recortadas dele.
+        """
+        version = self.version(table)
+        header, relation = self._entry(table, version)
+        names = self._names(table, header, columns)
+        if all(name in relation.columns for name in names):
+            return relation.project(names).take(positions)
+        unique, inverse = np.unique(positions, return_inverse=True)
+        frame = self._read_rows(version[0], [header[n] for n in names], unique)
+        return self._relation(table, frame).project(names).take(inverse)
+
+    def iter_rows(self, table: str, positions: np.ndarray, batch_size: int, columns=None):
+        """
+        Linhas `positions` (crescentes, sem repetição) da tabela em lotes de
+        até `batch_size` linhas, como rows(), numa única passada pelo arquivo:
+        só os grupos de linhas do Parquet que contêm alguma posição, ou só as
+        linhas pedidas do CSV, são convertidas.
+        """
+        version = self.version(table)
+        header, relation = self._entry(table, version)
+        names = self._names(table, header, columns)
+        if all(name in relation.columns for name in names):
+            relation = relation.project(names)
+            for start in range(0, len(positions), batch_size):
+                yield relation.take(positions[start:start + batch_size])
+            return
+
+        path, file_names = version[0], [header[name] for name in names]
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            file = pq.ParquetFile(path)
+            sizes = [file.metadata.row_group(i).num_rows for i in range(file.num_row_groups)]
+            starts = np.concatenate(([0], np.cumsum(sizes)))
+            for group in np.unique(np.searchsorted(starts, positions, side='right') - 1):
+                offset = starts[group]
+                for batch in file.iter_batches(batch_size=batch_size, row_groups=[group], columns=file_names):
+                    lo, hi = np.searchsorted(positions, (offset, offset + batch.num_rows))
+                    if hi > lo:
+                        yield self._relation(table, batch.take(positions[lo:hi] - offset).to_pandas()).project(names)
+                    offset += batch.num_rows
+            return
+        wanted = set(positions.tolist())
+        with pd.read_csv(path, usecols=file_names, nrows=len(positions), chunksize=batch_size,
+                         skiprows=lambda line: line > 0 and line - 1 not in wanted) as reader:
+            for frame in reader:
+                yield self._relation(table, frame).project(names)
+
+    def column(self, table: str, column: str) -> np.ndarray:
+        """Coluna inteira: do cache, se já lida, ou do arquivo sem entrar no cache."""
+        version = self.version(table)
+        header, relation = self._entry(table, version)
+        name = f"{table}.{column}"
+        if name in relation.columns:
+            return relation.column(name)
+        return self._relation(table, self._read(version[0], [header[name]])).column(name)
+
+    def index(self, table: str, column: str, kind: str):
+        """
+        Índice de chave (hash/ordenado) da coluna, refeito quando o arquivo
+        muda. A coluna é lida só para construí-lo, sem entrar no cache.
+        """
+        version = self.version(table)
+        key = (table, column, kind)
+        with self._lock:
+            cached = self._indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = build_index(self.column(table, column), kind)
+        with self._lock:
+            self._indexes[key] = (version, index)
+        return index
+
+    def iter_batches(self, table: str, batch_size: int, columns=None):
+        """
+        Lê a tabela (ou só as colunas `columns`) em lotes de até `batch_size`
+        linhas sem carregá-la inteira: fatias da versão em cache, se já tem
+        essas colunas, ou leitura incremental do arquivo.
+        """
+        version = self.version(table)
+        header, relation = self._entry(table, version)
+        names = self._names(table, header, columns)
+        if all(name in relation.columns for name in names):
+            relation = relation.project(names)
+            for start in range(0, len(relation), batch_size):
+                yield relation.slice(start, start + batch_size)
+            return
+
+        path, file_names = version[0], [header[name] for name in names]
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=file_names):
+                yield self._relation(table, batch.to_pandas()).project(names)
+        else:
+            with pd.read_csv(path, chunksize=batch_size, usecols=file_names) as reader:
+                for frame in reader:
+                    yield self._relation(table, frame).project(names)
+
+
+@dataclass
+class OperatorStats:
+    """Métricas de um operador executado."""
+    step: int
+    operator: str
+    detail: str
+    rows: int
+    seconds: float
+
+
+@dataclass
+class ExecutionResult:
+    relation: Relation
+    operators: list = field(default_factory=list)
+    tree: object = None        # árvore executada (com as subárvores reaproveitadas do cache)
+
+    @property
+    def seconds(self) -> float:
+        return sum(op.seconds for op in self.operators)
+
+
+# Avaliação de predicados
+def evaluate(pred, relation: Relation) -> np.ndarray:
+    """Máscara booleana do predicado (compilado e memorizado) sobre a relação."""
+    return compile_predicate(pred)(relation)
+
+
+def index_scan(node: IndexScan, source) -> Relation:
+    """
+    Linhas da tabela que satisfazem o predicado, lendo do arquivo apenas as
+    candidatas do índice secundário (sem índice utilizável, filtra a tabela
+    inteira).
+    """
+    rows = source.secondary.search(node.table, node.column, node.predicate)
+    if rows is None:
+        relation = source.load(node.table, node.columns)
+    else:
+        relation = source.rows(node.table, rows, node.columns)
+    return relation.take(evaluate(node.predicate, relation))
+
+
+# Junções
+def _equi_keys(pred, left: Relation, right: Relation):
+    """Separa `esquerda.col = direita.col` (chaves do hash join) do restante."""
+    keys, residual = [], []
+    for term in conjuncts(pred):
+        if (isinstance(term, Comparison) and term.op == '='
+                and isinstance(term.left, ColumnRef) and isinstance(term.right, ColumnRef)):
+            a, b = str(term.left), str(term.right)
+            if a in left.columns and b in right.columns:
+                keys.append((term.left, term.right))
+                continue
+            if b in left.columns and a in right.columns:
+                keys.append((term.right, term.left))
+                continue
+        residual.append(term)
+    return keys, make_conjunction(residual)
+
+
+def _key_codes(left_arrays, right_arrays):
+    """
+    Fatora as chaves dos dois lados na mesma tabela hash: cada combinação de
+    valores vira um código inteiro em [0, num_codes); nulos viram -1.
+    """
+    n = len(left_arrays[0])
+    combined, null = None, None
+    for l_arr, r_arr in zip(left_arrays, right_arrays):
+        codes, uniques = pd.factorize(np.concatenate([l_arr, r_arr]))
+        null = codes < 0 if null is None else null | (codes < 0)
+        combined = codes if combined is None else combined * (len(uniques) + 1) + codes
+    num_codes = len(uniques)
+    if len(left_arrays) > 1:
+        # Chaves compostas: recompacta os códigos para caber em bincount
+        combined, uniques = pd.factorize(combined)
+        num_codes = len(uniques)
+    combined = np.where(null, -1, combined)
+    return combined[:n], combined[n:], num_codes
+
+
+def hash_join_indices(build_codes, probe_codes, num_codes):
+    """
+    Índices (build, probe) dos pares com a mesma chave: a construção agrupa o
+    build por código e a sondagem expande cada linha pelo seu grupo.
+    """
+    return probe_groups(build_groups(build_codes, num_codes), probe_codes)
+
+
+def join_columns(output, pred):
+    """
+    Colunas que uma junção precisa copiar: as usadas acima dela (`output`,
+    nomes 'Tabela.Coluna') e as do predicado avaliado sobre o resultado.
+    None (sem π acima) copia todas.
+    """
+    if output is None:
+        return None
+    return output | {str(col) for col in column_refs(pred)}
+
+
+def concat_columns(left: Relation, right: Relation, left_idx, right_idx, names=None) -> Relation:
+    """Pares de linhas dos dois lados; só as colunas `names`, se informadas."""
+    columns = {name: array[left_idx] for name, array in left.columns.items()
+               if names is None or name in names}
+    columns.update({name: array[right_idx] for name, array in right.columns.items()
+                    if names is None or name in names})
+    return Relation(columns, len(left_idx))
+
+
+def hash_join(left: Relation, right: Relation, pred, build: str = None, output=None) -> Relation:
+    """
+    Hash join; `build` ('left'/'right') fixa o lado da tabela hash, senão é
+    usado o lado com menos linhas. Sem chaves de igualdade, vira nested loop.
+    Com `output`, as colunas que nenhum operador acima usa não são copiadas.
+    """
+    keys, residual = _equi_keys(pred, left, right)
+    if not keys:
+        result = cross_product(left, right, join_columns(output, pred))
+        return result.take(evaluate(pred, result)) if pred is not None else result
+
+    left_codes, right_codes, num_codes = _key_codes(
+        [left.column(l) for l, _ in keys], [right.column(r) for _, r in keys])
+    if build is None:
+        build = 'right' if len(right) <= len(left) else 'left'
+    if build == 'right':
+        right_idx, left_idx = hash_join_indices(right_codes, left_codes, num_codes)
+    else:
+        left_idx, right_idx = hash_join_indices(left_codes, right_codes, num_codes)
+    result = concat_columns(left, right, left_idx, right_idx, join_columns(output, residual))
+    if residual is not None:
+        result = result.take(evaluate(residual, result))
+    return result
+
+
+def index_join(outer: Relation, node: IndexNestedLoopJoin, source, output=None) -> Relation:
+    """
+    Index nested loop join: busca cada chave de `outer` no índice da tabela
+    interna e aplica às linhas encontradas as seleções/projeções do lado de
+    dentro e, por fim, o restante do predicado.
+    """
+    table, chain = inner_chain(node)
+    scan = chain[-1].child if chain else node.right
+    index = source.index(table, node.key.column, node.kind)
+    inner_idx, outer_idx = index.lookup(outer.column(node.outer_key))
+    inner = source.rows(table, inner_idx, scan.columns)
+    for wrapper in reversed(chain):
+        if isinstance(wrapper, Select):
+            mask = evaluate(wrapper.predicate, inner)
+            inner, outer_idx = inner.take(mask), outer_idx[mask]
+        else:
+            inner = inner.project(wrapper.columns)
+    residual = make_conjunction([
+        term for term in conjuncts(node.predicate)
+        if not (isinstance(term, Comparison) and term.op == '='
+                and node.key in (term.left, term.right) and node.outer_key in (term.left, term.right))
+    ])
+    result = concat_columns(outer, inner, outer_idx, np.arange(len(inner)), join_columns(output, residual))
+    if residual is not None:
+        result = result.take(evaluate(residual, result))
+    return result
+
+
+def cross_product(left: Relation, right: Relation, names=None) -> Relation:
+    left_idx = np.repeat(np.arange(len(left)), len(right))
+    right_idx = np.tile(np.arange(len(right)), len(left))
+    return concat_columns(left, right, left_idx, right_idx, names)
+
+
+# Execução
+class Executor:
+    """
+    Avalia a árvore de baixo para cima, medindo cada operador. Com `results`
+    (None desliga), reaproveita e guarda resultados de junções.
+    """
+
+    def __init__(self, source: DataSource = None, results=RESULT_CACHE):
+        self.source = source or DATA_SOURCE
+        self.results = results if results is not None and results.enabled else None
+        self.versions = {}
+
+    @timed('execute')
+    def execute(self, tree) -> ExecutionResult:
+        operators = []
+        if self.results is not None:
+            tree = self.results.reuse(tree, self.source)
+            # Versões lidas antes da execução: um arquivo alterado durante ela invalida a entrada
+            self.versions = self.results.versions(tree, self.source)
+        relation = self._run(tree, operators)
+        record_operators(operators)
+        return ExecutionResult(relation, operators, tree)
+
+    def _run(self, node, operators, output=None) -> Relation:
+        begin = time.perf_counter()
+        cached, loading = None, 0.0
+        if isinstance(node, Materialized):
+            cached = self.results.load(node.key, self.source) if self.results is not None else None
+            loading = time.perf_counter() - begin
+            # Entrada fora do cache (ou dados alterados): executa a subárvore original
+            children = (node.source,) if cached is None else ()
+        elif isinstance(node, IndexNestedLoopJoin):
+            # O lado interno do index join não é executado: é lido pelo índice
+            children = (node.left,)
+        else:
+            children = node.children
+        # Junção logo abaixo de um π copia só as colunas projetadas
+        projected = {str(col) for col in node.columns} if isinstance(node, Project) else None
+        inputs = [self._run(child, operators, projected) for child in children]
+        start = time.perf_counter()
+        if isinstance(node, Scan):
+            result, name, detail = self.source.load(node.table, node.columns), 'Scan', node.table
+        elif isinstance(node, IndexScan):
+            result, name, detail = index_scan(node, self.source), 'Index scan', str(node.predicate)
+        elif isinstance(node, Select):
+            result, name, detail = inputs[0].take(evaluate(node.predicate, inputs[0])), 'Seleção σ', str(node.predicate)
+        elif isinstance(node, Project):
+            result, name, detail = inputs[0].project(node.columns), 'Projeção π', ', '.join(map(str, node.columns))
+        elif isinstance(node, IndexNestedLoopJoin):
+            result, name, detail = index_join(inputs[0], node, self.source, output), 'Index nested loop ⨝', str(node.predicate)
+        elif isinstance(node, HashJoin):
+            result, name, detail = hash_join(inputs[0], inputs[1], node.predicate, node.build, output), 'Hash join ⨝', str(node.predicate)
+        elif isinstance(node, ThetaJoin):
+            result, name, detail = hash_join(inputs[0], inputs[1], node.predicate, output=output), 'Junção ⨝', str(node.predicate)
+        elif isinstance(node, Product):
+            result, name, detail = cross_product(inputs[0], inputs[1], output), 'Produto ×', render(node)
+        elif isinstance(node, Limit):
+            count = min(node.count, len(inputs[0]))
+            result, name, detail = inputs[0].take(np.arange(count)), 'Limite', str(node.count)
+        elif isinstance(node, Empty):
+            result, name, detail = concat_relations([], node.columns), 'Vazio', render(node)
+        elif isinstance(node, Materialized):
+            result = cached if cached is not None else inputs[0]
+            if node.residual is not None:
+                result = result.take(evaluate(node.residual, result))
+            result, name, detail = result.project(node.columns), 'Resultado materializado', render(node)
+        else:
+            raise TypeError(f"Operador não suportado: {type(node).__name__}")
+        elapsed = time.perf_counter() - start + loading
+        operators.append(OperatorStats(len(operators) + 1, name, detail, len(result), elapsed))
+        if self.results is not None and isinstance(node, (ThetaJoin, Product)):
+            self.results.store(node, result, time.perf_counter() - begin, self.versions, self.source)
+        return result
+
+
+def execute(tree, source: DataSource = None, results=RESULT_CACHE) -> ExecutionResult:
+    return Executor(source, results).execute(tree)
+
+
+# Fonte de dados padrão do processo (app/data ou $QUERY_DATA_DIR)
+DATA_SOURCE = DataSource()
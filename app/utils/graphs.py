@@ -1,106 +1,203 @@
-import networkx as nx
-import matplotlib.pyplot as plt
-import streamlit as st
-from utils.algebra import extract_tables, extract_conditions, extract_joins, extract_projection
-
-class Graph:
-    def __init__(self):
-        self.G = nx.DiGraph()
-    
-    def build_operator_graph(self, parsed_query):
-        """
-        Constrói o grafo de operadores com base na consulta parseada.
-        Retorna uma figura matplotlib para exibição no Streamlit.
-        """
-        # Limpar grafo existente
-        self.G.clear()
-        
-        # Extrair informações da consulta
-        tables = [parsed_query['from']] + [j['table'] for j in parsed_query['joins']]
-        join_conditions = [j['condition'] for j in parsed_query['joins']]
-        where_condition = parsed_query.get('where', '')
-        projection_cols = parsed_query.get('select', [])
-        
-        # Adicionar nós para as tabelas (folhas)
-        for i, table in enumerate(tables):
-            self.G.add_node(f"Table: {table}", type="table", level=0, pos=(i*2, 0))
-        
-        # Adicionar nós para joins, se houver
-        if join_conditions:
-            prev_node = f"Table: {tables[0]}"
-            for i, (table, condition) in enumerate(zip(tables[1:], join_conditions)):
-                join_node = f"Join: {condition}"
-                self.G.add_node(join_node, type="join", level=1, pos=(i, 1))
-                self.G.add_edge(prev_node, join_node)
-                self.G.add_edge(f"Table: {table}", join_node)
-                prev_node = join_node
-        else:
-            # Caso só haja uma tabela sem joins
-            prev_node = f"Table: {tables[0]}"
-        
-        # Adicionar nó para condição WHERE, se houver
-        if where_condition:
-            where_node = f"Where: {where_condition}"
-            self.G.add_node(where_node, type="selection", level=2, pos=(len(tables)/2, 2))
-            self.G.add_edge(prev_node, where_node)
-            prev_node = where_node
-        
-        # Adicionar nó para projeção (SELECT)
-        proj_cols = ", ".join(projection_cols)
-        proj_node = f"Project: {proj_cols}"
-        self.G.add_node(proj_node, type="projection", level=3, pos=(len(tables)/2, 3))
-        self.G.add_edge(prev_node, proj_node)
-        
-        # Criar figura para visualização
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Definir posições dos nós para layout em níveis
-        pos = {}
-        for node in self.G.nodes:
-            attrs = self.G.nodes[node]
-            level = attrs.get('level', 0)
-            x_pos = attrs.get('pos', (0, 0))[0]
-            pos[node] = (x_pos, level)
-        
-        # Definir cores para os diferentes tipos de nós
-        colors = []
-        for node in self.G.nodes:
-            node_type = self.G.nodes[node].get('type', '')
-            if node_type == 'table':
-                colors.append('lightblue')
-            elif node_type == 'join':
-                colors.append('lightgreen')
-            elif node_type == 'selection':
-                colors.append('salmon')
-            elif node_type == 'projection':
-                colors.append('gold')
+"""
+Grafo de operadores da consulta, construído a partir da árvore otimizada
+(utils.operators): um nó por operador físico, com as tabelas nas folhas e o
+resultado na raiz.
+
+Os nós da árvore são hash-consed, então o próprio plano serve de chave: o
+grafo (com o layout em níveis, calculado uma única vez) e cada renderização
+(bytes SVG/PNG, fonte DOT, figura Plotly) ficam em caches LRU limitados e
+são reaproveitados por todas as sessões que chegam ao mesmo plano.
+
+A renderização usa matplotlib.figure.Figure diretamente, sem pyplot: nenhuma
+figura fica registrada globalmente e a memória não cresce com o tráfego.
+Graphviz (desenhado no navegador pelo Streamlit a partir da fonte DOT) e
+Plotly (interativo, se instalado) são alternativas opcionais. matplotlib e
+plotly só são importados na primeira renderização.
+"""
+import importlib.util
+import io
+import os
+import textwrap
+from dataclasses import dataclass
+from functools import lru_cache
+from utils.profiling import timed
+from utils.operators import (
+    Scan, IndexScan, Select, Project, ThetaJoin, HashJoin, IndexNestedLoopJoin, Product, Limit, Empty,
+    Materialized,
+)
+
+GRAPH_CACHE_SIZE = int(os.environ.get('GRAPH_CACHE_SIZE', 64))
+
+# Cores por tipo de nó
+COLORS = {
+    'table': 'lightblue',
+    'join': 'lightgreen',
+    'selection': 'salmon',
+    'projection': 'gold',
+    'other': 'lightgray',
+}
+
+_LABEL_WIDTH = 28
+
+
+@dataclass(frozen=True)
+class GraphNode:
+    id: int
+    label: str
+    type: str
+    x: float
+    y: float
+    children: tuple     # ids dos nós de entrada
+
+
+def _describe(node) -> tuple:
+    """(rótulo, tipo) do operador."""
+    if isinstance(node, Scan):
+        return node.table, 'table'
+    if isinstance(node, IndexScan):
+        kind = 'ordenado' if node.kind == 'sorted' else node.kind
+        return f"{node.table} (índice {kind}): σ {node.predicate}", 'table'
+    if isinstance(node, Select):
+        return f"σ {node.predicate}", 'selection'
+    if isinstance(node, Project):
+        return f"π {', '.join(map(str, node.columns))}", 'projection'
+    if isinstance(node, IndexNestedLoopJoin):
+        return f"⋈ index nested loop: {node.predicate}", 'join'
+    if isinstance(node, HashJoin):
+        return f"⋈ hash join: {node.predicate}", 'join'
+    if isinstance(node, ThetaJoin):
+        return f"⋈ nested loop: {node.predicate}", 'join'
+    if isinstance(node, Product):
+        return "× produto cartesiano", 'join'
+    if isinstance(node, Limit):
+        return f"LIMIT {node.count}", 'other'
+    if isinstance(node, Empty):
+        return "∅ resultado vazio", 'other'
+    if isinstance(node, Materialized):
+        residual = f": σ {node.residual}" if node.residual is not None else ''
+        return f"{' ⋈ '.join(node.source.tables())} (materializado){residual}", 'table'
+    raise TypeError(f"Operador desconhecido: {type(node).__name__}")
+
+
+class OperatorGraph:
+    """
+    Nós do plano com posições de um layout em árvore: cada folha ocupa uma
+    coluna, o pai fica centrado sobre os filhos e a altura é a profundidade
+    (raiz no topo).
+    """
+
+    def __init__(self, tree):
+        self.nodes = []
+        next_x = 0
+
+        def visit(node, depth):
+            nonlocal next_x
+            children = tuple(visit(child, depth + 1) for child in node.children)
+            if children:
+                x = sum(self.nodes[c].x for c in children) / len(children)
             else:
-                colors.append('gray')
-        
-        # Desenhar grafo
-        nx.draw(self.G, pos, with_labels=True, node_color=colors, 
-                node_size=3000, font_size=8, ax=ax, arrows=True)
-        
-        plt.title("Grafo de Operadores da Consulta")
-        
+                x, next_x = float(next_x), next_x + 1
+            label, kind = _describe(node)
+            label = '\n'.join(textwrap.wrap(label, _LABEL_WIDTH, break_long_words=False)) or label
+            self.nodes.append(GraphNode(len(self.nodes), label, kind, x, -float(depth), children))
+            return len(self.nodes) - 1
+
+        visit(tree, 0)
+        self.width = max(next_x, 1)
+        self.depth = int(-min(n.y for n in self.nodes)) + 1
+
+    @property
+    def edges(self):
+        """Arestas (entrada -> operador), no sentido do fluxo dos dados."""
+        return [(child, node.id) for node in self.nodes for child in node.children]
+
+    def to_dot(self) -> str:
+        """Fonte Graphviz (dot) do grafo."""
+        lines = ['digraph plano {', '  rankdir=BT;',
+                 '  node [shape=box, style="rounded,filled", fontsize=10];']
+        for node in self.nodes:
+            label = node.label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            lines.append(f'  n{node.id} [label="{label}", fillcolor="{COLORS[node.type]}"];')
+        lines.extend(f'  n{a} -> n{b};' for a, b in self.edges)
+        lines.append('}')
+        return '\n'.join(lines)
+
+    def to_image(self, fmt: str = 'svg') -> bytes:
+        """Imagem (svg ou png) desenhada com matplotlib, sem estado global do pyplot."""
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(max(2.6 * self.width, 6), max(1.4 * self.depth, 3)))
+        try:
+            ax = fig.subplots()
+            ax.set_axis_off()
+            ax.set_xlim(-0.7, self.width - 0.3)
+            ax.set_ylim(-self.depth + 0.5, 0.6)
+            for child, parent in self.edges:
+                a, b = self.nodes[child], self.nodes[parent]
+                ax.annotate('', xy=(b.x, b.y), xytext=(a.x, a.y),
+                            arrowprops=dict(arrowstyle='->', color='gray', shrinkA=14, shrinkB=14))
+            for node in self.nodes:
+                ax.text(node.x, node.y, node.label, ha='center', va='center', fontsize=8,
+                        bbox=dict(boxstyle='round', fc=COLORS[node.type], ec='gray'))
+            ax.set_title("Grafo de Operadores da Consulta")
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=fmt, bbox_inches='tight')
+            return buffer.getvalue()
+        finally:
+            fig.clear()
+
+    def to_plotly(self):
+        """Figura Plotly interativa (requer o pacote plotly)."""
+        import plotly.graph_objects as go
+
+        edge_x, edge_y = [], []
+        for child, parent in self.edges:
+            a, b = self.nodes[child], self.nodes[parent]
+            edge_x += [a.x, b.x, None]
+            edge_y += [a.y, b.y, None]
+        fig = go.Figure([
+            go.Scatter(x=edge_x, y=edge_y, mode='lines', hoverinfo='skip',
+                       line=dict(color='gray', width=1)),
+            go.Scatter(x=[n.x for n in self.nodes], y=[n.y for n in self.nodes],
+                       mode='markers+text', textposition='top center',
+                       text=[n.label.replace('\n', '<br>') for n in self.nodes],
+                       hovertext=[n.label.replace('\n', ' ') for n in self.nodes], hoverinfo='text',
+                       marker=dict(size=18, color=[COLORS[n.type] for n in self.nodes],
+                                   line=dict(color='gray', width=1))),
+        ])
+        fig.update_layout(title="Grafo de Operadores da Consulta", showlegend=False,
+                          xaxis=dict(visible=False), yaxis=dict(visible=False),
+                          margin=dict(l=10, r=10, t=40, b=10))
         return fig
-    
-    def generate_execution_plan(self):
-        """
-        Gera o plano de execução com base no grafo de operadores.
-        Retorna uma lista de passos de execução.
-        """
-        # Usar a ordem topológica invertida para determinar a ordem de execução
-        steps = []
-        for i, node in enumerate(reversed(list(nx.topological_sort(self.G)))):
-            node_type = self.G.nodes[node].get('type', '')
-            if node_type == 'table':
-                steps.append(f"{i+1}. Ler tabela: {node.replace('Table: ', '')}")
-            elif node_type == 'join':
-                steps.append(f"{i+1}. Executar junção: {node.replace('Join: ', '')}")
-            elif node_type == 'selection':
-                steps.append(f"{i+1}. Aplicar filtro WHERE: {node.replace('Where: ', '')}")
-            elif node_type == 'projection':
-                steps.append(f"{i+1}. Projetar colunas: {node.replace('Project: ', '')}")
-        
-        return steps
\ No newline at end of file
+
+
+@lru_cache(maxsize=GRAPH_CACHE_SIZE)
+@timed('graph')
+def operator_graph(tree) -> OperatorGraph:
+    """Grafo do plano, construído uma vez por plano."""
+    return OperatorGraph(tree)
+
+
+@lru_cache(maxsize=GRAPH_CACHE_SIZE)
+@timed('render')
+def render_graph(tree, fmt: str = 'svg'):
+    """
+    Renderização do grafo do plano em cache: bytes para 'svg'/'png', a fonte
+    DOT para 'dot' e a figura para 'plotly'.
+    """
+    graph = operator_graph(tree)
+    if fmt == 'dot':
+        return graph.to_dot()
+    if fmt == 'plotly':
+        return graph.to_plotly()
+    if fmt in ('svg', 'png'):
+        return graph.to_image(fmt)
+    raise ValueError(f"Formato de grafo desconhecido: {fmt}")
+
+
+def available_backends() -> list:
+    """Renderizações disponíveis: matplotlib e Graphviz sempre; Plotly se instalado."""
+    backends = ['matplotlib', 'graphviz']
+    if importlib.util.find_spec('plotly') is not None:
+        backends.append('plotly')
+    return backends
@@ -0,0 +1,121 @@
+"""
+Tabelas hash e índices de chave.
+
+build_groups/probe_groups são as fases de construção e sondagem usadas
+pelos hash joins. Sobre elas, os índices das colunas declaradas em
+CHAVES_PRIMARIAS e CHAVES_ESTRANGEIRAS atendem o index nested loop join:
+
+- chave primária de uma coluna: índice hash (valor -> posição);
+- chave estrangeira (ou parte de chave composta): índice ordenado, em que
+  cada valor corresponde a uma faixa contígua de posições.
+
+Os dois tipos respondem `lookup(chaves)` com os pares (linha da tabela,
+posição da chave consultada), no mesmo formato da sondagem do hash join.
+"""
+import numpy as np
+import pandas as pd
+from models.db.indices import index_kind
+
+
+def build_groups(build_codes, num_codes):
+    """Fase de construção: linhas do build agrupadas por código (contagens, ordem, inícios)."""
+    valid_build = build_codes >= 0
+    counts = np.bincount(build_codes[valid_build], minlength=num_codes)
+    order = np.argsort(np.where(valid_build, build_codes, num_codes), kind='stable')
+    starts = np.cumsum(counts) - counts
+    return counts, order, starts
+
+
+def probe_groups(groups, probe_codes):
+    """Fase de sondagem: índices (build, probe) dos pares com o mesmo código."""
+    counts, order, starts = groups
+    probe_valid = probe_codes >= 0
+    probe_rows = np.nonzero(probe_valid)[0]
+    probe_keys = probe_codes[probe_valid]
+    matches = counts[probe_keys]
+    total = int(matches.sum())
+
+    probe_idx = np.repeat(probe_rows, matches)
+    group_start = np.repeat(np.cumsum(matches) - matches, matches)
+    offsets = np.arange(total) - group_start
+    build_idx = order[np.repeat(starts[probe_keys], matches) + offsets]
+    return build_idx, probe_idx
+
+
+def _nbytes(array) -> int:
+    """Tamanho aproximado em memória (objetos Python contam 64 bytes cada, como em Relation)."""
+    return array.nbytes + (64 * len(array) if array.dtype == object else 0)
+
+
+def _key_index(arrays):
+    null = pd.isna(arrays[0])
+    for array in arrays[1:]:
+        null = null | pd.isna(array)
+    index = pd.Index(arrays[0]) if len(arrays) == 1 else pd.MultiIndex.from_arrays(arrays)
+    return index, null
+
+
+class HashIndex:
+    """Tabela hash: um código por chave distinta (nulos não entram)."""
+    kind = 'hash'
+
+    def __init__(self, *arrays):
+        index, null = _key_index(arrays)
+        self.keys = index[~null].unique()
+        codes = self.keys.get_indexer(index)
+        codes[null] = -1
+        self.groups = build_groups(codes, len(self.keys))
+        self.unique = len(self.keys) == int(np.count_nonzero(~null))
+
+    @property
+    def nbytes(self) -> int:
+        keys = [self.keys.get_level_values(i) for i in range(self.keys.nlevels)]
+        return sum(_nbytes(np.asarray(array)) for array in (*keys, *self.groups))
+
+    def lookup(self, *arrays):
+        """Índices (linha da tabela, posição consultada) das chaves iguais."""
+        index, null = _key_index(arrays)
+        codes = self.keys.get_indexer(index)
+        codes[null] = -1
+        if self.unique:
+            # Chave primária: no máximo uma linha por valor
+            probe_idx = np.flatnonzero(codes >= 0)
+            return self.groups[1][self.groups[2][codes[probe_idx]]], probe_idx
+        return probe_groups(self.groups, codes)
+
+
+class SortedIndex:
+    """Posições ordenadas pelo valor da chave; busca binária por faixa."""
+    kind = 'sorted'
+
+    def __init__(self, values):
+        present = np.flatnonzero(~pd.isna(values))
+        order = np.argsort(values[present], kind='stable')
+        self.rows = present[order]
+        self.values = values[self.rows]
+
+    @property
+    def nbytes(self) -> int:
+        return _nbytes(self.rows) + _nbytes(self.values)
+
+    def lookup(self, keys):
+        """Índices (linha da tabela, posição consultada) das chaves iguais."""
+        keys = np.asarray(keys)
+        valid = np.flatnonzero(~pd.isna(keys))
+        lo = np.searchsorted(self.values, keys[valid], side='left')
+        hi = np.searchsorted(self.values, keys[valid], side='right')
+        matches = hi - lo
+        total = int(matches.sum())
+        probe_idx = np.repeat(valid, matches)
+        offsets = np.arange(total) - np.repeat(np.cumsum(matches) - matches, matches)
+        return self.rows[np.repeat(lo, matches) + offsets], probe_idx
+
+
+def build_index(values, kind: str):
+    if kind == 'sorted':
+        try:
+            return SortedIndex(values)
+        except TypeError:
+            # Tipos misturados não ordenáveis: o índice hash atende as mesmas buscas
+            pass
+    return HashIndex(values)
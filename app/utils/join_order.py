@@ -0,0 +1,443 @@
+"""
+Enumeração de ordens de junção baseada em custo.
+
+As tabelas e os predicados de junção (JOIN ON) formam o grafo de junção.
+Para até `dp_threshold` tabelas, a melhor árvore (bushy ou left-deep) é
+encontrada por programação dinâmica sobre pares de subgrafos conexos
+(DPccp), de modo que apenas subconjuntos conexos são combinados e nenhum
+produto cartesiano é gerado quando existe um plano conexo. Acima do limite,
+usa-se a heurística gulosa GOO (Greedy Operator Ordering).
+
+Cada junção recebe também o operador físico de menor custo: hash join com
+construção sobre o lado de menor cardinalidade estimada ou, quando o lado
+de dentro é uma tabela base com índice de chave (PK/FK declaradas), index
+nested loop join, que dispensa a leitura completa dessa tabela.
+"""
+import math
+from models.db.estatisticas import ESTATISTICAS
+from models.query.ast import ColumnRef, Comparison, BoolOp, conjuncts, make_conjunction, column_refs
+from utils.operators import (Scan, IndexScan, Select, Project, ThetaJoin, HashJoin, IndexNestedLoopJoin,
+                             Product, Limit, Empty, inner_chain)
+from models.db.indices import index_kind
+from utils.profiling import timed
+
+DEFAULT_DP_THRESHOLD = 10
+
+
+def comparisons(pred) -> list:
+    """Predicados atômicos de uma expressão AND/OR."""
+    if isinstance(pred, Comparison):
+        return [pred]
+    if isinstance(pred, BoolOp):
+        return [c for arg in pred.args for c in comparisons(arg)]
+    return []
+
+
+class CostModel:
+    """
+    Modelo de custo plugável. Esta implementação base usa apenas heurísticas
+    sobre o texto dos predicados (sem estatísticas): N linhas por tabela,
+    seletividade 0.1 para igualdade e 0.3 para as demais comparações, metade
+    disso quando envolvem colunas-chave (idX / X_idX).
+
+    O custo de um plano é C_out (a soma das cardinalidades intermediárias)
+    mais o custo físico de cada operador: linhas lidas das tabelas base,
+    construção/sondagem dos hash joins e buscas dos index joins.
+    """
+    default_rows = 1000
+
+    # Custos físicos por linha
+    scan_row_cost = 1.0
+    hash_build_cost = 2.0
+    hash_probe_cost = 1.0
+    nested_loop_cost = 1.0
+    index_lookup_cost = 1.0
+    index_fetch_cost = 1.0
+
+    def _selectivity(self, pred) -> float:
+        ops = [c.op for c in comparisons(pred)]
+        selectivity = 0.1 if ops and all(op == '=' for op in ops) else 0.3
+        if any(col.column.lower().startswith('id') or '_id' in col.column.lower()
+               for col in column_refs(pred)):
+            selectivity *= 0.5
+        return selectivity
+
+    def base_rows(self, table: str) -> float:
+        return float(self.default_rows)
+
+    def scan_cardinality(self, table: str, node) -> float:
+        """Linhas estimadas da entrada (tabela base com seleções empurradas)."""
+        rows = self.base_rows(table)
+        while node.children:
+            if isinstance(node, Select):
+                rows *= self.filter_selectivity(table, node.predicate)
+            node = node.children[0]
+        if isinstance(node, IndexScan):
+            rows *= self.filter_selectivity(table, node.predicate)
+        return max(rows, 1.0)
+
+    def filter_selectivity(self, table: str, pred) -> float:
+        return self._selectivity(pred)
+
+    def join_selectivity(self, pred, left_tables, right_tables) -> float:
+        return self._selectivity(pred)
+
+    def join_cost(self, left, right, out_rows: float) -> float:
+        return out_rows
+
+    def scan_cost(self, table: str) -> float:
+        return self.base_rows(table) * self.scan_row_cost
+
+    def index_scan_cost(self, table: str, pred, kind: str) -> float:
+        """Busca no índice secundário (log n) e leitura das linhas encontradas."""
+        rows = self.base_rows(table)
+        matched = rows * self.filter_selectivity(table, pred)
+        return max(math.log2(max(rows, 1.0)), 1.0) * self.index_lookup_cost + matched * self.index_fetch_cost
+
+    def access_cost(self, table: str, node) -> float:
+        """Custo de leitura da entrada: scan completo ou busca pelo índice."""
+        while node.children:
+            node = node.children[0]
+        if isinstance(node, IndexScan):
+            return self.index_scan_cost(table, node.predicate, node.kind)
+        return self.scan_cost(table)
+
+    def hash_join_cost(self, build_rows: float, probe_rows: float) -> float:
+        return build_rows * self.hash_build_cost + probe_rows * self.hash_probe_cost
+
+    def nested_loop_join_cost(self, left_rows: float, right_rows: float) -> float:
+        return left_rows * right_rows * self.nested_loop_cost
+
+    def index_join_cost(self, outer_rows: float, fetched_rows: float, kind: str, table_rows: float) -> float:
+        """Uma busca por linha externa (log n no índice ordenado) e a leitura das linhas encontradas."""
+        lookup = 1.0 if kind == 'hash' else max(math.log2(max(table_rows, 1.0)), 1.0)
+        return outer_rows * lookup * self.index_lookup_cost + fetched_rows * self.index_fetch_cost
+
+
+class StatisticsCostModel(CostModel):
+    """
+    Modelo de custo alimentado pelo catálogo de estatísticas: cardinalidade
+    real das tabelas e seletividades por MCV/histograma/valores distintos.
+    Tabelas ou colunas sem estatísticas caem nas heurísticas de CostModel.
+    """
+
+    def __init__(self, catalog=ESTATISTICAS):
+        self.catalog = catalog
+
+    def base_rows(self, table: str) -> float:
+        rows = self.catalog.row_count(table)
+        return float(rows) if rows is not None else super().base_rows(table)
+
+    def filter_selectivity(self, table: str, pred) -> float:
+        return self.catalog.selectivity(pred, self._selectivity)
+
+    def join_selectivity(self, pred, left_tables, right_tables) -> float:
+        return self.catalog.selectivity(pred, self._selectivity)
+
+
+class _Plan:
+    __slots__ = ('tree', 'rows', 'cost', 'mask')
+
+    def __init__(self, tree, rows, cost, mask):
+        self.tree = tree
+        self.rows = rows
+        self.cost = cost
+        self.mask = mask
+
+
+class JoinEnumerator:
+    """
+    Escolhe a ordem de junção para as entradas `inputs` (tabela -> subárvore)
+    ligadas pelos predicados `join_conditions` [(predicado, frozenset de tabelas)].
+    """
+
+    def __init__(self, tables, inputs, join_conditions, cost_model=None,
+                 bushy=True, dp_threshold=DEFAULT_DP_THRESHOLD):
+        self.tables = list(tables)
+        self.index = {table: i for i, table in enumerate(self.tables)}
+        self.inputs = inputs
+        self.cost_model = cost_model or StatisticsCostModel()
+        self.bushy = bushy
+        self.dp_threshold = dp_threshold
+
+        # Predicados como bitmasks; apenas os binários definem arestas do grafo
+        self.predicates = []
+        self.adjacency = [0] * len(self.tables)
+        for pred, tbls in join_conditions:
+            mask = self._mask(tbls)
+            self.predicates.append((pred, mask))
+            if len(tbls) == 2:
+                a, b = (self.index[t] for t in tbls)
+                self.adjacency[a] |= 1 << b
+                self.adjacency[b] |= 1 << a
+
+    def _mask(self, tables) -> int:
+        mask = 0
+        for table in tables:
+            mask |= 1 << self.index[table]
+        return mask
+
+    def _tables_of(self, mask) -> list:
+        return [t for i, t in enumerate(self.tables) if mask >> i & 1]
+
+    def _neighbors(self, mask) -> int:
+        result = 0
+        i = 0
+        rest = mask
+        while rest:
+            if rest & 1:
+                result |= self.adjacency[i]
+            rest >>= 1
+            i += 1
+        return result & ~mask
+
+    # Construção de planos
+    def _leaf(self, i) -> _Plan:
+        table = self.tables[i]
+        node = self.inputs[table]
+        rows = self.cost_model.scan_cardinality(table, node)
+        return _Plan(node, rows, self.cost_model.access_cost(table, node), 1 << i)
+
+    def _join(self, left: _Plan, right: _Plan) -> _Plan:
+        mask = left.mask | right.mask
+        applicable = [
+            pred for pred, pmask in self.predicates
+            if pmask & ~mask == 0 and pmask & ~left.mask and pmask & ~right.mask
+        ]
+        left_tables, right_tables = self._tables_of(left.mask), self._tables_of(right.mask)
+        rows = left.rows * right.rows
+        for pred in applicable:
+            rows *= self.cost_model.join_selectivity(pred, left_tables, right_tables)
+        rows = max(rows, 1.0)
+        if applicable:
+            tree, cost = self._physical(left, right, applicable)
+        else:
+            tree = Product(left.tree, right.tree)
+            cost = left.cost + right.cost
+        cost += self.cost_model.join_cost(left, right, rows)
+        return _Plan(tree, rows, cost, mask)
+
+    def _equi_keys(self, left: _Plan, right: _Plan, applicable) -> list:
+        """Pares (coluna da esquerda, coluna da direita) comparados por igualdade."""
+        left_tables, right_tables = set(self._tables_of(left.mask)), set(self._tables_of(right.mask))
+        keys = []
+        for pred in applicable:
+            if not (isinstance(pred, Comparison) and pred.op == '='
+                    and isinstance(pred.left, ColumnRef) and isinstance(pred.right, ColumnRef)):
+                continue
+            if pred.left.table in left_tables and pred.right.table in right_tables:
+                keys.append((pred, pred.left, pred.right))
+            elif pred.right.table in left_tables and pred.left.table in right_tables:
+                keys.append((pred, pred.right, pred.left))
+        return keys
+
+    @staticmethod
+    def _base_table(plan: _Plan):
+        """Tabela base de uma entrada formada só por seleções/projeções sobre um Scan."""
+        node = plan.tree
+        while isinstance(node, (Select, Project)):
+            node = node.child
+        return node.table if isinstance(node, Scan) else None
+
+    def _physical(self, left: _Plan, right: _Plan, applicable):
+        """Operador físico de menor custo para left ⨝ right e o custo acumulado."""
+        model = self.cost_model
+        pred = make_conjunction(applicable)
+        keys = self._equi_keys(left, right, applicable)
+        if not keys:
+            cost = left.cost + right.cost + model.nested_loop_join_cost(left.rows, right.rows)
+            return ThetaJoin(pred, left.tree, right.tree), cost
+
+        # Hash join: constrói sobre o lado com menos linhas estimadas
+        build = 'left' if left.rows < right.rows else 'right'
+        cost = left.cost + right.cost + model.hash_join_cost(
+            min(left.rows, right.rows), max(left.rows, right.rows))
+        best = (HashJoin(pred, left.tree, right.tree, build), cost)
+
+        # Index nested loop: a direita é acessada pelo índice, sem ser lida inteira
+        table = self._base_table(right)
+        if table is not None:
+            table_rows = model.base_rows(table)
+            for term, _, inner in keys:
+                kind = index_kind(table, inner.column)
+                if kind is None:
+                    continue
+                fetched = left.rows * table_rows * model.join_selectivity(term, [], [table])
+                cost = left.cost + model.index_join_cost(left.rows, fetched, kind, table_rows)
+                if cost < best[1]:
+                    best = (IndexNestedLoopJoin(pred, left.tree, right.tree, inner, kind), cost)
+        return best
+
+    def _better(self, best, plan):
+        current = best.get(plan.mask)
+        if current is None or plan.cost < current.cost:
+            best[plan.mask] = plan
+
+    # DPccp
+    def _enumerate_csg_rec(self, subset, excluded, out):
+        neighbors = self._neighbors(subset) & ~excluded
+        sub = neighbors
+        while sub:
+            out.append(subset | sub)
+            sub = (sub - 1) & neighbors
+        sub = neighbors
+        while sub:
+            self._enumerate_csg_rec(subset | sub, excluded | neighbors, out)
+            sub = (sub - 1) & neighbors
+
+    def _csg_cmp_pairs(self, component) -> list:
+        """Pares (S1, S2) de subgrafos conexos, disjuntos e adjacentes do componente."""
+        csgs = []
+        for i in reversed(range(len(self.tables))):
+            if not component >> i & 1:
+                continue
+            below = ((1 << (i + 1)) - 1) | ~component
+            csgs.append(1 << i)
+            self._enumerate_csg_rec(1 << i, below, csgs)
+
+        pairs = []
+        for s1 in csgs:
+            lowest = (s1 & -s1).bit_length() - 1
+            excluded = ((1 << (lowest + 1)) - 1) | s1 | ~component
+            neighbors = self._neighbors(s1) & ~excluded
+            for i in reversed(range(len(self.tables))):
+                if not neighbors >> i & 1:
+                    continue
+                complements = [1 << i]
+                self._enumerate_csg_rec(
+                    1 << i, excluded | (neighbors & ((1 << (i + 1)) - 1)), complements)
+                pairs.extend((s1, s2) for s2 in complements)
+        # Processa por tamanho do resultado: subplanos sempre prontos antes do uso
+        pairs.sort(key=lambda p: (p[0] | p[1]).bit_count())
+        return pairs
+
+    def _dp(self, component) -> _Plan:
+        best = {}
+        for i in range(len(self.tables)):
+            if component >> i & 1:
+                best[1 << i] = self._leaf(i)
+        for s1, s2 in self._csg_cmp_pairs(component):
+            if not self.bushy and s1.bit_count() > 1 and s2.bit_count() > 1:
+                continue
+            left, right = best.get(s1), best.get(s2)
+            if left is None or right is None:
+                continue
+            # Junção comutativa: avalia as duas orientações (a da direita é o build)
+            self._better(best, self._join(left, right))
+            self._better(best, self._join(right, left))
+        return best[component]
+
+    # GOO
+    def _greedy(self, component) -> _Plan:
+        plans = [self._leaf(i) for i in range(len(self.tables)) if component >> i & 1]
+        while len(plans) > 1:
+            # Left-deep: formada a primeira junção (sempre a última da lista),
+            # só ela recebe as demais tabelas, uma de cada vez
+            outer = range(len(plans))
+            if not self.bushy and plans[-1].mask.bit_count() > 1:
+                outer = (len(plans) - 1,)
+            pairs = [(a, b) for a in outer for b in range(len(plans))
+                     if a != b and (self.bushy or plans[b].mask.bit_count() == 1)]
+            # Só pares ligados por predicado; sem nenhum (grafo desconexo), o produto mais barato
+            connected = [(a, b) for a, b in pairs if self._neighbors(plans[a].mask) & plans[b].mask]
+            choice = None
+            for a, b in connected or pairs:
+                plan = self._join(plans[a], plans[b])
+                if choice is None or (plan.rows, plan.cost) < (choice[0].rows, choice[0].cost):
+                    choice = (plan, a, b)
+            plan, a, b = choice
+            plans = [p for k, p in enumerate(plans) if k not in (a, b)] + [plan]
+        return plans[0]
+
+    def _components(self) -> list:
+        remaining = (1 << len(self.tables)) - 1
+        components = []
+        while remaining:
+            component = remaining & -remaining
+            frontier = component
+            while frontier:
+                frontier = self._neighbors(component) & remaining
+                component |= frontier
+            components.append(component)
+            remaining &= ~component
+        return components
+
+    def best_plan(self):
+        """Árvore de junção de menor custo estimado."""
+        plans = []
+        for component in self._components():
+            if component.bit_count() <= self.dp_threshold:
+                plans.append(self._dp(component))
+            else:
+                plans.append(self._greedy(component))
+
+        # Componentes desconexos só podem ser combinados por produto cartesiano
+        # (ou por predicados que envolvam três ou mais tabelas)
+        plans.sort(key=lambda p: p.rows)
+        result = plans[0]
+        for plan in plans[1:]:
+            result = self._join(result, plan)
+        return result
+
+
+def order_joins(tables, inputs, join_conditions, cost_model=None, bushy=True,
+                dp_threshold=DEFAULT_DP_THRESHOLD):
+    """Atalho para JoinEnumerator(...).best_plan().tree."""
+    enumerator = JoinEnumerator(tables, inputs, join_conditions, cost_model, bushy, dp_threshold)
+    return enumerator.best_plan().tree
+
+
+@timed('estimate')
+def estimate(tree, cost_model=None) -> tuple:
+    """
+    (linhas, custo) estimados de uma árvore já otimizada, com as mesmas
+    fórmulas usadas na escolha da ordem de junção e dos operadores físicos.
+    """
+    model = cost_model or StatisticsCostModel()
+
+    def visit(node):
+        if isinstance(node, Empty):
+            return 0.0, 0.0
+        base = node
+        while isinstance(base, (Select, Project)):
+            base = base.child
+        if isinstance(base, (Scan, IndexScan)):
+            # Tabela base com seleções/projeções empurradas
+            return model.scan_cardinality(base.table, node), model.access_cost(base.table, node)
+        if isinstance(node, Limit):
+            rows, cost = visit(node.child)
+            return min(rows, float(node.count)), cost
+        if isinstance(node, Select):
+            rows, cost = visit(node.child)
+            return max(rows * model.filter_selectivity(None, node.predicate), 1.0), cost
+        if isinstance(node, Project):
+            return visit(node.child)
+
+        left_rows, left_cost = visit(node.left)
+        left_tables = node.left.tables()
+        if isinstance(node, IndexNestedLoopJoin):
+            table, _ = inner_chain(node)
+            right_rows, right_tables = model.scan_cardinality(table, node.right), [table]
+            table_rows = model.base_rows(table)
+        else:
+            right_rows, right_cost = visit(node.right)
+            right_tables = node.right.tables()
+        rows = left_rows * right_rows
+        if isinstance(node, ThetaJoin):
+            for term in conjuncts(node.predicate):
+                rows *= model.join_selectivity(term, left_tables, right_tables)
+        rows = max(rows, 1.0)
+
+        if isinstance(node, IndexNestedLoopJoin):
+            fetched = left_rows * table_rows * model.join_selectivity(node.predicate, [], [table])
+            cost = left_cost + model.index_join_cost(left_rows, fetched, node.kind, table_rows)
+        elif isinstance(node, HashJoin):
+            build, probe = (left_rows, right_rows) if node.build == 'left' else (right_rows, left_rows)
+            cost = left_cost + right_cost + model.hash_join_cost(build, probe)
+        elif isinstance(node, ThetaJoin):
+            cost = left_cost + right_cost + model.nested_loop_join_cost(left_rows, right_rows)
+        else:
+            cost = left_cost + right_cost
+        return rows, cost + rows
+
+    return visit(tree)
@@ -0,0 +1,292 @@
+"""
+Representação intermediária da álgebra relacional: árvore imutável de
+operadores (Scan, Select, Project, ThetaJoin, Product, Limit, Empty) e dos
+operadores físicos escolhidos pelo otimizador (IndexScan, exibido como σ, e
+HashJoin e IndexNestedLoopJoin, que continuam sendo ⨝ na notação).
+
+Os nós usam __slots__ e são hash-consed: construir duas vezes o mesmo
+operador sobre os mesmos filhos devolve o mesmo objeto, de modo que
+subárvores iguais são compartilhadas e a comparação estrutural se reduz a
+identidade. A string com π/σ/⨝ só é gerada na exibição (render/str).
+
+Scan e IndexScan podem ler só um subconjunto das colunas da tabela
+(`columns`, nomes na ordem de METADADOS); None lê todas.
+
+Materialized é uma subárvore de junções trocada, na execução, pelo
+resultado já materializado de uma subárvore equivalente ou mais geral (ver
+utils.result_cache); a subárvore original fica em `source`.
+"""
+import threading
+import weakref
+from models.db.metadados import METADADOS
+from models.query.ast import ColumnRef, Comparison, conjuncts
+from utils.profiling import timed
+
+_INTERN = weakref.WeakValueDictionary()
+_INTERN_LOCK = threading.Lock()
+
+
+class Node:
+    """Operador base. Subclasses definem _fields (campos posicionais do nó)."""
+    __slots__ = ('_args', '__weakref__')
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Um acessor somente-leitura por campo (node.table, node.child, ...)
+        for i, name in enumerate(cls._fields):
+            setattr(cls, name, property(lambda self, i=i: self._args[i]))
+
+    def __new__(cls, *args):
+        if len(args) != len(cls._fields):
+            raise TypeError(f"{cls.__name__} espera {len(cls._fields)} argumentos")
+        key = (cls, *args)
+        with _INTERN_LOCK:
+            node = _INTERN.get(key)
+            if node is None:
+                node = object.__new__(cls)
+                object.__setattr__(node, '_args', args)
+                _INTERN[key] = node
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    def __reduce__(self):
+        # Reconstrói pelo construtor para manter o hash-consing ao desserializar
+        return (type(self), self._args)
+
+    def __repr__(self):
+        args = ', '.join(repr(a) for a in self._args)
+        return f"{type(self).__name__}({args})"
+
+    def __str__(self):
+        return render(self)
+
+    @property
+    def children(self) -> tuple:
+        return tuple(a for a in self._args if isinstance(a, Node))
+
+    def tables(self) -> tuple:
+        """Tabelas base da subárvore, da esquerda para a direita."""
+        found = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (Scan, IndexScan)):
+                found.append(node.table)
+            elif isinstance(node, Materialized):
+                found.extend(node.source.tables())
+            stack.extend(reversed(node.children))
+        return tuple(found)
+
+
+class Scan(Node):
+    """Leitura de uma tabela base (só das colunas `columns`, se informadas)."""
+    __slots__ = ()
+    _fields = ('table', 'columns')
+
+    def __new__(cls, table, columns=None):
+        return super().__new__(cls, table, columns)
+
+
+class IndexScan(Node):
+    """
+    σ[predicado](tabela) atendido pelo índice secundário `kind` da coluna
+    `column`: só as linhas encontradas no índice são lidas (e, delas, só as
+    colunas `columns`, se informadas).
+    """
+    __slots__ = ()
+    _fields = ('table', 'column', 'kind', 'predicate', 'columns')
+
+    def __new__(cls, table, column, kind, predicate, columns=None):
+        return super().__new__(cls, table, column, kind, predicate, columns)
+
+
+class Select(Node):
+    """σ[predicado](filho)."""
+    __slots__ = ()
+    _fields = ('predicate', 'child')
+
+
+class Project(Node):
+    """π[colunas](filho); colunas é uma tupla de ColumnRef."""
+    __slots__ = ()
+    _fields = ('columns', 'child')
+
+
+class ThetaJoin(Node):
+    """esquerda ⨝[predicado] direita."""
+    __slots__ = ()
+    _fields = ('predicate', 'left', 'right')
+
+
+class HashJoin(ThetaJoin):
+    """⨝ por igualdade executado como hash join; build ('left'/'right') é o lado da tabela hash."""
+    __slots__ = ()
+    _fields = ('predicate', 'left', 'right', 'build')
+
+
+class IndexNestedLoopJoin(ThetaJoin):
+    """
+    ⨝ em que cada linha da esquerda busca as linhas da direita pelo índice
+    `kind` ('hash'/'sorted') da coluna `key`. A direita é uma tabela base,
+    possivelmente com seleções/projeções, e não é lida por inteiro.
+    """
+    __slots__ = ()
+    _fields = ('predicate', 'left', 'right', 'key', 'kind')
+
+    @property
+    def outer_key(self):
+        """Coluna da esquerda comparada por igualdade com `key`."""
+        for term in conjuncts(self.predicate):
+            if isinstance(term, Comparison) and term.op == '=':
+                if term.right == self.key:
+                    return term.left
+                if term.left == self.key:
+                    return term.right
+        raise ValueError(f"Predicado sem igualdade sobre {self.key}")
+
+
+class Product(Node):
+    """esquerda × direita (produto cartesiano)."""
+    __slots__ = ()
+    _fields = ('left', 'right')
+
+
+class Limit(Node):
+    """LIMIT[n](filho): apenas as n primeiras linhas."""
+    __slots__ = ()
+    _fields = ('count', 'child')
+
+
+class Empty(Node):
+    """Relação sem linhas com as colunas `columns` (predicados contraditórios)."""
+    __slots__ = ()
+    _fields = ('columns',)
+
+
+class Materialized(Node):
+    """
+    Resultado materializado `key` (cache de subárvores), filtrado por
+    `residual` (ou None) e reduzido às colunas `columns`. `source` é a
+    subárvore substituída, executada se a entrada não estiver mais no cache;
+    não é filha do nó (não é executada nem desenhada).
+    """
+    __slots__ = ()
+    _fields = ('key', 'residual', 'columns', 'source')
+
+    @property
+    def children(self) -> tuple:
+        return ()
+
+
+def output_columns(node: Node) -> tuple:
+    """Colunas (ColumnRef) produzidas pelo operador, na ordem em que saem."""
+    if isinstance(node, (Scan, IndexScan)):
+        columns = node.columns if node.columns is not None else METADADOS.get(node.table, ())
+        return tuple(ColumnRef(node.table, column) for column in columns)
+    if isinstance(node, (Project, Empty, Materialized)):
+        return node.columns
+    if isinstance(node, (ThetaJoin, Product)):
+        return output_columns(node.left) + output_columns(node.right)
+    return output_columns(node.child)
+
+
+def _render_operand(node: Node) -> str:
+    # Junções/produtos à direita precisam de parênteses para manter a associação
+    text = render(node)
+    return f"({text})" if isinstance(node, (ThetaJoin, Product)) else text
+
+
+def render(node: Node) -> str:
+    """Converte a árvore para a notação textual π/σ/⨝/× exibida na interface."""
+    if isinstance(node, Scan):
+        return node.table
+    if isinstance(node, IndexScan):
+        return f"σ[{node.predicate}]({node.table})"
+    if isinstance(node, Select):
+        return f"σ[{node.predicate}]({render(node.child)})"
+    if isinstance(node, Project):
+        cols = ', '.join(str(c) for c in node.columns)
+        return f"π[{cols}]({render(node.child)})"
+    if isinstance(node, ThetaJoin):
+        return f"{render(node.left)} ⨝[{node.predicate}] {_render_operand(node.right)}"
+    if isinstance(node, Product):
+        return f"{render(node.left)} × {_render_operand(node.right)}"
+    if isinstance(node, Limit):
+        return f"LIMIT[{node.count}]({render(node.child)})"
+    if isinstance(node, Empty):
+        return "∅"
+    if isinstance(node, Materialized):
+        text = f"MATERIALIZADO[{' ⨝ '.join(node.source.tables())}]"
+        return f"σ[{node.residual}]({text})" if node.residual is not None else text
+    raise TypeError(f"Operador desconhecido: {type(node).__name__}")
+
+
+def inner_chain(node: IndexNestedLoopJoin):
+    """(tabela, [seleções/projeções de cima para baixo]) do lado interno do index join."""
+    chain = []
+    inner = node.right
+    while not isinstance(inner, Scan):
+        chain.append(inner)
+        inner = inner.child
+    return inner.table, chain
+
+
+def _read_columns(node) -> str:
+    return f" (colunas {', '.join(node.columns)})" if node.columns is not None else ''
+
+
+@timed('explain')
+def explain(tree) -> list:
+    """
+    Plano de execução da árvore: um passo por operador físico, na ordem em
+    que o executor os avalia (filhos antes dos pais).
+    """
+    steps = []
+
+    def visit(node):
+        if isinstance(node, IndexNestedLoopJoin):
+            # O lado interno não é executado: é acessado pelo índice
+            visit(node.left)
+            table, chain = inner_chain(node)
+            filters = ''.join(f" e filtro {n.predicate}" for n in chain if isinstance(n, Select))
+            kind = 'ordenado' if node.kind == 'sorted' else node.kind
+            text = (f"Executar junção (index nested loop, índice {kind} em {node.key}"
+                    f"{filters}): {node.predicate}")
+        else:
+            for child in node.children:
+                visit(child)
+            if isinstance(node, Scan):
+                text = f"Ler tabela: {node.table}{_read_columns(node)}"
+            elif isinstance(node, IndexScan):
+                kind = 'ordenado' if node.kind == 'sorted' else node.kind
+                text = (f"Ler tabela pelo índice {kind} de {node.table}.{node.column}: "
+                        f"{node.predicate}{_read_columns(node)}")
+            elif isinstance(node, Select):
+                text = f"Aplicar filtro: {node.predicate}"
+            elif isinstance(node, Project):
+                text = f"Projetar colunas: {', '.join(map(str, node.columns))}"
+            elif isinstance(node, HashJoin):
+                build = node.right if node.build == 'right' else node.left
+                text = (f"Executar junção (hash join, construção sobre "
+                        f"{', '.join(build.tables())}): {node.predicate}")
+            elif isinstance(node, ThetaJoin):
+                text = f"Executar junção (nested loop): {node.predicate}"
+            elif isinstance(node, Product):
+                text = "Executar produto cartesiano"
+            elif isinstance(node, Limit):
+                text = f"Limitar a {node.count} linha(s)"
+            elif isinstance(node, Empty):
+                text = "Resultado vazio: os predicados são contraditórios (nenhuma tabela é lida)"
+            elif isinstance(node, Materialized):
+                residual = f" e filtro {node.residual}" if node.residual is not None else ''
+                text = (f"Reaproveitar resultado materializado de {' ⨝ '.join(node.source.tables())}"
+                        f"{residual}: {', '.join(map(str, node.columns))}")
+            else:
+                raise TypeError(f"Operador desconhecido: {type(node).__name__}")
+        steps.append(f"{len(steps) + 1}. {text}")
+
+    visit(tree)
+    return steps
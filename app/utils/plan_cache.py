@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from models.db.estatisticas import ESTATISTICAS
+from models.db.metadata_index import metadata_version, reload_metadata_index
+from models.db.patterns import KEYWORDS
+from models.query.lexer import scan, SQLSyntaxError
+from utils.profiling import METRICS
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Forma canônica da consulta usada como chave do cache: palavras-chave em
+    maiúsculas, um único espaço entre tokens e sem ';' final.
+    """
+    try:
+        # Tokens separados (qualified=False): "T.a" e "T . a" têm a mesma chave
+        texts, uppers, _ = scan(sql, qualified=False)
+    except SQLSyntaxError:
+        # Consulta inválida: normaliza apenas espaços e o ';' final
+        return ' '.join(sql.split()).rstrip(';').rstrip()
+
+    values = [upper if upper in KEYWORDS else text for text, upper in zip(texts, uppers)]
+    values.pop()    # EOF
+    while values and values[-1] == ';':
+        values.pop()
+    return ' '.join(values)
+
+
+def planning_version() -> tuple:
+    """
+    Versões dos dados usados no planejamento: METADADOS (recarregado com
+    reload_metadata_index) e o catálogo de estatísticas (recoletado).
+    """
+    return metadata_version(), ESTATISTICAS.version
+
+
+@dataclass
+class PlanEntry:
+    """Resultado completo do pipeline de planejamento para uma consulta."""
+    parsed: dict
+    is_valid: bool
+    algebra: Optional[Any] = None
+    optimized: Optional[Any] = None
+    execution_plan: list = field(default_factory=list)
+    graph: Optional[Any] = None
+    errors: list = field(default_factory=list)
+
+
+class PlanCache:
+    """
+    Cache LRU, limitado e thread-safe de planos, indexado pela consulta
+    normalizada. É invalidado por completo quando METADADOS ou as
+    estatísticas mudam: a cada acesso só os dois contadores de versão são
+    comparados.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 1:
+            raise ValueError("maxsize deve ser maior que zero")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = planning_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_metadata(self):
+        version = planning_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def get(self, sql: str) -> Optional[PlanEntry]:
+        key = normalize_sql(sql)
+        with self._lock:
+            self._check_metadata()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, sql: str, entry: PlanEntry):
+        key = normalize_sql(sql)
+        with self._lock:
+            self._check_metadata()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, sql: str, build: Callable[[str], PlanEntry]) -> PlanEntry:
+        """
+        Devolve o plano em cache ou executa `build` (fora do lock, para não
+        serializar sessões concorrentes) e armazena o resultado.
+        """
+        entry = self.get(sql)
+        if entry is None:
+            entry = build(sql)
+            self.put(sql, entry)
+        return entry
+
+    def invalidate(self):
+        """Descarta todos os planos e reconstrói o índice dos metadados (METADADOS alterado)."""
+        with self._lock:
+            reload_metadata_index()
+            self._entries.clear()
+            self._version = planning_version()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# Cache compartilhado por todas as sessões do processo
+PLAN_CACHE = PlanCache(int(os.environ.get('PLAN_CACHE_SIZE', 128)))
+METRICS.register_gauges(lambda: {f'query_plan_cache_{k}': v for k, v in PLAN_CACHE.stats().items()})
@@ -0,0 +1,54 @@
+from models.query.parser import QueryParser
+from models.query.lexer import SQLSyntaxError
+from models.query.manager import QueryManager, ValidationError
+from utils.algebra import sql_to_algebra, optimize_algebra
+from utils.operators import explain
+from utils.graphs import operator_graph
+from utils.profiling import collect
+from utils.plan_cache import PlanEntry, PLAN_CACHE
+
+
+def build_plan(sql: str, with_graph: bool = True, timings: dict = None) -> PlanEntry:
+    """
+    Executa o pipeline completo para uma consulta: parser, validação,
+    conversão para álgebra relacional, otimização, grafo de operadores e
+    plano de execução.
+
+    O grafo de operadores vem da árvore otimizada e é memoizado por plano
+    (utils.graphs); o modo em lote (cli.py) o dispensa com with_graph=False.
+    `timings`, se informado, recebe a duração de cada etapa em segundos.
+    """
+    # Cada etapa é medida pelo próprio componente (utils.profiling.timed)
+    with collect(timings):
+        return _build_plan(sql, with_graph)
+
+
+def _build_plan(sql: str, with_graph: bool) -> PlanEntry:
+    # A consulta é analisada uma única vez; a árvore sintática segue para a
+    # validação e para a álgebra, e o dicionário legado serve à exibição
+    try:
+        query = QueryParser.parse(sql)
+    except SQLSyntaxError as error:
+        empty = {'select': [], 'from': '', 'joins': [], 'where': ''}
+        return PlanEntry(empty, False, errors=[ValidationError(error.message, error.pos)])
+    parsed_query = query.to_legacy()
+
+    errors = QueryManager().validate(query)
+    if errors:
+        return PlanEntry(parsed_query, False, errors=errors)
+
+    relational_query = sql_to_algebra(query)
+    optimized_query = optimize_algebra(relational_query)
+
+    # O plano de execução vem da árvore otimizada, com os operadores físicos escolhidos
+    execution_plan = explain(optimized_query)
+    graph = operator_graph(optimized_query) if with_graph else None
+    return PlanEntry(
+        parsed_query, True, relational_query, optimized_query,
+        execution_plan, graph
+    )
+
+
+def plan_query(sql: str, cache=PLAN_CACHE) -> PlanEntry:
+    """Plano da consulta, reaproveitado do cache quando já foi montado antes."""
+    return cache.get_or_build(sql, build_plan)
@@ -0,0 +1,207 @@
+"""
+Compilador de predicados (WHERE / JOIN ON) para avaliação vetorizada.
+
+A árvore de predicados é compilada uma única vez em funções que produzem
+máscaras booleanas NumPy sobre as colunas da relação:
+
+- comparações entre literais são resolvidas em tempo de compilação e
+  propagadas por AND/OR (constant folding);
+- os termos de um AND são avaliados do mais para o menos seletivo e cada
+  termo seguinte só olha as linhas que ainda passam; num OR, do mais para o
+  menos provável, só sobre as linhas ainda falsas (short-circuit);
+- o resultado é memorizado por predicado (e versão das estatísticas), de
+  modo que planos em cache reaproveitam as funções já compiladas.
+"""
+import operator
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from models.db.estatisticas import ESTATISTICAS
+from models.query.ast import ColumnRef, Literal, Comparison, BoolOp
+from utils.join_order import StatisticsCostModel
+
+COMPILED_CACHE_SIZE = 1024
+
+_COMPARATORS = {
+    '=': operator.eq, '<>': operator.ne, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+
+def _safe_compare(func, a, b):
+    try:
+        return bool(func(a, b))
+    except TypeError:
+        return False
+
+
+def _nulls(values):
+    """Máscara dos nulos (None/NaN/NaT) do operando, ou None se ele não tem nulos."""
+    if not np.ndim(values) or values.dtype.kind in 'biu':
+        # Literais nunca são nulos; inteiros e booleanos não representam nulo
+        return None
+    nulls = pd.isna(values)
+    return nulls if nulls.any() else None
+
+
+def _compare_values(func, left, right) -> np.ndarray:
+    try:
+        with np.errstate(invalid='ignore'):
+            return np.asarray(func(left, right), dtype=bool)
+    except TypeError:
+        # Tipos misturados: elemento a elemento, pares incomparáveis são falsos
+        pairwise = np.frompyfunc(lambda a, b: _safe_compare(func, a, b), 2, 1)
+        return np.asarray(pairwise(left, right), dtype=bool)
+
+
+def compare(op, left, right) -> np.ndarray:
+    """
+    Comparação vetorizada `left op right` (arrays ou escalares). Nulo nunca
+    satisfaz a comparação, qualquer que seja o operador (inclusive <>).
+    """
+    func = _COMPARATORS[op]
+    if not (np.ndim(left) or np.ndim(right)):
+        return np.asarray(_safe_compare(func, left, right))
+
+    left_nulls, right_nulls = _nulls(left), _nulls(right)
+    if left_nulls is None and right_nulls is None:
+        return _compare_values(func, left, right)
+    if left_nulls is None or right_nulls is None:
+        nulls = right_nulls if left_nulls is None else left_nulls
+    else:
+        nulls = left_nulls | right_nulls
+    # Compara apenas as linhas presentes
+    present = ~nulls
+    result = np.zeros(present.shape, dtype=bool)
+    result[present] = _compare_values(func, left[present] if np.ndim(left) else left,
+                                      right[present] if np.ndim(right) else right)
+    return result
+
+
+class CompiledPredicate:
+    """
+    Predicado compilado. Chamado como pred(relation) devolve a máscara de
+    todas as linhas; pred(relation, rows) avalia apenas as linhas `rows`
+    (vetor de índices) e devolve a máscara alinhada a elas.
+    """
+    __slots__ = ('source', 'selectivity', 'constant', '_fn')
+
+    def __init__(self, source, fn, selectivity, constant=None):
+        self.source = source
+        self.selectivity = selectivity
+        self.constant = constant
+        self._fn = fn
+
+    def __call__(self, relation, rows=None) -> np.ndarray:
+        if self.constant is not None:
+            size = relation.num_rows if rows is None else len(rows)
+            return np.full(size, self.constant)
+        return self._fn(relation, rows)
+
+    def __repr__(self):
+        return f"CompiledPredicate({self.source})"
+
+
+def _constant(source, value: bool) -> CompiledPredicate:
+    return CompiledPredicate(source, None, 1.0 if value else 0.0, value)
+
+
+def _operand(operand):
+    """Função (relation, rows) -> array/escalar para um operando."""
+    if isinstance(operand, ColumnRef):
+        name = str(operand)
+
+        def column(relation, rows):
+            values = relation.column(name)
+            return values if rows is None else values[rows]
+        return column
+    value = operand.value
+    return lambda relation, rows: value
+
+
+def _compile_comparison(pred: Comparison, selectivity) -> CompiledPredicate:
+    if isinstance(pred.left, Literal) and isinstance(pred.right, Literal):
+        return _constant(pred, bool(compare(pred.op, pred.left.value, pred.right.value)))
+
+    left, right, op = _operand(pred.left), _operand(pred.right), pred.op
+
+    def evaluate(relation, rows):
+        return compare(op, left(relation, rows), right(relation, rows))
+    return CompiledPredicate(pred, evaluate, selectivity(pred))
+
+
+def _compile_bool(pred: BoolOp, selectivity) -> CompiledPredicate:
+    is_and = pred.op == 'AND'
+    terms = []
+    for arg in pred.args:
+        term = _compile(arg, selectivity)
+        if term.constant is not None:
+            # Elemento absorvente decide o resultado; elemento neutro é descartado
+            if term.constant is not is_and:
+                return _constant(pred, term.constant)
+            continue
+        terms.append(term)
+    if not terms:
+        return _constant(pred, is_and)
+    if len(terms) == 1:
+        return terms[0]
+
+    # AND: mais seletivo primeiro; OR: mais provável primeiro
+    terms.sort(key=lambda t: t.selectivity, reverse=not is_and)
+    if is_and:
+        estimate = 1.0
+        for term in terms:
+            estimate *= term.selectivity
+    else:
+        estimate = 0.0
+        for term in terms:
+            estimate = estimate + term.selectivity - estimate * term.selectivity
+
+    def evaluate(relation, rows):
+        mask = terms[0](relation, rows)
+        for term in terms[1:]:
+            # Só as linhas ainda indecisas são avaliadas pelo próximo termo
+            true_rows = np.count_nonzero(mask)
+            undecided = true_rows if is_and else len(mask) - true_rows
+            if not undecided:
+                break
+            if undecided > len(mask) // 2:
+                # Poucas linhas resolvidas: avaliar tudo sai mais barato que indexar
+                other = term(relation, rows)
+                mask = mask & other if is_and else mask | other
+                continue
+            pending = np.flatnonzero(mask if is_and else ~mask)
+            mask[pending] = term(relation, pending if rows is None else rows[pending])
+        return mask
+    return CompiledPredicate(pred, evaluate, estimate)
+
+
+def _compile(pred, selectivity) -> CompiledPredicate:
+    if isinstance(pred, BoolOp):
+        return _compile_bool(pred, selectivity)
+    if isinstance(pred, Comparison):
+        return _compile_comparison(pred, selectivity)
+    raise TypeError(f"Predicado não suportado: {pred!r}")
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_predicate(pred) -> CompiledPredicate:
+    """Compila (ou reaproveita do cache) o predicado."""
+    key = (pred, ESTATISTICAS.version)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    cost_model = StatisticsCostModel()
+    compiled = _compile(pred, lambda term: cost_model.filter_selectivity(None, term))
+    with _cache_lock:
+        _cache[key] = compiled
+        while len(_cache) > COMPILED_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
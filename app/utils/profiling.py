@@ -0,0 +1,315 @@
+"""
+Instrumentação do pipeline: tempo por etapa (parser, validação, álgebra,
+otimização, plano, grafo, execução) e por operador executado.
+
+- timed('etapa') mede um bloco (with) ou uma função (decorador). Cada medida
+  vai para um histograma de buckets fixos do processo (METRICS) e para os
+  coletores ativos no contexto atual (collect/profile_request), que montam
+  o detalhamento de uma consulta. Chamadas recursivas da mesma etapa são
+  medidas uma vez só.
+- profile_request(cpu=..., memory=...) captura, opcionalmente, o cProfile
+  e o tracemalloc de uma requisição.
+- METRICS.to_prometheus() / METRICS.to_json() exportam os histogramas e
+  contadores; serve_metrics(porta) os publica por HTTP em /metrics (texto
+  Prometheus) e /metrics.json.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+# Limites superiores dos buckets, em segundos (o último bucket é +Inf)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    'query_stage_seconds': 'Duração de cada etapa do planejamento/execução.',
+    'query_operator_seconds': 'Duração de cada operador executado.',
+    'query_stage_errors_total': 'Etapas interrompidas por exceção.',
+    'query_requests_total': 'Requisições perfiladas.',
+}
+
+
+class Histogram:
+    """Contagens por bucket, soma e total de observações."""
+    __slots__ = ('counts', 'sum', 'count', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        bucket = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Limite superior do bucket que contém o quantil q (estimativa)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        accumulated = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), counts):
+            accumulated += count
+            if accumulated >= q * total:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'count': self.count, 'sum': self.sum, 'buckets': list(self.counts)}
+
+
+class Metrics:
+    """Registro de histogramas e contadores por (métrica, rótulo)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float):
+        histogram = self._histograms.get((metric, label))
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault((metric, label), Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, metric: str, label: str = None, amount: int = 1):
+        with self._lock:
+            self._counters[(metric, label)] = self._counters.get((metric, label), 0) + amount
+
+    def register_gauges(self, callback):
+        """`callback()` -> {nome: valor}, lido a cada exportação."""
+        with self._lock:
+            self._gauges.append(callback)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._histograms.items()), sorted(self._counters.items(), key=str), list(self._gauges)
+
+    def to_json(self) -> dict:
+        histograms, counters, gauges = self._items()
+        result = {'buckets': list(BUCKETS), 'histograms': {}, 'counters': {}, 'gauges': {}}
+        for (metric, label), histogram in histograms:
+            entry = histogram.snapshot()
+            for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                bound = histogram.quantile(q)
+                # Acima do último bucket: JSON não tem infinito
+                entry[name] = bound if bound != float('inf') else None
+            result['histograms'].setdefault(metric, {})[label] = entry
+        for (metric, label), value in counters:
+            result['counters'].setdefault(metric, {})[label or ''] = value
+        for callback in gauges:
+            result['gauges'].update(callback())
+        return result
+
+    def to_prometheus(self) -> str:
+        """Formato de exposição em texto do Prometheus."""
+        histograms, counters, gauges = self._items()
+        lines = []
+        label_name = {'query_stage_seconds': 'stage', 'query_operator_seconds': 'operator',
+                      'query_stage_errors_total': 'stage'}
+        seen = set()
+        for (metric, label), histogram in histograms:
+            if metric not in seen:
+                seen.add(metric)
+                lines += [f"# HELP {metric} {_HELP.get(metric, metric)}", f"# TYPE {metric} histogram"]
+            name = label_name.get(metric, 'label')
+            tag = f'{name}="{_escape(label)}"'
+            snapshot = histogram.snapshot()
+            accumulated = 0
+            for bound, count in zip(BUCKETS + (float('inf'),), snapshot['buckets']):
+                accumulated += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{{tag},le="{le}"}} {accumulated}')
+            lines.append(f"{metric}_sum{{{tag}}} {snapshot['sum']}")
+            lines.append(f"{metric}_count{{{tag}}} {snapshot['count']}")
+        for (metric, label), value in counters:
+            if metric not in seen:
+                seen.add(metric)
+                lines += [f"# HELP {metric} {_HELP.get(metric, metric)}", f"# TYPE {metric} counter"]
+            tag = f'{{{label_name.get(metric, "label")}="{_escape(label)}"}}' if label else ''
+            lines.append(f"{metric}{tag} {value}")
+        for callback in gauges:
+            for name, value in callback().items():
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Métricas compartilhadas do processo
+METRICS = Metrics()
+
+# Coletores (dicionários etapa -> segundos) e etapas em andamento no contexto atual
+_COLLECTORS = contextvars.ContextVar('profiling_collectors', default=())
+_ACTIVE = contextvars.ContextVar('profiling_active', default=frozenset())
+
+
+def record(stage: str, seconds: float):
+    """Registra a duração de uma etapa medida externamente."""
+    METRICS.observe('query_stage_seconds', stage, seconds)
+    for timings in _COLLECTORS.get():
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def record_operators(operators):
+    """Duração de cada operador executado (OperatorStats) nos histogramas."""
+    for op in operators:
+        METRICS.observe('query_operator_seconds', op.operator, op.seconds)
+
+
+class timed:
+    """Mede uma etapa: `with timed('parse'):` ou `@timed('parse')`."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = None
+        self._token = None
+
+    def __enter__(self):
+        active = _ACTIVE.get()
+        if self.stage not in active:
+            # Recursão da mesma etapa (ex.: optimize_algebra sob LIMIT) é medida uma vez
+            self._token = _ACTIVE.set(active | {self.stage})
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        elapsed = time.perf_counter() - self._start
+        _ACTIVE.reset(self._token)
+        self._token = None
+        record(self.stage, elapsed)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            METRICS.inc('query_stage_errors_total', self.stage)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+@contextmanager
+def collect(timings: dict = None):
+    """Acumula em `timings` (etapa -> segundos) as etapas medidas dentro do bloco."""
+    timings = {} if timings is None else timings
+    token = _COLLECTORS.set(_COLLECTORS.get() + (timings,))
+    try:
+        yield timings
+    finally:
+        _COLLECTORS.reset(token)
+
+
+@dataclass
+class RequestProfile:
+    """Detalhamento de uma requisição: etapas, tempo total e perfis opcionais."""
+    stages: dict = field(default_factory=dict)
+    seconds: float = 0.0
+    cpu: str = ''                  # relatório do cProfile (pstats)
+    memory_peak: int = None        # pico do tracemalloc, em bytes
+    allocations: list = field(default_factory=list)   # (linha, bytes, blocos)
+
+
+@contextmanager
+def profile_request(cpu: bool = False, memory: bool = False, top: int = 25):
+    """
+    Mede as etapas executadas no bloco e, se pedido, captura o cProfile
+    (cpu=True) e o tracemalloc (memory=True) da requisição.
+    """
+    METRICS.inc('query_requests_total')
+    profile = RequestProfile()
+    # cProfile, pstats e tracemalloc só são importados quando o perfil é pedido
+    profiler = None
+    if cpu:
+        import cProfile
+        profiler = cProfile.Profile()
+    started_tracing = False
+    if memory:
+        import tracemalloc
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with collect(profile.stages):
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield profile
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            profile.seconds = time.perf_counter() - start
+            if memory:
+                profile.memory_peak = tracemalloc.get_traced_memory()[1]
+                statistics = tracemalloc.take_snapshot().statistics('lineno')[:top]
+                profile.allocations = [(str(s.traceback[0]), s.size, s.count) for s in statistics]
+                if started_tracing:
+                    tracemalloc.stop()
+            if profiler is not None:
+                import io
+                import pstats
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+                profile.cpu = report.getvalue()
+
+
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1'):
+    """Publica /metrics e /metrics.json em uma thread (uma vez por processo)."""
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = METRICS.to_prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(METRICS.to_json(), ensure_ascii=False), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_SERVER.serve_forever, name='metrics', daemon=True).start()
+    return _SERVER
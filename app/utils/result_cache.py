@@ -0,0 +1,298 @@
+"""
+Cache de resultados intermediários: resultados materializados de subárvores
+de junção, reaproveitados por consultas posteriores.
+
+A identidade de uma subárvore (fingerprint) é canônica: o conjunto das
+tabelas base e o conjunto dos termos de todos os predicados (filtros
+empurrados, índices e condições de junção), independente da ordem das
+junções e dos operadores físicos escolhidos. Com junções internas, esse par
+determina as linhas do resultado; as colunas guardadas são as que a
+execução produziu naquele ponto do plano.
+
+- Ao executar uma junção, o resultado é guardado como tabela Arrow (com os
+  tipos NumPy originais, restaurados na leitura) junto com a versão de cada
+  arquivo de dados lido; resultados maiores que 1/MAX_ENTRY_FRACTION do
+  orçamento não entram. No streaming, os lotes da junção são acumulados
+  até esse limite e só são guardados se a junção terminar (sem LIMIT).
+- Antes de executar um plano, reuse() troca a maior subárvore de junções
+  coberta por uma entrada por um nó Materialized: mesmas tabelas, predicados
+  da entrada contidos nos da subárvore, colunas da entrada com as colunas
+  pedidas e as dos predicados que faltam (aplicados por cima como filtro
+  residual). Assim `Cliente ⨝ Pedido ⨝ Status` de uma consulta serve às
+  seguintes com os mesmos filtros ou com filtros a mais.
+- O orçamento de memória (QUERY_RESULT_CACHE_BYTES, 0 desliga) é mantido
+  por GreedyDual-Size, um LRU ponderado pelo custo: a prioridade de uma
+  entrada é o relógio do cache mais (segundos para recalcular) / bytes,
+  renovada a cada uso; sai a de menor prioridade e o relógio avança até
+  ela. Resultados caros e pequenos ficam mais tempo que baratos e grandes.
+- Uma entrada cujo arquivo de dados mudou (caminho, tamanho, modificação)
+  é descartada na consulta seguinte.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from models.query.ast import column_refs, conjuncts, make_conjunction
+from utils.operators import (
+    Node, Scan, IndexScan, Select, Project, ThetaJoin, Product, Materialized, IndexNestedLoopJoin, output_columns,
+)
+from utils.profiling import METRICS
+from utils.rewrite import term_key
+
+DEFAULT_RESULT_CACHE_BYTES = int(os.environ.get('QUERY_RESULT_CACHE_BYTES', 64 * 2 ** 20))
+MAX_ENTRY_FRACTION = 4
+
+
+def fingerprint(node):
+    """
+    (tabelas, {termo canônico: termo}) da subárvore, ou None se ela não
+    pode ser reaproveitada (LIMIT, resultado vazio, tabela repetida).
+    """
+    tables, terms = [], {}
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Materialized):
+            node = node.source
+        if isinstance(node, Scan):
+            tables.append(node.table)
+            continue
+        if isinstance(node, IndexScan):
+            tables.append(node.table)
+            predicate = node.predicate
+        elif isinstance(node, (Select, ThetaJoin)):
+            predicate = node.predicate
+        elif isinstance(node, (Project, Product)):
+            predicate = None
+        else:
+            return None
+        for term in conjuncts(predicate) if predicate is not None else ():
+            terms.setdefault(term_key(term), term)
+        stack.extend(node.children)
+    if len(set(tables)) != len(tables):
+        return None
+    return frozenset(tables), terms
+
+
+def _is_join(node) -> bool:
+    return isinstance(node, (ThetaJoin, Product))
+
+
+@dataclass
+class ResultEntry:
+    """Resultado materializado de uma subárvore."""
+    key: tuple                 # (diretório de dados, tabelas, termos)
+    table: object              # pyarrow.Table
+    dtypes: dict               # 'Tabela.Coluna' -> dtype NumPy original
+    versions: dict             # tabela -> DataSource.version() na execução
+    cost: float                # segundos para recalcular a subárvore
+    nbytes: int
+    priority: float = 0.0
+
+    @property
+    def columns(self) -> frozenset:
+        return frozenset(self.dtypes)
+
+
+class ResultCache:
+    """Resultados de subárvores de junção em Arrow, com orçamento em bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = {}      # chave -> ResultEntry
+        self._by_tables = {}    # (diretório, tabelas) -> [chave]
+        self._bytes = 0
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0           # execuções que reaproveitaram alguma subárvore
+        self.misses = 0
+        self.fallbacks = 0      # entradas que sumiram entre a reescrita e a execução
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def max_entry_bytes(self) -> int:
+        return self.max_bytes // MAX_ENTRY_FRACTION
+
+    @staticmethod
+    def versions(tree, source) -> dict:
+        """Versão atual dos arquivos de todas as tabelas da árvore (antes de executá-la)."""
+        return {table: source.version(table) for table in set(tree.tables())}
+
+    # Escrita
+    def store(self, node, relation, cost: float, versions: dict, source):
+        """Guarda o resultado `relation` da junção `node` (se couber e for reaproveitável)."""
+        if not self.enabled or not _is_join(node) or relation.nbytes > self.max_entry_bytes:
+            return
+        found = fingerprint(node)
+        if found is None or not relation.columns:
+            return
+        tables, terms = found
+        try:
+            versions = {table: versions[table] for table in tables}
+        except KeyError:
+            return
+        key = (source.data_dir, tables, frozenset(terms))
+        columns = frozenset(relation.columns)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.columns >= columns and current.versions == versions:
+                # Já guardado (com estas colunas ou mais): só renova a prioridade
+                current.priority = self._clock + current.cost / max(current.nbytes, 1)
+                return
+
+        import pyarrow as pa
+        table = pa.table({name: pa.array(array, from_pandas=True) for name, array in relation.columns.items()})
+        entry = ResultEntry(key, table, {name: array.dtype for name, array in relation.columns.items()},
+                            versions, cost, max(table.nbytes, 1))
+        if entry.nbytes > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry.priority = self._clock + entry.cost / entry.nbytes
+            self._entries[key] = entry
+            self._by_tables.setdefault(key[:2], []).append(key)
+            self._bytes += entry.nbytes
+            self.stores += 1
+            while self._bytes > self.max_bytes:
+                victim = min(self._entries.values(), key=lambda e: e.priority)
+                self._clock = victim.priority
+                self._remove(victim.key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        # Chamado com o lock
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        keys = self._by_tables[key[:2]]
+        keys.remove(key)
+        if not keys:
+            del self._by_tables[key[:2]]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tables.clear()
+            self._bytes = 0
+
+    # Leitura
+    def _current(self, entry: ResultEntry, source) -> bool:
+        try:
+            return all(source.version(table) == version for table, version in entry.versions.items())
+        except FileNotFoundError:
+            return False
+
+    def match(self, node, source):
+        """Materialized que substitui `node`, ou None se nenhuma entrada o cobre."""
+        found = fingerprint(node)
+        if found is None:
+            return None
+        tables, terms = found
+        needed = output_columns(node)
+        wanted = {str(col) for col in needed}
+        with self._lock:
+            candidates = [self._entries[key] for key in self._by_tables.get((source.data_dir, tables), ())]
+        best, stale = None, []
+        for entry in candidates:
+            if not entry.key[2] <= terms.keys():
+                continue
+            residual = [term for key, term in terms.items() if key not in entry.key[2]]
+            used = wanted | {str(col) for term in residual for col in column_refs(term)}
+            if not used <= entry.columns:
+                continue
+            if not self._current(entry, source):
+                stale.append(entry.key)
+                continue
+            if best is None or entry.table.num_rows < best[0].table.num_rows:
+                best = (entry, residual)
+        with self._lock:
+            for key in stale:
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+        if best is None:
+            return None
+        entry, residual = best
+        return Materialized(entry.key, make_conjunction(residual), needed, node)
+
+    def load(self, key, source):
+        """Relação guardada sob `key`, ou None se saiu do cache ou os dados mudaram."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not self._current(entry, source):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                    self.invalidations += 1
+            entry = None
+        if entry is None:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+        with self._lock:
+            entry.priority = self._clock + entry.cost / entry.nbytes
+        from utils.executor import Relation
+        columns = {}
+        for name, dtype in entry.dtypes.items():
+            array = entry.table.column(name).to_numpy()
+            if array.dtype != dtype:
+                array = array.astype(dtype)
+            # Compartilhado entre consultas, como as colunas da DataSource
+            array.flags.writeable = False
+            columns[name] = array
+        return Relation(columns, entry.table.num_rows)
+
+    # Reescrita
+    def reuse(self, tree, source):
+        """
+        Troca as maiores subárvores de junção cobertas pelo cache por nós
+        Materialized (a árvore volta inalterada se nada for reaproveitado).
+        """
+        if not self.enabled:
+            return tree
+
+        def visit(node):
+            if _is_join(node) or (isinstance(node, Project) and _is_join(node.child)):
+                found = self.match(node, source)
+                if found is not None:
+                    return found
+            if isinstance(node, (Materialized, Scan, IndexScan)):
+                return node
+            args = []
+            for name, arg in zip(node._fields, node._args):
+                # O lado interno do index join é lido pelo índice: fica como está
+                inner = isinstance(node, IndexNestedLoopJoin) and name == 'right'
+                args.append(visit(arg) if isinstance(arg, Node) and not inner else arg)
+            return type(node)(*args)
+
+        rewritten = visit(tree) if self._entries else tree
+        with self._lock:
+            if rewritten is tree:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return rewritten
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# Cache de resultados compartilhado pelas execuções do processo
+RESULT_CACHE = ResultCache()
+METRICS.register_gauges(lambda: {f'query_result_cache_{k}': v for k, v in RESULT_CACHE.stats().items()})
@@ -0,0 +1,334 @@
+"""
+Normalização e reescrita dos predicados (WHERE e JOIN ON) antes da
+otimização, por regras aplicadas até um ponto fixo:
+
+- forma normal conjuntiva (CNF): OR é distribuído sobre AND enquanto o
+  número de cláusulas não passa de MAX_CNF_CLAUSES (acima disso a
+  disjunção fica inteira, como uma cláusula só); cláusulas repetidas ou
+  absorvidas por outras menores são descartadas. Um OR cujos ramos repetem
+  condições de uma mesma tabela vira termos que descem até o scan;
+- `literal op coluna` vira `coluna op literal` e comparações entre
+  literais são resolvidas (constant folding);
+- igualdades entre colunas formam classes de equivalência: a constante e
+  as faixas (<, <=, >, >=, <>) de uma coluna valem para toda a classe e são
+  repassadas às demais colunas (Cliente.idCliente = 5 AND
+  Cliente.idCliente = Pedido.Cliente_idCliente gera
+  Pedido.Cliente_idCliente = 5); faixas redundantes ficam só na mais
+  restritiva;
+- comparações com colunas de valor conhecido são avaliadas (propagação de
+  constantes), inclusive dentro de disjunções;
+- contradições (x = 1 AND x = 2, x > 5 AND x < 3, cláusula sem nenhum
+  termo possível) tornam o predicado falso e o plano inteiro vazio.
+
+As igualdades entre colunas implicadas pela transitividade (a = b, b = c ⇒
+a = c) não viram predicados de junção novos: o modelo de custo contaria a
+seletividade delas duas vezes. O módulo não depende de NumPy (roda no
+planejamento).
+"""
+import operator
+from models.query.ast import ColumnRef, Literal, Comparison, BoolOp, make_conjunction
+
+MAX_CNF_CLAUSES = 64
+MAX_PASSES = 4
+
+_COMPARATORS = {
+    '=': operator.eq, '<>': operator.ne, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+_FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '=': '=', '<>': '<>', '!=': '!='}
+_SYMMETRIC = ('=', '<>', '!=')
+_LOWER = ('>', '>=')
+_UPPER = ('<', '<=')
+
+
+class _Contradiction(Exception):
+    """Predicado provadamente falso."""
+
+
+def _evaluate(op, a, b):
+    """`a op b` para dois valores literais; None se não for decidível (tipos diferentes)."""
+    if isinstance(a, str) != isinstance(b, str):
+        # Texto nunca é igual a número; ordem entre eles não é definida
+        return {'=': False, '<>': True, '!=': True}.get(op)
+    try:
+        return bool(_COMPARATORS[op](a, b))
+    except TypeError:
+        return None
+
+
+def _atom(pred):
+    """Comparação normalizada (coluna à esquerda do literal), ou True/False se constante."""
+    left, op, right = pred.left, pred.op, pred.right
+    if isinstance(left, Literal) and isinstance(right, Literal):
+        value = _evaluate(op, left.value, right.value)
+        return pred if value is None else value
+    if isinstance(left, Literal):
+        return Comparison(_FLIPPED[op], right, left, pred.pos)
+    return pred
+
+
+def term_key(atom):
+    """Identidade do termo sem depender do lado dos operandos em =, <> e !=."""
+    if isinstance(atom, Comparison) and atom.op in _SYMMETRIC:
+        return (atom.op.replace('!=', '<>'), frozenset((atom.left, atom.right)))
+    return atom
+
+
+def _cnf(pred) -> list:
+    """Cláusulas (tuplas de termos ligados por OR) da conjunção; [] é verdadeiro, [()] falso."""
+    if isinstance(pred, Comparison):
+        atom = _atom(pred)
+        if atom is True:
+            return []
+        if atom is False:
+            return [()]
+        return [(atom,)]
+    if isinstance(pred, BoolOp) and pred.op == 'AND':
+        return [clause for arg in pred.args for clause in _cnf(arg)]
+    if isinstance(pred, BoolOp):
+        product = [()]
+        for arg in pred.args:
+            clauses = _cnf(arg)
+            if not clauses:
+                # Um ramo sempre verdadeiro torna a disjunção verdadeira
+                return []
+            product = [a + b for a in product for b in clauses]
+            if len(product) > MAX_CNF_CLAUSES:
+                # Distribuir geraria cláusulas demais: a disjunção fica inteira
+                return [(pred,)]
+        return product
+    raise TypeError(f"Predicado não suportado: {pred!r}")
+
+
+def _widen(atoms) -> list:
+    """Numa disjunção, das faixas da mesma coluna e sentido fica a mais ampla (x > 0 OR x > 5 = x > 0)."""
+    widest, dropped = {}, set()
+    for atom in atoms:
+        if not (_is_fact(atom) and atom.op in _LOWER + _UPPER):
+            continue
+        side = (atom.left, atom.op in _LOWER)
+        current = widest.get(side)
+        if current is None:
+            widest[side] = atom
+            continue
+        wider = _evaluate('<' if atom.op in _LOWER else '>', atom.right.value, current.right.value)
+        if wider is None:
+            continue
+        if wider or (atom.right.value == current.right.value and len(atom.op) == 2):
+            widest[side] = atom
+            dropped.add(id(current))
+        else:
+            dropped.add(id(atom))
+    return [atom for atom in atoms if id(atom) not in dropped]
+
+
+def _simplify(clauses) -> list:
+    """Remove termos e cláusulas repetidos e cláusulas absorvidas (A AND (A OR B) = A)."""
+    keyed = []
+    for clause in clauses:
+        atoms, keys = [], set()
+        for atom in clause:
+            if term_key(atom) not in keys:
+                keys.add(term_key(atom))
+                atoms.append(atom)
+        if not atoms:
+            raise _Contradiction()
+        if len(atoms) > 1:
+            atoms = _widen(atoms)
+            keys = {term_key(atom) for atom in atoms}
+        keyed.append((tuple(atoms), frozenset(keys)))
+    result = []
+    for i, (atoms, keys) in enumerate(keyed):
+        absorbed = any(
+            other < keys or (other == keys and j < i)
+            for j, (_, other) in enumerate(keyed) if j != i
+        )
+        if not absorbed:
+            result.append(atoms)
+    return result
+
+
+class _Classes:
+    """Classes de equivalência (union-find) das colunas ligadas por igualdade."""
+
+    def __init__(self):
+        self.parent = {}
+        self.members = {}
+
+    def find(self, col):
+        if col not in self.parent:
+            self.parent[col] = col
+            self.members[col] = [col]
+        while self.parent[col] != col:
+            self.parent[col] = self.parent[self.parent[col]]
+            col = self.parent[col]
+        return col
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+            self.members[a].extend(self.members.pop(b))
+
+
+class _Facts:
+    """Constante e faixas conhecidas de uma classe, a partir dos termos `coluna op literal`."""
+
+    def __init__(self):
+        self.terms = []
+
+    def add(self, atom):
+        self.terms.append(atom)
+
+    def resolve(self):
+        """
+        (valor, limite inferior, limite superior, exclusões, extras): valor é
+        a constante da classe (ou None) e cada limite o termo mais restritivo;
+        extras são termos não comparáveis com os demais, mantidos como estão.
+        """
+        value, lower, upper, excluded, extra = None, None, None, [], []
+        for atom in self.terms:
+            if atom.op != '=':
+                continue
+            if value is None:
+                value = atom
+                continue
+            equal = _evaluate('=', value.right.value, atom.right.value)
+            if equal is False:
+                raise _Contradiction()
+            if equal is None:
+                extra.append(atom)
+
+        for atom in self.terms:
+            if atom.op == '=':
+                continue
+            if value is not None:
+                holds = _evaluate(atom.op, value.right.value, atom.right.value)
+                if holds is False:
+                    raise _Contradiction()
+                if holds is None:
+                    extra.append(atom)
+                continue
+            if atom.op in ('<>', '!='):
+                excluded.append(atom)
+            elif atom.op in _LOWER:
+                lower = self._tighter(lower, atom, '>', extra)
+            else:
+                upper = self._tighter(upper, atom, '<', extra)
+
+        if lower is not None and upper is not None:
+            a, b = lower.right.value, upper.right.value
+            above = _evaluate('>', a, b)
+            if above or (above is False and _evaluate('=', a, b)
+                         and (lower.op == '>' or upper.op == '<')):
+                raise _Contradiction()
+        return value, lower, upper, excluded, extra
+
+    @staticmethod
+    def _tighter(current, atom, direction, extra):
+        if current is None:
+            return atom
+        beyond = _evaluate(direction, atom.right.value, current.right.value)
+        if beyond is None:
+            extra.append(atom)
+            return current
+        if beyond or (atom.right.value == current.right.value and len(atom.op) == 1):
+            return atom
+        return current
+
+
+def _is_fact(atom) -> bool:
+    return (isinstance(atom, Comparison) and isinstance(atom.left, ColumnRef)
+            and isinstance(atom.right, Literal))
+
+
+def _is_equijoin(atom) -> bool:
+    return (isinstance(atom, Comparison) and atom.op == '='
+            and isinstance(atom.left, ColumnRef) and isinstance(atom.right, ColumnRef))
+
+
+def _substitute(atom, constants):
+    """Avalia o termo se todas as suas colunas têm valor conhecido (True/False), senão o devolve."""
+    if not isinstance(atom, Comparison):
+        return atom
+    values = []
+    for operand in (atom.left, atom.right):
+        if isinstance(operand, Literal):
+            values.append(operand.value)
+        elif operand in constants:
+            values.append(constants[operand])
+        else:
+            return atom
+    holds = _evaluate(atom.op, *values)
+    return atom if holds is None else holds
+
+
+def _propagate(clauses) -> list:
+    """Uma passada de transitividade e propagação de constantes sobre as cláusulas."""
+    classes, facts = _Classes(), {}
+    for clause in clauses:
+        if len(clause) == 1 and _is_equijoin(clause[0]):
+            classes.union(clause[0].left, clause[0].right)
+        elif len(clause) == 1 and _is_fact(clause[0]):
+            classes.find(clause[0].left)
+    for clause in clauses:
+        if len(clause) == 1 and _is_fact(clause[0]):
+            facts.setdefault(classes.find(clause[0].left), _Facts()).add(clause[0])
+
+    constants, derived = {}, {}
+    for root, known in facts.items():
+        value, lower, upper, excluded, extra = known.resolve()
+        terms = []
+        for member in classes.members[root]:
+            if value is not None:
+                constants[member] = value.right.value
+                terms.append(Comparison('=', member, value.right))
+                continue
+            for bound in (lower, upper, *excluded):
+                if bound is not None:
+                    terms.append(Comparison(bound.op, member, bound.right))
+        derived[root] = [(term,) for term in terms] + [(atom,) for atom in extra]
+
+    result = []
+    for clause in clauses:
+        if len(clause) == 1 and _is_fact(clause[0]):
+            # Os termos da classe inteira entram no lugar do primeiro deles
+            result.extend(derived.pop(classes.find(clause[0].left), ()))
+            continue
+        if len(clause) == 1 and _is_equijoin(clause[0]):
+            # A igualdade que define a classe continua sendo o predicado de junção
+            result.append(clause)
+            continue
+        atoms = []
+        for atom in clause:
+            atom = _substitute(atom, constants)
+            if atom is True:
+                break
+            if atom is not False:
+                atoms.append(atom)
+        else:
+            if not atoms:
+                raise _Contradiction()
+            result.append(tuple(atoms))
+    return result
+
+
+def rewrite_conjuncts(predicates):
+    """
+    Reescreve a conjunção `predicates` (lista de termos de WHERE/ON) e
+    devolve os novos termos, na mesma ordem quando possível: [] se ela é
+    sempre verdadeira e None se é contraditória (nenhuma linha satisfaz).
+    """
+    pred = make_conjunction(predicates)
+    if pred is None:
+        return []
+    try:
+        clauses = _simplify(_cnf(pred))
+        for _ in range(MAX_PASSES):
+            rewritten = _simplify(_propagate(clauses))
+            if rewritten == clauses:
+                break
+            clauses = rewritten
+    except _Contradiction:
+        return None
+    return [clause[0] if len(clause) == 1 else BoolOp('OR', clause) for clause in clauses]
@@ -0,0 +1,262 @@
+"""
+Índices secundários persistentes sobre as colunas declaradas em
+models.db.indices.INDICES.
+
+Cada índice são dois arrays NumPy em disco, abertos com mmap (abrir não lê
+os dados, apenas mapeia o arquivo):
+
+- sorted: keys.npy com os valores não nulos ordenados e rows.npy com a
+  linha de cada valor; igualdade e faixas viram duas buscas binárias;
+- hash: keys.npy com o hash de 64 bits de cada valor, ordenado, e rows.npy;
+  atende apenas igualdade. Colisões são descartadas pela reavaliação do
+  predicado sobre as linhas lidas.
+
+O manifesto (indices.json) guarda, por índice, o arquivo de dados indexado
+(tamanho, data de modificação, linhas e os últimos bytes). Se um CSV apenas
+cresceu, só as linhas acrescentadas são lidas e intercaladas no índice;
+qualquer outra mudança reconstrói o índice.
+
+Uso (a partir de app/):
+    python -m utils.secondary_indexes [diretório de dados]
+"""
+import csv
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from models.db.indices import INDICES, INDEX_DIR, FLIPPED, secondary_index, sargable_terms
+from models.query.ast import Literal
+
+# Bytes finais do arquivo guardados para reconhecer um append
+_TAIL_BYTES = 4096
+
+
+def _category(value) -> str:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    return None
+
+
+def _encode(values: np.ndarray):
+    """Valores não nulos na representação do índice e sua categoria."""
+    if values.dtype.kind in 'iuf':
+        return values.astype(np.float64), 'number'
+    if values.dtype.kind == 'O' and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values.astype(str), 'string'
+    raise TypeError(f"Coluna do tipo {values.dtype} não pode ser indexada")
+
+
+def _hash(keys: np.ndarray) -> np.ndarray:
+    return pd.util.hash_array(keys.astype(object) if keys.dtype.kind == 'U' else keys)
+
+
+class DiskIndex:
+    """Índice aberto: arrays (possivelmente mapeados em memória) e tipo."""
+
+    def __init__(self, kind: str, category: str, keys: np.ndarray, rows: np.ndarray):
+        self.kind = kind
+        self.category = category
+        self.keys = keys
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, kind: str, values: np.ndarray, first_row: int = 0):
+        present = np.flatnonzero(~pd.isna(values))
+        encoded, category = _encode(values[present])
+        keys = _hash(encoded) if kind == 'hash' else encoded
+        order = np.argsort(keys, kind='stable')
+        return cls(kind, category, keys[order], (present[order] + first_row).astype(np.int64))
+
+    def merge(self, other: 'DiskIndex') -> 'DiskIndex':
+        """Intercala as entradas de `other` (linhas acrescentadas) mantendo a ordem."""
+        if other.category != self.category and len(other) and len(self):
+            raise TypeError("Tipos de valores diferentes no append")
+        keys = np.asarray(self.keys)
+        keys = keys.astype(np.result_type(keys, other.keys))
+        positions = np.searchsorted(keys, other.keys, side='right')
+        return DiskIndex(self.kind, self.category or other.category,
+                         np.insert(keys, positions, other.keys),
+                         np.insert(np.asarray(self.rows), positions, other.rows))
+
+    def search(self, terms):
+        """
+        Linhas (em ordem crescente) que podem satisfazer a conjunção de
+        `coluna op literal`, ou None se o índice não atende esses termos.
+        """
+        bounds = []
+        for term in terms:
+            if isinstance(term.left, Literal):
+                op, value = FLIPPED[term.op], term.left.value
+            else:
+                op, value = term.op, term.right.value
+            if _category(value) != self.category:
+                return None
+            if self.kind == 'hash' and op != '=':
+                continue
+            bounds.append((op, value))
+        if not bounds:
+            return None
+
+        start, stop = 0, len(self.keys)
+        for op, value in bounds:
+            key = _hash(np.array([value], dtype=np.float64 if self.category == 'number' else object))[0] \
+                if self.kind == 'hash' else value
+            if op in ('=', '>='):
+                start = max(start, int(np.searchsorted(self.keys, key, side='left')))
+            if op == '>':
+                start = max(start, int(np.searchsorted(self.keys, key, side='right')))
+            if op in ('=', '<='):
+                stop = min(stop, int(np.searchsorted(self.keys, key, side='right')))
+            if op == '<':
+                stop = min(stop, int(np.searchsorted(self.keys, key, side='left')))
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self.rows[start:stop])
+
+    # Persistência
+    def save(self, prefix: str):
+        for name, array in (('keys', self.keys), ('rows', self.rows)):
+            tmp = f"{prefix}.{name}.tmp.npy"
+            np.save(tmp, np.asarray(array))
+            # Troca atômica: leitores com o arquivo antigo mapeado não são afetados
+            os.replace(tmp, f"{prefix}.{name}.npy")
+
+    @classmethod
+    def open(cls, prefix: str, kind: str, category: str):
+        keys = np.load(f"{prefix}.keys.npy", mmap_mode='r')
+        rows = np.load(f"{prefix}.rows.npy", mmap_mode='r')
+        return cls(kind, category, keys, rows)
+
+
+def _tail_digest(path: str, size: int) -> str:
+    with open(path, 'rb') as f:
+        f.seek(max(size - _TAIL_BYTES, 0))
+        return hashlib.sha1(f.read(min(size, _TAIL_BYTES))).hexdigest()
+
+
+def _appended_column(path: str, offset: int, column: str) -> np.ndarray:
+    """Valores de `column` nas linhas do CSV a partir do byte `offset`."""
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        f.seek(offset)
+        frame = pd.read_csv(f, header=None, names=header)
+    name = next(n for n in header if n.upper() == column.upper())
+    return frame[name].to_numpy()
+
+
+class IndexManager:
+    """
+    Abre, constrói e mantém os índices secundários das tabelas de uma fonte
+    de dados (utils.executor.DataSource). Os índices abertos ficam em cache
+    enquanto o arquivo de dados não muda.
+    """
+    MANIFEST = 'indices.json'
+
+    def __init__(self, source, directory: str = None):
+        self.source = source
+        self.directory = directory or INDEX_DIR or os.path.join(source.data_dir, '.indices')
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _prefix(self, table: str, column: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{table}.{column}.{kind}")
+
+    def _manifest(self) -> dict:
+        path = os.path.join(self.directory, self.MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: dict):
+        path = os.path.join(self.directory, self.MANIFEST)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def get(self, table: str, column: str):
+        """Índice atualizado da coluna, ou None se não há índice declarado/possível."""
+        kind = secondary_index(table, column)
+        if kind is None:
+            return None
+        version = self.source.version(table)
+        key = (table, column)
+        with self._lock:
+            cached = self._open.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            try:
+                index = self._update(table, column, kind, version)
+            except (TypeError, ValueError, OSError):
+                # Coluna não indexável ou diretório sem escrita: a consulta usa o scan
+                index = None
+            self._open[key] = (version, index)
+            return index
+
+    def _update(self, table, column, kind, version):
+        path, size, mtime_ns = version
+        name = f"{table}.{column}"
+        prefix = self._prefix(table, column, kind)
+        manifest = self._manifest()
+        entry = manifest.get(name)
+        source = {'file': os.path.basename(path), 'size': size, 'mtime_ns': mtime_ns}
+
+        if (entry is not None and entry['kind'] == kind and entry['file'] == source['file']
+                and os.path.exists(f"{prefix}.keys.npy")):
+            if entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+                return DiskIndex.open(prefix, kind, entry['category'])
+            if (path.endswith('.csv') and size > entry['size']
+                    and _tail_digest(path, entry['size']) == entry['tail']):
+                # Append: só as linhas novas são lidas e intercaladas
+                current = DiskIndex.open(prefix, kind, entry['category'])
+                appended = _appended_column(path, entry['size'], column)
+                index = current.merge(DiskIndex.build(kind, appended, entry['rows']))
+                return self._store(manifest, name, prefix, index, source, entry['rows'] + len(appended), path)
+
+        values = self.source.column(table, column)
+        return self._store(manifest, name, prefix, DiskIndex.build(kind, values), source, len(values), path)
+
+    def _store(self, manifest, name, prefix, index, source, rows, path):
+        os.makedirs(self.directory, exist_ok=True)
+        index.save(prefix)
+        manifest[name] = {
+            'kind': index.kind, 'category': index.category, 'rows': rows,
+            'tail': _tail_digest(path, source['size']), **source,
+        }
+        self._save_manifest(manifest)
+        return DiskIndex.open(prefix, index.kind, index.category)
+
+    def search(self, table: str, column: str, pred):
+        """Linhas candidatas para o predicado pelo índice, ou None (usar o scan)."""
+        index = self.get(table, column)
+        if index is None:
+            return None
+        return index.search(sargable_terms(pred, table).get(column, []))
+
+    def refresh(self) -> list:
+        """Atualiza todos os índices declarados cujas tabelas têm arquivo de dados."""
+        updated = []
+        for table, column in INDICES:
+            try:
+                self.source.path(table)
+            except FileNotFoundError:
+                continue
+            if self.get(table, column) is not None:
+                updated.append(f"{table}.{column}")
+        return updated
+
+
+if __name__ == '__main__':
+    import sys
+    from utils.executor import DataSource, DATA_DIR
+    manager = IndexManager(DataSource(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR))
+    print(f"Índices atualizados em {manager.directory}: {', '.join(manager.refresh()) or 'nenhum'}")
@@ -0,0 +1,373 @@
+"""
+Serviço de planejamento e execução compartilhado pelas sessões do processo.
+
+O Streamlit roda app/main.py numa thread por sessão; sem coordenação, cada
+interação planeja e executa por conta própria e o trabalho pesado não tem
+limite. As sessões entregam as consultas a um QueryService:
+
+- um número fixo de threads (workers) planeja e executa; o catálogo de
+  estatísticas, o cache de planos, a fonte de dados (tabelas e índices em
+  cache) e os predicados compilados são os do processo, compartilhados;
+- a fila tem tamanho máximo (backpressure): com ela cheia, submit espera
+  por uma vaga até `timeout` segundos e então lança ServiceBusy;
+- consultas idênticas em andamento (mesma forma normalizada e as mesmas
+  opções) são executadas uma única vez (single-flight) e todos que as
+  pediram recebem o mesmo QueryJob;
+- cada sessão tem no máximo uma consulta: reenviar (ou cancel) desiste da
+  anterior, que é retirada da fila ou interrompida entre dois lotes quando
+  ninguém mais espera por ela;
+- consultas com perfil de CPU ou memória rodam sozinhas: tracemalloc e o
+  profiler são do processo inteiro, então a consulta espera as demais
+  terminarem e nenhuma outra começa antes dela acabar.
+
+Uso:
+    job = SERVICE.submit(sql, session=id_da_sessao)
+    result = job.result()          # QueryResult (QueryCancelled se cancelada)
+
+benchmarks/bench_service.py é um gerador de carga local para o serviço.
+"""
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from utils.plan_cache import PLAN_CACHE, PlanEntry, normalize_sql
+from utils.planner import plan_query
+from utils.profiling import METRICS, RequestProfile, profile_request
+
+DEFAULT_WORKERS = int(os.environ.get('QUERY_WORKERS', min(os.cpu_count() or 1, 4)))
+DEFAULT_QUEUE_SIZE = int(os.environ.get('QUERY_QUEUE_SIZE', 32))
+DEFAULT_SUBMIT_TIMEOUT = 10.0
+
+
+class ServiceBusy(RuntimeError):
+    """Fila cheia: a consulta não foi aceita dentro do tempo de espera."""
+
+
+class QueryCancelled(RuntimeError):
+    """A consulta foi cancelada (reenvio ou cancelamento da sessão)."""
+
+
+@dataclass
+class QueryResult:
+    """Plano e, se executada, resultado de uma consulta feita pelo serviço."""
+    plan: PlanEntry
+    relation: Optional[Any] = None
+    rows: int = 0                  # linhas do resultado (relation pode ter só as primeiras)
+    operators: list = field(default_factory=list)
+    seconds: float = 0.0           # tempo dos operadores
+    profile: RequestProfile = field(default_factory=RequestProfile)
+    tree: Optional[Any] = None     # árvore executada (com resultados reaproveitados do cache)
+
+    @property
+    def truncated(self) -> bool:
+        return self.relation is not None and len(self.relation) < self.rows
+
+
+@dataclass(frozen=True)
+class _Options:
+    execute: bool = True
+    streaming: bool = True
+    max_rows: Optional[int] = None
+    cpu: bool = False
+    memory: bool = False
+
+    @property
+    def profiled(self) -> bool:
+        return self.cpu or self.memory
+
+
+class QueryJob:
+    """
+    Consulta enfileirada, em execução ou terminada. É compartilhada por todos
+    que pediram a mesma consulta enquanto ela estava em andamento.
+    """
+    __slots__ = ('key', 'sql', 'options', 'state', 'rows', 'batches', 'subscribers',
+                 '_cancel', '_done', '_result', '_error')
+
+    def __init__(self, key, sql: str, options: _Options):
+        self.key = key
+        self.sql = sql
+        self.options = options
+        self.state = 'queued'      # queued, running, done, failed, cancelled
+        self.rows = 0              # linhas produzidas até agora (progresso)
+        self.batches = []          # lotes guardados até agora (até max_rows linhas, em streaming)
+        self.subscribers = 1
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Espera o término; False se `timeout` expirar antes."""
+        return self._done.wait(timeout)
+
+    def result(self, timeout: float = None) -> QueryResult:
+        """Resultado da consulta; relança o erro da execução ou QueryCancelled."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("A consulta ainda está em andamento")
+        if self.state == 'cancelled':
+            raise QueryCancelled("Consulta cancelada")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def check(self):
+        """Ponto de cancelamento: chamado pelo worker entre as etapas e os lotes."""
+        if self._cancel.is_set():
+            raise QueryCancelled("Consulta cancelada")
+
+    def _finish(self, state: str, result=None, error=None):
+        self.state = state
+        self._result = result
+        self._error = error
+        self._done.set()
+
+
+class QueryService:
+    """Pool limitado de workers com fila, single-flight e cancelamento por sessão."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 source=None, plan_cache=PLAN_CACHE, batch_size: int = None, memory_budget: int = None):
+        if workers < 1:
+            raise ValueError("workers deve ser maior que zero")
+        if queue_size < 1:
+            raise ValueError("queue_size deve ser maior que zero")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.plan_cache = plan_cache
+        self._source = source
+        self._pipeline_options = {
+            name: value for name, value in
+            (('batch_size', batch_size), ('memory_budget', memory_budget)) if value is not None
+        }
+        self._queue = deque()
+        self._inflight = {}        # chave -> QueryJob ainda não terminado
+        self._sessions = {}        # sessão -> QueryJob atual
+        self._threads = []
+        self._running = 0
+        self._exclusive = False    # consulta com perfil em execução
+        self._closed = False
+        self._cond = threading.Condition()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    # Submissão
+    def submit(self, sql: str, session=None, execute: bool = True, streaming: bool = True,
+               max_rows: int = None, cpu: bool = False, memory: bool = False,
+               timeout: float = DEFAULT_SUBMIT_TIMEOUT) -> QueryJob:
+        """
+        Enfileira a consulta (ou se junta à idêntica em andamento) e devolve o
+        QueryJob. Com `session`, a consulta anterior da sessão é abandonada.
+        `max_rows` limita as linhas guardadas no resultado (a contagem é
+        sempre a total). Fila cheia por mais de `timeout` s: ServiceBusy.
+        """
+        options = _Options(execute, streaming, max_rows, cpu, memory)
+        key = (normalize_sql(sql), options)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Serviço encerrado")
+            self._start_workers()
+            if session is not None:
+                previous = self._sessions.pop(session, None)
+                if previous is not None:
+                    self._release(previous)
+            self.submitted += 1
+
+            job = self._inflight.get(key)
+            if job is not None:
+                job.subscribers += 1
+                self.deduplicated += 1
+            else:
+                if not self._cond.wait_for(lambda: len(self._queue) < self.queue_size or self._closed,
+                                           timeout):
+                    self.rejected += 1
+                    raise ServiceBusy(f"Fila cheia ({self.queue_size} consultas aguardando)")
+                if self._closed:
+                    raise RuntimeError("Serviço encerrado")
+                # Outra sessão pode ter enfileirado a mesma consulta durante a espera
+                job = self._inflight.get(key)
+                if job is not None:
+                    job.subscribers += 1
+                    self.deduplicated += 1
+                else:
+                    job = QueryJob(key, sql, options)
+                    self._inflight[key] = job
+                    self._queue.append(job)
+                    self._cond.notify_all()
+            if session is not None:
+                self._sessions[session] = job
+            return job
+
+    def cancel(self, session):
+        """Abandona a consulta atual da sessão (se houver)."""
+        with self._cond:
+            job = self._sessions.pop(session, None)
+            if job is not None:
+                self._release(job)
+
+    def _release(self, job: QueryJob):
+        # Chamado com o lock: sem ninguém esperando, a consulta é cancelada
+        job.subscribers -= 1
+        if job.subscribers > 0 or job.done():
+            return
+        job._cancel.set()
+        self.cancelled += 1
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        if job.state == 'queued':
+            self._queue.remove(job)
+            job._finish('cancelled')
+            self._cond.notify_all()
+
+    # Workers
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'query-worker-{len(self._threads)}',
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _startable(self) -> bool:
+        # Chamado com o lock. A fila é FIFO: uma consulta com perfil na frente
+        # espera as que estão rodando (e segura as de trás) até poder rodar sozinha
+        if not self._queue or self._exclusive:
+            return False
+        return not self._queue[0].options.profiled or self._running == 0
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._startable())
+                if self._closed:
+                    return
+                job = self._queue.popleft()
+                job.state = 'running'
+                self._running += 1
+                self._exclusive = job.options.profiled
+                # Uma vaga na fila: libera quem espera em submit
+                self._cond.notify_all()
+            state, result, error = 'done', None, None
+            try:
+                result = self._run(job)
+            except QueryCancelled:
+                state = 'cancelled'
+            except Exception as exc:
+                state, error = 'failed', exc
+            with self._cond:
+                self._running -= 1
+                if job.options.profiled:
+                    self._exclusive = False
+                # Uma consulta a menos: a próxima da fila pode ser uma com perfil
+                self._cond.notify_all()
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                self.completed += state == 'done'
+                self.failed += state == 'failed'
+                job._finish(state, result, error)
+
+    @property
+    def source(self):
+        if self._source is None:
+            # Executor (NumPy/pandas) importado só quando o serviço executa algo
+            from utils.executor import DATA_SOURCE
+            self._source = DATA_SOURCE
+        return self._source
+
+    def _run(self, job: QueryJob) -> QueryResult:
+        options = job.options
+        with profile_request(cpu=options.cpu, memory=options.memory) as profile:
+            plan = plan_query(job.sql, self.plan_cache)
+            result = QueryResult(plan, profile=profile)
+            if not (plan.is_valid and options.execute):
+                return result
+            job.check()
+            if options.streaming:
+                self._stream(job, result)
+            else:
+                from utils.executor import execute
+                executed = execute(plan.optimized, self.source)
+                relation = executed.relation
+                result.rows = job.rows = len(relation)
+                if options.max_rows is not None and len(relation) > options.max_rows:
+                    relation = relation.slice(0, options.max_rows)
+                result.relation, result.operators, result.seconds = relation, executed.operators, executed.seconds
+                result.tree = executed.tree
+        return result
+
+    def _stream(self, job: QueryJob, result: QueryResult):
+        from utils.executor import concat_relations
+        from utils.operators import output_columns
+        from utils.streaming import Pipeline
+
+        pipeline = Pipeline(result.plan.optimized, self.source, **self._pipeline_options)
+        # Os lotes guardados ficam no job: a interface os exibe enquanto a consulta roda
+        kept, kept_rows, limit = job.batches, 0, job.options.max_rows
+        batches = iter(pipeline)
+        try:
+            for batch in batches:
+                # Reenvio da sessão: o pipeline é fechado entre dois lotes
+                job.check()
+                job.rows += len(batch)
+                if limit is None or kept_rows < limit:
+                    if limit is not None and kept_rows + len(batch) > limit:
+                        batch = batch.slice(0, limit - kept_rows)
+                    kept.append(batch)
+                    kept_rows += len(batch)
+        finally:
+            # Fecha os operadores (e os arquivos de spill) também no cancelamento
+            batches.close()
+        result.relation = concat_relations(kept, output_columns(result.plan.optimized))
+        result.rows = job.rows
+        result.operators = pipeline.stats()
+        result.seconds = pipeline.seconds
+        result.tree = pipeline.tree
+
+    # Estado
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queued': len(self._queue),
+                'running': self._running,
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'cancelled': self.cancelled,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Cancela as consultas na fila e encerra os workers."""
+        with self._cond:
+            self._closed = True
+            while self._queue:
+                job = self._queue.popleft()
+                job._cancel.set()
+                self._inflight.pop(job.key, None)
+                job._finish('cancelled')
+            for job in self._inflight.values():
+                job._cancel.set()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+# Serviço compartilhado pelas sessões do processo (workers iniciados no primeiro submit)
+SERVICE = QueryService()
+METRICS.register_gauges(lambda: {f'query_service_{k}': v for k, v in SERVICE.stats().items()})
@@ -0,0 +1,601 @@
+"""
+Execução em streaming (modelo Volcano com lotes) para a árvore otimizada.
+
+Cada operador é um iterador puxado pelo pai que produz lotes (Relation) de
+até `batch_size` linhas, de modo que nenhuma relação intermediária precisa
+caber inteira na memória:
+
+- Scan lê o arquivo de dados em blocos (CSV em chunks, Parquet por lotes),
+  só com as colunas pedidas pelo otimizador; IndexScan lê, também em
+  blocos, só as linhas encontradas no índice secundário. Nenhum dos dois
+  guarda a tabela no cache da fonte de dados;
+- σ e π filtram/recortam cada lote com os predicados compilados;
+- ⨝ por igualdade é um hash join cujo lado de construção (o escolhido pelo
+  otimizador) respeita um orçamento de memória: ao estourá-lo, build e
+  probe são particionados em disco por hash das chaves (Grace hash join) e
+  cada partição é juntada separadamente; logo abaixo de um π, a junção
+  não copia as colunas que nenhum operador acima usa;
+- o index nested loop join busca cada lote externo no índice de chave da
+  tabela interna (cujo tamanho conta no orçamento de memória) e lê do
+  arquivo só as linhas encontradas;
+- junções sem igualdade e produtos são nested loops por blocos;
+- LIMIT para de puxar os filhos assim que atinge o número de linhas, e os
+  iteradores abaixo dele são fechados (arquivos inclusive);
+- com o cache de resultados (utils.result_cache), subárvores cobertas por
+  resultados já guardados são lidas deles, e os lotes de cada junção são
+  guardados se ela terminar sem passar do tamanho máximo de uma entrada.
+
+Os operadores são numerados na mesma ordem do plano de execução (filhos
+antes dos pais) e acumulam linhas, lotes, tempo próprio e linhas em disco.
+"""
+import os
+import pickle
+import tempfile
+import time
+from contextlib import closing
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from models.query.ast import ColumnRef, Comparison, conjuncts, make_conjunction
+from utils.operators import (
+    Scan, IndexScan, Select, Project, ThetaJoin, HashJoin, IndexNestedLoopJoin, Product, Limit, Empty,
+    Materialized, inner_chain, render, output_columns,
+)
+from utils.executor import (
+    DATA_SOURCE, DataSource, OperatorStats, Relation, concat_columns, concat_relations,
+    index_join, join_columns,
+)
+from utils.indexes import HashIndex
+from utils.predicates import compile_predicate
+from utils.profiling import record, record_operators
+from utils.result_cache import RESULT_CACHE
+
+DEFAULT_BATCH_SIZE = int(os.environ.get('QUERY_BATCH_SIZE', 65536))
+DEFAULT_MEMORY_BUDGET = int(os.environ.get('QUERY_MEMORY_BUDGET', 256 * 1024 * 1024))
+SPILL_PARTITIONS = 16
+MAX_SPILL_DEPTH = 3
+
+
+class MemoryBudget:
+    """Orçamento de memória compartilhado pelos operadores que acumulam lotes."""
+
+    def __init__(self, limit: int = DEFAULT_MEMORY_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+
+    def reserve(self, nbytes: int) -> bool:
+        if self.used + nbytes > self.limit:
+            return False
+        self.used += nbytes
+        self.peak = max(self.peak, self.used)
+        return True
+
+    def force(self, nbytes: int):
+        """Reserva mesmo acima do limite (quando não há mais como particionar)."""
+        self.used += nbytes
+        self.peak = max(self.peak, self.used)
+
+    def release(self, nbytes: int):
+        self.used = max(self.used - nbytes, 0)
+
+
+class SpillFile:
+    """Arquivo temporário de lotes serializados (apagado ao fechar)."""
+
+    def __init__(self, directory=None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self.rows = 0
+
+    def write(self, batch: Relation):
+        if len(batch):
+            pickle.dump(batch.columns, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.rows += len(batch)
+
+    def __iter__(self):
+        self._file.seek(0)
+        while True:
+            try:
+                columns = pickle.load(self._file)
+            except EOFError:
+                return
+            yield Relation(columns)
+
+    def close(self):
+        self._file.close()
+
+
+@dataclass
+class StreamOperatorStats(OperatorStats):
+    """Métricas de um operador em streaming."""
+    batches: int = 0
+    spilled_rows: int = 0
+
+
+# Operadores
+class StreamOperator:
+    """
+    Operador puxado: iterar produz lotes do resultado. As subclasses
+    implementam _produce(); a contabilidade de linhas, lotes e tempo fica aqui.
+    """
+    name = ''
+    # Colunas usadas pelo π logo acima (junções não copiam as demais)
+    output = None
+    # Junção cujo resultado vai para o cache de resultados
+    materialize = False
+
+    def __init__(self, node, children, context):
+        self.node = node
+        self.children = children
+        self.context = context
+        self.step = 0
+        self.rows = 0
+        self.batches = 0
+        self.spilled_rows = 0
+        self.inclusive = 0.0
+
+    @property
+    def detail(self) -> str:
+        return render(self.node)
+
+    def __iter__(self):
+        batches = self._produce()
+        kept, kept_bytes = ([] if self.materialize else None), 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    if kept:
+                        self.context.results.store(self.node, concat_relations(kept), self.inclusive,
+                                                   self.context.versions, self.context.source)
+                    return
+                finally:
+                    self.inclusive += time.perf_counter() - start
+                self.rows += len(batch)
+                self.batches += 1
+                if kept is not None:
+                    kept_bytes += batch.nbytes
+                    if kept_bytes > self.context.results.max_entry_bytes:
+                        # Resultado grande demais para o cache: desiste de guardá-lo
+                        kept = None
+                    else:
+                        kept.append(batch)
+                yield batch
+        finally:
+            # Término antecipado (LIMIT) ou erro: fecha também os filhos
+            batches.close()
+
+    def _produce(self):
+        raise NotImplementedError
+
+    def stats(self) -> StreamOperatorStats:
+        own = self.inclusive - sum(child.inclusive for child in self.children)
+        return StreamOperatorStats(self.step, self.name, self.detail, self.rows,
+                                   max(own, 0.0), self.batches, self.spilled_rows)
+
+
+class ScanOperator(StreamOperator):
+    name = 'Scan'
+
+    @property
+    def detail(self) -> str:
+        return self.node.table
+
+    def _produce(self):
+        yield from self.context.source.iter_batches(self.node.table, self.context.batch_size,
+                                                    self.node.columns)
+
+
+class IndexScanOperator(StreamOperator):
+    name = 'Index scan'
+
+    @property
+    def detail(self) -> str:
+        return str(self.node.predicate)
+
+    def _produce(self):
+        # Lotes lidos do arquivo, como no Scan: a tabela não entra no cache da fonte
+        node, source, batch_size = self.node, self.context.source, self.context.batch_size
+        rows = source.secondary.search(node.table, node.column, node.predicate)
+        if rows is None:
+            batches = source.iter_batches(node.table, batch_size, node.columns)
+        else:
+            batches = source.iter_rows(node.table, rows, batch_size, node.columns)
+        predicate = compile_predicate(node.predicate)
+        with closing(batches):
+            for batch in batches:
+                batch = batch.take(predicate(batch))
+                if len(batch):
+                    yield batch
+
+
+class FilterOperator(StreamOperator):
+    name = 'Seleção σ'
+
+    @property
+    def detail(self) -> str:
+        return str(self.node.predicate)
+
+    def _produce(self):
+        predicate = compile_predicate(self.node.predicate)
+        for batch in self.children[0]:
+            mask = predicate(batch)
+            if mask.all():
+                yield batch
+            elif mask.any():
+                yield batch.take(mask)
+
+
+class ProjectOperator(StreamOperator):
+    name = 'Projeção π'
+
+    @property
+    def detail(self) -> str:
+        return ', '.join(map(str, self.node.columns))
+
+    def _produce(self):
+        for batch in self.children[0]:
+            yield batch.project(self.node.columns)
+
+
+class LimitOperator(StreamOperator):
+    name = 'Limite'
+
+    @property
+    def detail(self) -> str:
+        return str(self.node.count)
+
+    def _produce(self):
+        remaining = self.node.count
+        if remaining <= 0:
+            return
+        with closing(iter(self.children[0])) as batches:
+            for batch in batches:
+                if len(batch) >= remaining:
+                    yield batch.slice(0, remaining)
+                    return
+                remaining -= len(batch)
+                yield batch
+
+
+class MaterializedOperator(StreamOperator):
+    """Resultado guardado no cache de resultados, com o filtro residual, em lotes."""
+    name = 'Resultado materializado'
+
+    def __init__(self, node, children, context, relation: Relation):
+        super().__init__(node, children, context)
+        self.relation = relation
+
+    def _produce(self):
+        result = self.relation
+        if self.node.residual is not None:
+            result = result.take(compile_predicate(self.node.residual)(result))
+        result = result.project(self.node.columns)
+        for start in range(0, len(result), self.context.batch_size):
+            yield result.slice(start, start + self.context.batch_size)
+
+
+class EmptyOperator(StreamOperator):
+    """Plano provadamente vazio: não produz nenhum lote."""
+    name = 'Vazio'
+
+    def _produce(self):
+        yield from ()
+
+
+def _equi_keys(pred, left_tables, right_tables):
+    """
+    Separa `esquerda.col = direita.col` (chaves do hash join) do restante,
+    pelas tabelas de cada lado (as colunas dos lotes ainda não são conhecidas).
+    """
+    keys, residual = [], []
+    for term in conjuncts(pred):
+        if (isinstance(term, Comparison) and term.op == '='
+                and isinstance(term.left, ColumnRef) and isinstance(term.right, ColumnRef)):
+            a, b = term.left.table, term.right.table
+            if a in left_tables and b in right_tables:
+                keys.append((term.left, term.right))
+                continue
+            if b in left_tables and a in right_tables:
+                keys.append((term.right, term.left))
+                continue
+        residual.append(term)
+    return keys, make_conjunction(residual)
+
+
+def _partitions(relation: Relation, refs, depth: int) -> np.ndarray:
+    """Partição de cada linha pelo hash das chaves; cada nível usa outros bits."""
+    combined = np.zeros(len(relation), dtype=np.uint64)
+    for ref in refs:
+        array = relation.column(ref)
+        if array.dtype.kind in 'iub':
+            # 1 e 1.0 precisam cair na mesma partição nos dois lados
+            array = array.astype(np.float64)
+        combined = combined * np.uint64(0x100000001B3) ^ pd.util.hash_array(array)
+    shift = np.uint64(4 * depth)
+    return ((combined >> shift) & np.uint64(SPILL_PARTITIONS - 1)).astype(np.intp)
+
+
+class HashJoinOperator(StreamOperator):
+    """
+    Hash join: constrói sobre o filho indicado pelo otimizador (o da direita
+    em junções sem operador físico) e sonda com os lotes do outro. Se o
+    build não cabe no orçamento, vira Grace hash join.
+    """
+    name = 'Hash join ⨝'
+
+    @property
+    def detail(self) -> str:
+        return str(self.node.predicate)
+
+    def __init__(self, node, children, context, keys, residual):
+        super().__init__(node, children, context)
+        self.build_left = isinstance(node, HashJoin) and node.build == 'left'
+        left_keys, right_keys = [l for l, _ in keys], [r for _, r in keys]
+        self.build_keys, self.probe_keys = (
+            (left_keys, right_keys) if self.build_left else (right_keys, left_keys))
+        self.residual_predicate = residual
+        self.residual = compile_predicate(residual) if residual is not None else None
+
+    def _produce(self):
+        left, right = self.children
+        build, probe = (left, right) if self.build_left else (right, left)
+        with closing(iter(build)) as build_batches, closing(iter(probe)) as probe_batches:
+            yield from self._join(build_batches, probe_batches, 0)
+
+    def _join(self, build_batches, probe_batches, depth):
+        budget = self.context.budget
+        held, reserved = [], 0
+        try:
+            for batch in build_batches:
+                if not budget.reserve(batch.nbytes):
+                    if depth < MAX_SPILL_DEPTH:
+                        # Orçamento estourado: particiona o que já foi lido e o restante
+                        budget.release(reserved)
+                        reserved = 0
+                        yield from self._spill(held, batch, build_batches, probe_batches, depth)
+                        return
+                    # Partição ainda grande demais (chave muito repetida): mantém em memória
+                    budget.force(batch.nbytes)
+                held.append(batch)
+                reserved += batch.nbytes
+
+            build = concat_relations(held)
+            held = []
+            if not len(build):
+                return
+            table = HashIndex(*(build.column(ref) for ref in self.build_keys))
+            for batch in probe_batches:
+                build_idx, probe_idx = table.lookup(*(batch.column(ref) for ref in self.probe_keys))
+                yield from self._emit(batch, build, probe_idx, build_idx)
+        finally:
+            budget.release(reserved)
+
+    def _emit(self, probe: Relation, build: Relation, probe_idx, build_idx):
+        batch_size = self.context.batch_size
+        names = join_columns(self.output, self.residual_predicate)
+        for start in range(0, len(probe_idx), batch_size):
+            stop = start + batch_size
+            if self.build_left:
+                result = concat_columns(build, probe, build_idx[start:stop], probe_idx[start:stop], names)
+            else:
+                result = concat_columns(probe, build, probe_idx[start:stop], build_idx[start:stop], names)
+            if self.residual is not None:
+                result = result.take(self.residual(result))
+            if len(result):
+                yield result
+
+    def _spill(self, held, pending, build_batches, probe_batches, depth):
+        directory = self.context.spill_dir
+        builds = [SpillFile(directory) for _ in range(SPILL_PARTITIONS)]
+        probes = [SpillFile(directory) for _ in range(SPILL_PARTITIONS)]
+        try:
+            for files, batches, refs in (
+                    (builds, [*held, pending], self.build_keys),
+                    (builds, build_batches, self.build_keys),
+                    (probes, probe_batches, self.probe_keys)):
+                for batch in batches:
+                    parts = _partitions(batch, refs, depth)
+                    for p in np.unique(parts):
+                        files[p].write(batch.take(parts == p))
+                    self.spilled_rows += len(batch)
+            held.clear()
+            for build, probe in zip(builds, probes):
+                if build.rows and probe.rows:
+                    yield from self._join(iter(build), iter(probe), depth + 1)
+        finally:
+            for spill in builds + probes:
+                spill.close()
+
+
+class IndexJoinOperator(StreamOperator):
+    """Index nested loop join: cada lote da esquerda busca no índice da tabela interna."""
+    name = 'Index nested loop ⨝'
+
+    @property
+    def detail(self) -> str:
+        return str(self.node.predicate)
+
+    def _produce(self):
+        batch_size, budget = self.context.batch_size, self.context.budget
+        # O índice de chave fica em memória durante toda a junção: conta no
+        # orçamento (sem alternativa em disco, é reservado mesmo acima do limite)
+        table, _ = inner_chain(self.node)
+        index = self.context.source.index(table, self.node.key.column, self.node.kind)
+        if not budget.reserve(index.nbytes):
+            budget.force(index.nbytes)
+        try:
+            for batch in self.children[0]:
+                result = index_join(batch, self.node, self.context.source, self.output)
+                for start in range(0, len(result), batch_size):
+                    yield result.slice(start, start + batch_size)
+        finally:
+            budget.release(index.nbytes)
+
+
+class NestedLoopOperator(StreamOperator):
+    """
+    Produto / junção sem chaves de igualdade: o filho da direita é lido uma
+    vez (em memória se couber no orçamento, senão em disco) e percorrido
+    para cada lote da esquerda, gerando os pares em blocos de `batch_size`.
+    """
+
+    @property
+    def name(self) -> str:
+        return 'Produto ×' if isinstance(self.node, Product) else 'Nested loop ⨝'
+
+    @property
+    def detail(self) -> str:
+        return render(self.node) if isinstance(self.node, Product) else str(self.node.predicate)
+
+    def _produce(self):
+        left, right = self.children
+        source = getattr(self.node, 'predicate', None)
+        predicate = compile_predicate(source) if source is not None else None
+        names = join_columns(self.output, source)
+        budget = self.context.budget
+        held, reserved, spill = [], 0, None
+        try:
+            for batch in right:
+                if spill is None and budget.reserve(batch.nbytes):
+                    held.append(batch)
+                    reserved += batch.nbytes
+                    continue
+                if spill is None:
+                    spill = SpillFile(self.context.spill_dir)
+                    for kept in held:
+                        spill.write(kept)
+                        self.spilled_rows += len(kept)
+                    held = []
+                    budget.release(reserved)
+                    reserved = 0
+                spill.write(batch)
+                self.spilled_rows += len(batch)
+
+            inner = spill if spill is not None else held
+            for outer in left:
+                for batch in inner:
+                    yield from self._pairs(outer, batch, predicate, names)
+        finally:
+            budget.release(reserved)
+            if spill is not None:
+                spill.close()
+
+    def _pairs(self, left: Relation, right: Relation, predicate, names):
+        batch_size = self.context.batch_size
+        total = len(left) * len(right)
+        for start in range(0, total, batch_size):
+            pairs = np.arange(start, min(start + batch_size, total))
+            result = concat_columns(left, right, pairs // len(right), pairs % len(right), names)
+            if predicate is not None:
+                result = result.take(predicate(result))
+            if len(result):
+                yield result
+
+
+# Pipeline
+class _Context:
+    __slots__ = ('source', 'batch_size', 'budget', 'spill_dir', 'results', 'versions')
+
+    def __init__(self, source, batch_size, budget, spill_dir, results, versions):
+        self.source = source
+        self.batch_size = batch_size
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.results = results
+        self.versions = versions
+
+
+class Pipeline:
+    """
+    Pipeline de operadores montado a partir da árvore otimizada. Iterar
+    produz os lotes do resultado à medida que são calculados. Com `results`
+    (None desliga), reaproveita e guarda resultados de junções.
+    """
+
+    def __init__(self, tree, source: DataSource = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET, spill_dir: str = None, results=RESULT_CACHE):
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser maior que zero")
+        source = source or DATA_SOURCE
+        results = results if results is not None and results.enabled else None
+        versions = {}
+        if results is not None:
+            tree = results.reuse(tree, source)
+            versions = results.versions(tree, source)
+        self.tree = tree
+        self.budget = MemoryBudget(memory_budget)
+        self.context = _Context(source, batch_size, self.budget, spill_dir, results, versions)
+        self.operators = []
+        self.root = self._build(tree)
+
+    def _build(self, node) -> StreamOperator:
+        if isinstance(node, Materialized):
+            relation = self.context.results.load(node.key, self.context.source) if self.context.results else None
+            if relation is None:
+                # Entrada fora do cache (ou dados alterados): executa a subárvore original
+                return self._build(node.source)
+            operator = MaterializedOperator(node, [], self.context, relation)
+            self.operators.append(operator)
+            operator.step = len(self.operators)
+            return operator
+        # Filhos antes dos pais: mesma numeração do plano de execução. O lado
+        # interno do index join não é executado, é lido pelo índice
+        if isinstance(node, IndexNestedLoopJoin):
+            children = [self._build(node.left)]
+        else:
+            children = [self._build(child) for child in node.children]
+        if isinstance(node, Scan):
+            operator = ScanOperator(node, children, self.context)
+        elif isinstance(node, IndexScan):
+            operator = IndexScanOperator(node, children, self.context)
+        elif isinstance(node, Select):
+            operator = FilterOperator(node, children, self.context)
+        elif isinstance(node, Project):
+            operator = ProjectOperator(node, children, self.context)
+            children[0].output = {str(col) for col in node.columns}
+        elif isinstance(node, Limit):
+            operator = LimitOperator(node, children, self.context)
+        elif isinstance(node, Empty):
+            operator = EmptyOperator(node, children, self.context)
+        elif isinstance(node, IndexNestedLoopJoin):
+            operator = IndexJoinOperator(node, children, self.context)
+        elif isinstance(node, ThetaJoin):
+            keys, residual = _equi_keys(node.predicate, node.left.tables(), node.right.tables())
+            if keys:
+                operator = HashJoinOperator(node, children, self.context, keys, residual)
+            else:
+                operator = NestedLoopOperator(node, children, self.context)
+        elif isinstance(node, Product):
+            operator = NestedLoopOperator(node, children, self.context)
+        else:
+            raise TypeError(f"Operador não suportado: {type(node).__name__}")
+        operator.materialize = self.context.results is not None and isinstance(node, (ThetaJoin, Product))
+        self.operators.append(operator)
+        operator.step = len(self.operators)
+        return operator
+
+    def __iter__(self):
+        try:
+            yield from self.root
+        finally:
+            # Só o tempo dos operadores: o consumidor pode demorar entre os lotes
+            record('execute', self.seconds)
+            record_operators(self.stats())
+
+    def collect(self) -> Relation:
+        """Materializa todo o resultado (para consumidores que não fazem streaming)."""
+        return concat_relations(list(self), output_columns(self.root.node))
+
+    def stats(self) -> list:
+        return [operator.stats() for operator in self.operators]
+
+    @property
+    def seconds(self) -> float:
+        return self.root.inclusive
+
+
+def stream(tree, source: DataSource = None, **options) -> Pipeline:
+    return Pipeline(tree, source, **options)
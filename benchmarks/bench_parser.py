@@ -0,0 +1,72 @@
+"""
+Benchmark do parser: latência de QueryParser.parse (léxico de passada única
++ descida recursiva + árvore sintática) comparada ao caminho antigo baseado
+em varreduras regex, variando o número de JOINs e, com isso, o tamanho da
+consulta.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_parser.py [--max-joins 64] [--repeat 200]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from models.db.patterns import SELECT_PATTERN, FROM_PATTERN, WHERE_PATTERN, INNER_JOIN_PATTERN
+from models.query.parser import QueryParser
+
+
+def regex_parse_sql(sql: str) -> dict:
+    """Implementação anterior de QueryParser.parse_sql (quatro varreduras regex)."""
+    sql = re.sub(r';\s*$', '', sql.strip())
+    sql = re.sub(r'\s+', ' ', sql)
+    select_match = re.search(SELECT_PATTERN, sql)
+    from_match = re.search(FROM_PATTERN, sql)
+    join_match = re.finditer(INNER_JOIN_PATTERN, sql)
+    where_match = re.search(WHERE_PATTERN, sql)
+    return {
+        'select': [c.strip() for c in select_match.group('cols').split(',')] if select_match else [],
+        'from': from_match.group('table') if from_match else '',
+        'joins': [{'table': m.group('table'), 'condition': m.group('cond')} for m in join_match],
+        'where': where_match.group('cond').strip() if where_match else ''
+    }
+
+
+def make_query(joins: int) -> str:
+    """Consulta em cadeia T0 ⨝ T1 ⨝ … ⨝ Tn, no formato do Exemplo 4 do README."""
+    tables = [f"Tabela{i}" for i in range(joins + 1)]
+    select = ', '.join(f"{t}.Nome, {t}.Descricao" for t in tables)
+    lines = [f"Select {select}", f"from {tables[0]}"]
+    for prev, cur in zip(tables, tables[1:]):
+        lines.append(f"Join {cur} on {prev}.id{prev} = {cur}.{prev}_id{prev}")
+    where = ' and '.join(f"{t}.Descricao = 'Valor {t}'" for t in tables)
+    lines.append(f"where {where};")
+    return '\n'.join(lines)
+
+
+def measure(func, sql, repeat):
+    # Melhor de 5 rodadas, em microssegundos por chamada
+    return min(timeit.repeat(lambda: func(sql), number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-joins', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'joins':>6} {'chars':>7} {'regex (µs)':>12} {'parser (µs)':>12} {'speedup':>8}")
+    joins = 1
+    while joins <= args.max_joins:
+        sql = make_query(joins)
+        old = measure(regex_parse_sql, sql, args.repeat)
+        new = measure(QueryParser.parse, sql, args.repeat)
+        print(f"{joins:>6} {len(sql):>7} {old:>12.1f} {new:>12.1f} {old / new:>7.2f}x")
+        joins *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Gerador de carga local para o serviço de consultas (utils.service): vários
+clientes (threads, como as sessões do Streamlit) enviam consultas sintéticas
+(benchmarks/synthetic.py) a um QueryService com pool e fila limitados.
+
+As consultas são sorteadas de um conjunto pequeno, então há pedidos
+idênticos em andamento (single-flight); uma fração dos envios é reenviada
+pela mesma sessão antes de terminar (cancelamento da anterior). Com a fila
+pequena e pouco tempo de espera, parte dos envios é recusada (ServiceBusy).
+Relata vazão, latência (p50/p95/p99) das consultas concluídas e os
+contadores do serviço.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_service.py [--clients 16] [--requests 20] [--workers 4]
+    python benchmarks/bench_service.py --queue-size 2 --submit-timeout 0.01 --resubmit 0.3
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from utils.executor import DataSource
+from utils.plan_cache import PlanCache
+from utils.service import QueryCancelled, QueryService, ServiceBusy
+from synthetic import SHAPES, make_schema, make_queries, write_data, use_schema
+
+
+def quantile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+
+def client(service: QueryService, session: int, queries: list, args, latencies: list, outcomes: dict):
+    """Uma sessão: `args.requests` envios, esperando cada resultado (salvo os reenvios)."""
+    rng = random.Random(args.seed + session)
+    for _ in range(args.requests):
+        sql = rng.choice(queries)
+        start = time.perf_counter()
+        try:
+            job = service.submit(sql, session=session, max_rows=args.max_rows,
+                                 streaming=not args.in_memory, timeout=args.submit_timeout)
+            if rng.random() < args.resubmit:
+                # Reenvio antes do término: a consulta anterior da sessão é abandonada
+                job = service.submit(rng.choice(queries), session=session, max_rows=args.max_rows,
+                                     streaming=not args.in_memory, timeout=args.submit_timeout)
+            job.result()
+        except ServiceBusy:
+            outcome = 'recusadas'
+        except QueryCancelled:
+            outcome = 'canceladas'
+        else:
+            outcome = 'concluídas'
+            latencies.append(time.perf_counter() - start)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=16, help='sessões simultâneas')
+    parser.add_argument('--requests', type=int, default=20, help='envios por sessão')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--submit-timeout', type=float, default=5.0, help='espera por vaga na fila (s)')
+    parser.add_argument('--distinct', type=int, default=8, help='consultas distintas sorteadas pelos clientes')
+    parser.add_argument('--resubmit', type=float, default=0.1, help='fração de envios reenviados pela sessão')
+    parser.add_argument('--shape', choices=SHAPES, default='star')
+    parser.add_argument('--tables', type=int, default=6)
+    parser.add_argument('--joins', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=200000, help='linhas da tabela de fatos')
+    parser.add_argument('--max-rows', type=int, default=1000, help='linhas guardadas por resultado')
+    parser.add_argument('--in-memory', action='store_true', help='executor em memória em vez do streaming')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    schema = make_schema(args.shape, max(args.tables, args.joins + 1), args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        write_data(schema, directory, args.seed)
+        with use_schema(schema, directory):
+            queries = make_queries(schema, args.distinct, args.joins, 2, 4, args.seed)
+            service = QueryService(args.workers, args.queue_size, DataSource(directory), PlanCache())
+            latencies, outcomes = [], {}
+            threads = [threading.Thread(target=client, args=(service, i, queries, args, latencies, outcomes))
+                       for i in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            service.shutdown()
+
+    stats = service.stats()
+    print(f"{args.clients} sessões x {args.requests} envios, {args.workers} workers, "
+          f"fila {args.queue_size}: {elapsed:.2f} s")
+    print(f"vazão: {len(latencies) / elapsed:.1f} consultas concluídas/s")
+    print(f"latência (ms): p50 {quantile(latencies, 0.5) * 1000:.1f}  "
+          f"p95 {quantile(latencies, 0.95) * 1000:.1f}  p99 {quantile(latencies, 0.99) * 1000:.1f}")
+    print("clientes: " + ', '.join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())))
+    print("serviço: " + ', '.join(f"{name}={value}" for name, value in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
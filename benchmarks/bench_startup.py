@@ -0,0 +1,98 @@
+"""
+Benchmark de inicialização: tempo de importação a frio (python -X importtime)
+dos módulos do núcleo de planejamento, comparado a um orçamento por módulo.
+O orçamento é relativo ao tempo de `python -c pass` medido na mesma máquina,
+intercalado com as importações, para que a carga e a velocidade da máquina
+afetem os dois lados igualmente; vale a mediana de cada lado.
+Falha (código de saída 1) quando algum módulo estoura o orçamento ou passa a
+importar bibliotecas de interface, visualização ou dados (streamlit,
+matplotlib, networkx, numpy, pandas, pyarrow).
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_startup.py [--runs 9] [--scale 1.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+# Orçamento de importação a frio por módulo, em múltiplos do tempo de `python -c pass`
+# (cerca de 50% acima do medido, para a margem absorver o ruído entre execuções)
+BUDGETS = {
+    'models.query.parser': 3.5,
+    'models.query.manager': 4.0,
+    'models.db.metadados': 0.5,
+    'models.db.estatisticas': 4.0,
+    'utils.operators': 4.0,
+    'utils.join_order': 4.5,
+    'utils.algebra': 5.5,
+    'utils.planner': 6.5,
+    'cli': 7.0,
+}
+
+# Bibliotecas pesadas que o núcleo não pode importar
+FORBIDDEN = ('streamlit', 'matplotlib', 'networkx', 'numpy', 'pandas', 'pyarrow')
+
+
+def baseline_time() -> float:
+    """Tempo de parede, em ms, de um interpretador que não importa nada (`python -c pass`)."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], cwd=APP_DIR, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_time(module: str):
+    """(tempo cumulativo em ms, pacotes proibidos importados) de `import module` a frio."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True)
+    cumulative, forbidden = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line.split('|')
+        name = name.strip()
+        if name.split('.')[0] in FORBIDDEN:
+            forbidden.add(name.split('.')[0])
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, forbidden
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=9, help='medições por módulo (vale a mediana)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplicador dos orçamentos')
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'módulo':<24} {'tempo (ms)':>10} {'base (ms)':>10} {'razão':>6} {'orçamento':>10}  situação")
+    for module, budget in BUDGETS.items():
+        timings, baselines, forbidden = [], [], set()
+        for _ in range(args.runs):
+            baselines.append(baseline_time())
+            elapsed, found = import_time(module)
+            timings.append(elapsed)
+            forbidden |= found
+        elapsed, baseline = statistics.median(timings), statistics.median(baselines)
+        ratio, limit = elapsed / baseline, budget * args.scale
+        problems = []
+        if ratio > limit:
+            problems.append('acima do orçamento')
+        if forbidden:
+            problems.append('importa ' + ', '.join(sorted(forbidden)))
+        failures += bool(problems)
+        print(f"{module:<24} {elapsed:>10.1f} {baseline:>10.1f} {ratio:>6.2f} {limit:>9.1f}x"
+              f"  {'; '.join(problems) or 'ok'}")
+
+    if failures:
+        print(f"{failures} módulo(s) com regressão na inicialização", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark da execução em streaming: pico de memória e tempo do executor em
+memória (utils.executor) comparados ao pipeline de lotes (utils.streaming)
+sobre um Pedido_has_Produto sintético, com orçamento de memória pequeno o
+bastante para forçar o spill do hash join, e o término antecipado do LIMIT.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_streaming.py [--rows 2000000] [--budget-mb 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from utils.planner import build_plan
+from utils.executor import DataSource, execute
+from utils.streaming import Pipeline
+
+JOIN_QUERY = (
+    "SELECT Pedido.DataPedido, Pedido_has_Produto.Quantidade "
+    "FROM Pedido_has_Produto INNER JOIN Pedido "
+    "ON Pedido.idPedido = Pedido_has_Produto.Pedido_idPedido "
+    "WHERE Pedido_has_Produto.Quantidade > 1"
+)
+LIMIT_QUERY = JOIN_QUERY + " LIMIT 10"
+
+
+def write_tables(directory: str, rows: int):
+    """Pedido (rows / 4 linhas) e Pedido_has_Produto (rows linhas) em CSV."""
+    rng = np.random.default_rng(42)
+    orders = max(rows // 4, 1)
+    pd.DataFrame({
+        'idPedido': np.arange(1, orders + 1),
+        'Status_idStatus': rng.integers(1, 6, orders),
+        'DataPedido': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, orders), 'D'),
+        'ValorTotalPedido': rng.uniform(10, 10000, orders).round(2),
+        'Cliente_idCliente': rng.integers(1, 21, orders),
+    }).to_csv(os.path.join(directory, 'Pedido.csv'), index=False)
+    pd.DataFrame({
+        'idPedidoProduto': np.arange(1, rows + 1),
+        'Pedido_idPedido': rng.integers(1, orders + 1, rows),
+        'Produto_idProduto': rng.integers(1, 13, rows),
+        'Quantidade': rng.integers(1, 5, rows),
+        'PrecoUnitario': rng.uniform(10, 20000, rows).round(2),
+    }).to_csv(os.path.join(directory, 'Pedido_has_Produto.csv'), index=False)
+
+
+def measure(run):
+    """(linhas, segundos, pico de memória em MB) de `run()`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch-size', type=int, default=65536)
+    parser.add_argument('--budget-mb', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_tables(directory, args.rows)
+        options = dict(batch_size=args.batch_size, memory_budget=args.budget_mb * 2 ** 20)
+
+        print(f"{'modo':<24} {'linhas':>10} {'tempo (s)':>10} {'pico (MB)':>10}")
+        for label, sql, streaming in (
+                ('em memória', JOIN_QUERY, False),
+                ('streaming', JOIN_QUERY, True),
+                ('em memória + LIMIT', LIMIT_QUERY, False),
+                ('streaming + LIMIT', LIMIT_QUERY, True)):
+            tree = build_plan(sql).optimized
+            if streaming:
+                def run():
+                    pipeline = Pipeline(tree, DataSource(directory), results=None, **options)
+                    return sum(len(batch) for batch in pipeline)
+            else:
+                def run():
+                    return len(execute(tree, DataSource(directory), results=None).relation)
+            rows, elapsed, peak = measure(run)
+            print(f"{label:<24} {rows:>10} {elapsed:>10.2f} {peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Suíte de benchmarks do pipeline sobre esquemas e consultas sintéticos
+(benchmarks/synthetic.py): vazão e latência de cauda (p50/p95/p99) do
+parser, da validação, da conversão para álgebra, da otimização e da
+execução, para cada combinação de formato de esquema, número de junções,
+predicados e largura do SELECT.
+
+Os resultados podem ser gravados como baseline (JSON) e comparados com uma
+execução posterior: uma etapa regride quando p50, p95 ou a vazão pioram
+além da tolerância (e por mais que --min-delta-us). Consultas que passam a
+devolver outro número de linhas também são apontadas. O código de saída é 1
+quando há regressão.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_suite.py [--save [baseline.json]]
+    python benchmarks/bench_suite.py --compare [baseline.json] [--tolerance 0.25]
+    python benchmarks/bench_suite.py --shapes star --joins 2 6 --predicates 4 --width 8
+    python benchmarks/bench_suite.py --results nova.json --compare antiga.json
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from models.query.parser import QueryParser
+from models.query.manager import QueryManager
+from utils.algebra import sql_to_algebra, optimize_algebra
+from utils.executor import DataSource, execute
+from synthetic import SHAPES, make_schema, make_queries, write_data, use_schema
+
+STAGES = ('parse', 'validate', 'algebra', 'optimize', 'execute')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'baseline.json')
+FORMAT_VERSION = 1
+
+
+def scenario_key(shape: str, joins: int, predicates: int, width: int) -> str:
+    return f"{shape}-j{joins}-p{predicates}-w{width}"
+
+
+def summarize(samples: list) -> dict:
+    """Vazão (chamadas/s) e latências em µs de uma lista de durações em segundos."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+
+    def quantile(q):
+        # Nearest-rank: o menor valor com pelo menos q das amostras até ele
+        return ordered[max(math.ceil(q * len(ordered)) - 1, 0)] * 1e6
+
+    return {
+        'count': len(ordered),
+        'throughput': round(len(ordered) / total, 2) if total else None,
+        'mean_us': round(total / len(ordered) * 1e6, 2),
+        'p50_us': round(quantile(0.50), 2),
+        'p95_us': round(quantile(0.95), 2),
+        'p99_us': round(quantile(0.99), 2),
+        'max_us': round(ordered[-1] * 1e6, 2),
+    }
+
+
+def calibrate() -> float:
+    """
+    Tempo (µs) de uma carga fixa de Python puro, independente do código do
+    projeto. Vai para os resultados como referência da velocidade da
+    máquina, para distinguir uma regressão de uma baseline feita em outra
+    máquina.
+    """
+    def workload():
+        table = {}
+        for i in range(20000):
+            table[f"k{i % 997}"] = table.get(f"k{i % 997}", 0) + i
+        return sorted(table.items(), key=lambda item: item[1])
+
+    timings = []
+    for _ in range(10):
+        start = time.perf_counter()
+        workload()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) * 1e6, 2)
+
+
+def timed_calls(func, inputs: list, repeat: int) -> list:
+    """Duração de cada chamada func(x), `repeat` vezes para cada entrada."""
+    samples = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        for value in inputs:
+            start = clock()
+            func(value)
+            samples.append(clock() - start)
+    return samples
+
+
+def prepare(queries: list, source: DataSource, repeat: int) -> dict:
+    """
+    Etapa -> (função, entradas, repetições). A entrada de cada etapa é a
+    saída da anterior, calculada aqui, fora da medição.
+    """
+    parsed = [QueryParser.parse(sql) for sql in queries]
+    manager = QueryManager()
+    for sql, query in zip(queries, parsed):
+        errors = manager.validate(query)
+        if errors:
+            raise ValueError(f"Consulta sintética inválida ({errors[0]}): {sql}")
+    trees = [sql_to_algebra(query) for query in parsed]
+    optimized = [optimize_algebra(tree) for tree in trees]
+    return {
+        'parse': (QueryParser.parse, queries, repeat),
+        'validate': (manager.validate, parsed, repeat),
+        'algebra': (sql_to_algebra, parsed, repeat),
+        'optimize': (optimize_algebra, trees, repeat),
+        # A execução é a etapa cara: uma medida por consulta, com os dados já carregados
+        # e sem o cache de resultados (as medidas repetidas seriam só leituras dele)
+        'execute': (lambda tree: execute(tree, source, results=None), optimized, 1),
+    }
+
+
+def run_suite(args) -> dict:
+    """
+    Executa todos os cenários e devolve o documento de resultados (formato
+    da baseline). Cada etapa é medida em `rounds` rodadas espalhadas pela
+    suíte e vale a de menor média: uma carga momentânea na máquina não
+    aparece como regressão.
+    """
+    config = {
+        'shapes': args.shapes, 'joins': args.joins, 'predicates': args.predicates,
+        'width': args.width, 'tables': args.tables, 'rows': args.rows,
+        'queries': args.queries, 'repeat': args.repeat, 'rounds': args.rounds, 'seed': args.seed,
+        'stages': args.stages,
+    }
+    calibration = calibrate()
+    results = {}
+    for shape in args.shapes:
+        schema = make_schema(shape, max(args.tables, max(args.joins) + 1), args.rows)
+        with tempfile.TemporaryDirectory() as directory:
+            write_data(schema, directory, args.seed)
+            with use_schema(schema, directory):
+                source = DataSource(directory)
+                scenarios = {}
+                for joins, predicates, width in itertools.product(args.joins, args.predicates, args.width):
+                    key = scenario_key(shape, joins, predicates, width)
+                    queries = make_queries(schema, args.queries, joins, predicates, width, args.seed)
+                    scenarios[key] = prepare(queries, source, args.repeat)
+                    results[key] = {'stages': {}}
+                    if 'execute' in args.stages:
+                        _, optimized, _ = scenarios[key]['execute']
+                        results[key]['rows'] = sum(len(execute(tree, source, results=None).relation)
+                                                      for tree in optimized)
+
+                for _ in range(args.rounds):
+                    for key, measured in scenarios.items():
+                        best = results[key]['stages']
+                        for stage in args.stages:
+                            func, inputs, repeat = measured[stage]
+                            gc.collect()
+                            stats = summarize(timed_calls(func, inputs, repeat))
+                            if stage not in best or stats['mean_us'] < best[stage]['mean_us']:
+                                best[stage] = stats
+        for key in scenarios:
+            print_scenario(key, results[key])
+    return {
+        'version': FORMAT_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'calibration_us': min(calibration, calibrate()),
+        },
+        'config': config,
+        'results': results,
+    }
+
+
+def print_scenario(key: str, result: dict):
+    print(f"{key}" + (f"  ({result['rows']} linhas)" if 'rows' in result else ''))
+    for stage, stats in result['stages'].items():
+        print(f"  {stage:<10} {stats['throughput']:>11.1f}/s  p50 {stats['p50_us']:>10.1f} µs  "
+              f"p95 {stats['p95_us']:>10.1f} µs  p99 {stats['p99_us']:>10.1f} µs")
+
+
+def compare(baseline: dict, current: dict, tolerance: float, min_delta_us: float) -> int:
+    """Imprime as diferenças além da tolerância e devolve o número de regressões."""
+    if baseline.get('version') != current.get('version'):
+        print("Aviso: versões diferentes do formato de resultados", file=sys.stderr)
+    if baseline.get('config') != current.get('config'):
+        print("Aviso: configurações diferentes; só os cenários em comum são comparados", file=sys.stderr)
+    old_speed = baseline.get('environment', {}).get('calibration_us')
+    new_speed = current.get('environment', {}).get('calibration_us')
+    if old_speed and new_speed and abs(new_speed / old_speed - 1) > tolerance:
+        print(f"Aviso: a carga de referência levou {old_speed:.0f} µs na baseline e {new_speed:.0f} µs "
+              f"agora; a máquina (ou a carga nela) mudou", file=sys.stderr)
+
+    regressions = improvements = compared = 0
+    for key in sorted(baseline['results'].keys() & current['results'].keys()):
+        old, new = baseline['results'][key], current['results'][key]
+        if 'rows' in old and 'rows' in new and old['rows'] != new['rows']:
+            regressions += 1
+            print(f"REGRESSÃO  {key:<28} resultado   linhas {old['rows']} -> {new['rows']}")
+        for stage in [s for s in STAGES if s in old['stages'] and s in new['stages']]:
+            compared += 1
+            a, b = old['stages'][stage], new['stages'][stage]
+            changes = []
+            for metric in ('p50_us', 'p95_us'):
+                delta = b[metric] - a[metric]
+                if abs(delta) > min_delta_us and a[metric] and abs(delta) / a[metric] > tolerance:
+                    changes.append((delta > 0, f"{metric[:3]} {a[metric]:.1f} -> {b[metric]:.1f} µs "
+                                                f"({delta / a[metric]:+.0%})"))
+            if a['throughput'] and b['throughput']:
+                ratio = b['throughput'] / a['throughput']
+                # Vazão é o inverso da média: mesma tolerância, no sentido oposto
+                if ratio < 1 / (1 + tolerance) or ratio > 1 + tolerance:
+                    changes.append((ratio < 1, f"vazão {a['throughput']:.1f} -> {b['throughput']:.1f}/s "
+                                               f"({ratio - 1:+.0%})"))
+            if not changes:
+                continue
+            worse = any(regressed for regressed, _ in changes)
+            regressions += worse
+            improvements += not worse
+            label = 'REGRESSÃO' if worse else 'melhora'
+            print(f"{label:<10} {key:<28} {stage:<10} " + '; '.join(text for _, text in changes))
+
+    missing = baseline['results'].keys() - current['results'].keys()
+    if missing:
+        print(f"Aviso: {len(missing)} cenário(s) da baseline sem resultado atual", file=sys.stderr)
+    print(f"{compared} etapa(s) comparada(s): {regressions} regressão(ões), {improvements} melhora(s) "
+          f"(tolerância {tolerance:.0%}, mínimo {min_delta_us} µs)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--joins', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--predicates', nargs='+', type=int, default=[2, 8])
+    parser.add_argument('--width', nargs='+', type=int, default=[4, 16])
+    parser.add_argument('--tables', type=int, default=12, help='tabelas por esquema (mínimo: junções + 1)')
+    parser.add_argument('--rows', type=int, default=20000, help='linhas da tabela de fatos')
+    parser.add_argument('--queries', type=int, default=20, help='consultas por cenário')
+    parser.add_argument('--repeat', type=int, default=2, help='medidas por consulta e rodada (exceto execução)')
+    parser.add_argument('--rounds', type=int, default=3, help='rodadas por etapa (vale a de menor média)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, metavar='ARQUIVO',
+                        help='grava os resultados como baseline')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='ARQUIVO',
+                        help='compara os resultados com a baseline')
+    parser.add_argument('--results', metavar='ARQUIVO',
+                        help='resultados já gravados, em vez de executar a suíte')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='piora relativa aceita')
+    parser.add_argument('--min-delta-us', type=float, default=5.0,
+                        help='diferença absoluta mínima para apontar uma mudança')
+    args = parser.parse_args()
+    if min(args.joins + args.predicates) < 0 or min(args.width) < 1:
+        parser.error('--joins/--predicates não podem ser negativos e --width deve ser positivo')
+
+    for path in (args.results, args.compare):
+        if path and not os.path.exists(path):
+            parser.error(f"arquivo não encontrado: {path} (grave uma baseline com --save)")
+
+    if args.results:
+        with open(args.results, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args)
+
+    # A comparação vem antes da gravação: --save e --compare podem ser o mesmo arquivo
+    regressions = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.tolerance, args.min_delta_us)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=1)
+        print(f"Resultados gravados em {args.save}")
+
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark da validação: QueryManager sobre o índice dos metadados (uma
+passada pela árvore sintática, buscas O(1)) comparado à validação anterior
+(listas de colunas em maiúsculas e uma varredura regex por cláusula), em um
+esquema sintético com centenas de tabelas e milhares de colunas.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/bench_validation.py [--tables 500] [--columns 40] [--max-joins 32]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from models.db.metadata_index import MetadataIndex
+from models.query.manager import QueryManager
+from models.query.parser import QueryParser
+
+
+class RegexQueryManager:
+    """Implementação anterior de QueryManager (listas e regex por cláusula)."""
+
+    def __init__(self, metadata):
+        self._metadata = {tbl.upper(): [col.upper() for col in cols] for tbl, cols in metadata.items()}
+
+    def is_valid_table(self, table):
+        return table.upper() in self._metadata
+
+    def is_valid_value(self, value, table):
+        return value.upper() in self._metadata.get(table.upper(), [])
+
+    def is_query_valid(self, parsed):
+        for param in parsed['select']:
+            table, value = param.split('.', 1)
+            if not self.is_valid_table(table) or not self.is_valid_value(value, table):
+                return False
+        if not self.is_valid_table(parsed['from']):
+            return False
+        for join in parsed['joins']:
+            if not self.is_valid_table(join['table']):
+                return False
+            for table, value in re.findall(r'([\w]+)\.([\w]+)', join['condition']):
+                if not self.is_valid_table(table) or not self.is_valid_value(value, table):
+                    return False
+        for condition in re.split(r'(?i)\s+and\s+', parsed['where']):
+            for left, op, right in re.findall(r'([\w\.]+)\s*([<>=!]+)\s*([\w\.\'\"]+)', condition):
+                for side in (left, right):
+                    if '.' in side and not side.startswith(("'", '"')):
+                        table, column = side.split('.')
+                        if not self.is_valid_table(table) or not self.is_valid_value(column, table):
+                            return False
+        return True
+
+
+def make_schema(tables: int, columns: int) -> dict:
+    """Tabela{i} com id, chave para a anterior, Nome, Descricao e colunas extras."""
+    schema = {}
+    for i in range(tables):
+        cols = [f"idTabela{i}", f"Tabela{i - 1}_idTabela{i - 1}", 'Nome', 'Descricao']
+        schema[f"Tabela{i}"] = cols + [f"Coluna{j}" for j in range(columns - len(cols))]
+    return schema
+
+
+def make_query(joins: int, tables: int, columns: int) -> str:
+    """Cadeia de JOINs sobre as últimas tabelas, com a última coluna no SELECT (pior caso das listas)."""
+    names = [f"Tabela{tables - joins - 1 + i}" for i in range(joins + 1)]
+    select = ', '.join(f"{t}.Coluna{columns - 5}" for t in names)
+    sql = f"SELECT {select} FROM {names[0]}"
+    for prev, cur in zip(names, names[1:]):
+        sql += f" JOIN {cur} ON {prev}.id{prev} = {cur}.{prev}_id{prev}"
+    return sql + " WHERE " + ' AND '.join(f"{t}.Nome = 'x'" for t in names)
+
+
+def measure(func, repeat):
+    # Melhor de 5 rodadas, em microssegundos por chamada
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tables', type=int, default=500)
+    parser.add_argument('--columns', type=int, default=40)  # mínimo 5
+    parser.add_argument('--max-joins', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    schema = make_schema(args.tables, args.columns)
+    build_old = measure(lambda: RegexQueryManager(schema), 5)
+    build_new = measure(lambda: MetadataIndex(schema), 5)
+    print(f"{args.tables} tabelas, {args.tables * args.columns} colunas; construção: "
+          f"listas {build_old / 1000:.1f} ms, índice {build_new / 1000:.1f} ms (uma vez por processo)")
+
+    old_manager = RegexQueryManager(schema)
+    new_manager = QueryManager(MetadataIndex(schema))
+    # "por envio" inclui a construção do QueryManager antigo, refeita a cada consulta
+    print(f"{'joins':>6} {'antigo (µs)':>12} {'por envio (µs)':>15} {'índice (µs)':>12} {'speedup':>8}")
+    joins = 1
+    while joins <= min(args.max_joins, args.tables - 1):
+        query = QueryParser.parse(make_query(joins, args.tables, args.columns))
+        legacy = query.to_legacy()
+        assert old_manager.is_query_valid(legacy) and not new_manager.validate(query)
+        old = measure(lambda: old_manager.is_query_valid(legacy), args.repeat)
+        new = measure(lambda: new_manager.validate(query), args.repeat)
+        print(f"{joins:>6} {old:>12.1f} {old + build_old:>15.1f} {new:>12.1f} {old / new:>7.2f}x")
+        joins *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Geradores sintéticos para os benchmarks: esquemas no formato de METADADOS
+(com CHAVES_PRIMARIAS e CHAVES_ESTRANGEIRAS), os dados de cada tabela em CSV
+e consultas com número de junções, predicados e largura do SELECT variáveis.
+
+Formatos de esquema (as chaves estrangeiras seguem a convenção do projeto:
+a chave primária de X é idX e a coluna X_idX referencia X.idX):
+- 'chain':     Tabela{n-1} -> ... -> Tabela1 -> Tabela0 (cadeia de FKs);
+- 'star':      Fato referencia Dim1..Dim{n-1};
+- 'snowflake': Fato referencia Dim1..Dim{k}, e cada Dim{i} abre uma cadeia
+               Dim{i}N2 -> Dim{i}N3 -> ...
+
+Toda tabela tem, além das chaves, a coluna Nome (texto de um vocabulário
+pequeno) e colunas Valor{j} inteiras em [0, 1000), sobre as quais os
+predicados são gerados.
+
+use_schema(schema, diretório) instala o esquema no processo (substitui o
+conteúdo de METADADOS e das chaves, coleta as estatísticas dos arquivos e
+reconstrói o índice dos metadados) e restaura o original na saída.
+"""
+import os
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+from models.db import metadados
+from models.db.estatisticas import ESTATISTICAS
+from models.db.metadata_index import reload_metadata_index
+
+SHAPES = ('chain', 'star', 'snowflake')
+NAMES = 50            # tamanho do vocabulário de Nome
+VALUE_RANGE = 1000    # Valor{j} em [0, VALUE_RANGE)
+MIN_ROWS = 10
+OPERATORS = ('=', '<>', '<', '<=', '>', '>=')
+
+
+@dataclass
+class Table:
+    name: str
+    rows: int
+    references: list = field(default_factory=list)   # tabelas referenciadas por FK
+    values: int = 2                                   # colunas Valor{j}
+
+    @property
+    def key(self) -> str:
+        return f"id{self.name}"
+
+    def foreign_key(self, referenced: str) -> str:
+        return f"{referenced}_id{referenced}"
+
+    @property
+    def columns(self) -> list:
+        return ([self.key] + [self.foreign_key(r) for r in self.references]
+                + ['Nome'] + [f"Valor{j}" for j in range(self.values)])
+
+
+@dataclass
+class Schema:
+    shape: str
+    tables: dict        # nome -> Table, na ordem de criação
+
+    @property
+    def metadata(self) -> dict:
+        """Dicionário no formato de METADADOS."""
+        return {name: table.columns for name, table in self.tables.items()}
+
+    @property
+    def primary_keys(self) -> dict:
+        return {name: [table.key] for name, table in self.tables.items()}
+
+    @property
+    def foreign_keys(self) -> dict:
+        return {
+            (name, table.foreign_key(ref)): (ref, self.tables[ref].key)
+            for name, table in self.tables.items() for ref in table.references
+        }
+
+    def edges(self) -> list:
+        """Arestas (tabela, tabela referenciada) do grafo de chaves estrangeiras."""
+        return [(name, ref) for name, table in self.tables.items() for ref in table.references]
+
+
+def make_schema(shape: str, tables: int, rows: int = 20000, values: int = 2, fanout: int = 8) -> Schema:
+    """
+    Esquema sintético com `tables` tabelas no formato `shape`. A tabela que
+    não é referenciada por nenhuma outra (a de fatos) tem `rows` linhas; cada
+    nível de referência divide esse número por `fanout`.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Formato de esquema desconhecido: {shape}")
+    if tables < 1:
+        raise ValueError("O esquema precisa de pelo menos uma tabela")
+
+    def size(depth):
+        return max(rows // fanout ** depth, MIN_ROWS)
+
+    result = {}
+    if shape == 'chain':
+        # Tabela{i} referencia Tabela{i-1}; a última é a de fatos
+        for i in range(tables):
+            refs = [f"Tabela{i - 1}"] if i else []
+            result[f"Tabela{i}"] = Table(f"Tabela{i}", size(tables - 1 - i), refs, values)
+    elif shape == 'star':
+        dims = [f"Dim{i}" for i in range(1, tables)]
+        for name in dims:
+            result[name] = Table(name, size(1), [], values)
+        result['Fato'] = Table('Fato', size(0), dims, values)
+    else:
+        # Até 4 dimensões ligadas ao fato; as demais tabelas alongam as cadeias
+        branches = [[f"Dim{i}"] for i in range(1, min(tables - 1, 4) + 1)]
+        for n in range(tables - 1 - len(branches)):
+            branch = branches[n % len(branches)]
+            branch.append(f"{branch[0]}N{len(branch) + 1}")
+        for branch in branches:
+            for level in range(len(branch) - 1, -1, -1):
+                refs = [branch[level + 1]] if level + 1 < len(branch) else []
+                result[branch[level]] = Table(branch[level], size(level + 1), refs, values)
+        result['Fato'] = Table('Fato', size(0), [b[0] for b in branches], values)
+    return Schema(shape, result)
+
+
+def write_data(schema: Schema, directory: str, seed: int = 0):
+    """Um <Tabela>.csv por tabela, com FKs válidas e valores uniformes."""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"nome{k}" for k in range(NAMES)])
+    for name, table in schema.tables.items():
+        data = {table.key: np.arange(1, table.rows + 1)}
+        for ref in table.references:
+            data[table.foreign_key(ref)] = rng.integers(1, schema.tables[ref].rows + 1, table.rows)
+        data['Nome'] = names[rng.integers(0, NAMES, table.rows)]
+        for j in range(table.values):
+            data[f"Valor{j}"] = rng.integers(0, VALUE_RANGE, table.rows)
+        pd.DataFrame(data).to_csv(os.path.join(directory, f"{name}.csv"), index=False)
+
+
+def _connected_tables(schema: Schema, count: int, rng: random.Random) -> list:
+    """
+    (tabela, condição de junção) de `count` tabelas conexas no grafo de FKs;
+    a primeira não tem condição e cada uma das seguintes se liga a uma anterior.
+    """
+    neighbours = {name: [] for name in schema.tables}
+    for child, parent in schema.edges():
+        condition = (f"{child}.{schema.tables[child].foreign_key(parent)} = "
+                     f"{parent}.{schema.tables[parent].key}")
+        neighbours[child].append((parent, condition))
+        neighbours[parent].append((child, condition))
+
+    chosen = [(rng.choice(sorted(schema.tables)), None)]
+    names = {chosen[0][0]}
+    while len(chosen) < count:
+        frontier = [(other, cond) for table in names for other, cond in neighbours[table]
+                    if other not in names]
+        if not frontier:
+            break
+        other, condition = rng.choice(sorted(frontier))
+        chosen.append((other, condition))
+        names.add(other)
+    return chosen
+
+
+def make_query(schema: Schema, joins: int, predicates: int, width: int, rng: random.Random) -> str:
+    """Consulta com `joins` junções por FK, `predicates` termos no WHERE e `width` colunas no SELECT."""
+    chosen = _connected_tables(schema, joins + 1, rng)
+    tables = [schema.tables[name] for name, _ in chosen]
+
+    columns = [f"{t.name}.{col}" for t in tables for col in t.columns]
+    select = rng.sample(columns, min(width, len(columns)))
+
+    terms = []
+    for _ in range(predicates):
+        table = rng.choice(tables)
+        column = rng.choice(['Nome'] + [f"Valor{j}" for j in range(table.values)])
+        if column == 'Nome':
+            terms.append(f"{table.name}.Nome {rng.choice(('=', '<>'))} 'nome{rng.randrange(NAMES)}'")
+        else:
+            terms.append(f"{table.name}.{column} {rng.choice(OPERATORS)} {rng.randrange(VALUE_RANGE)}")
+
+    sql = f"SELECT {', '.join(select)} FROM {chosen[0][0]}"
+    for name, condition in chosen[1:]:
+        sql += f" JOIN {name} ON {condition}"
+    if terms:
+        sql += " WHERE " + ' AND '.join(terms)
+    return sql
+
+
+def make_queries(schema: Schema, count: int, joins: int, predicates: int, width: int,
+                 seed: int = 0) -> list:
+    """`count` consultas distintas (na medida do possível), reproduzíveis pela semente."""
+    rng = random.Random(seed)
+    return [make_query(schema, joins, predicates, width, rng) for _ in range(count)]
+
+
+@contextmanager
+def use_schema(schema: Schema, directory: str):
+    """
+    Instala `schema` (cujos dados estão em `directory`) como o esquema do
+    processo: METADADOS, chaves, estatísticas e índice dos metadados (o
+    cache de planos se invalida sozinho com a mudança). O estado original
+    volta na saída.
+    """
+    saved = (dict(metadados.METADADOS), dict(metadados.CHAVES_PRIMARIAS),
+             dict(metadados.CHAVES_ESTRANGEIRAS), dict(ESTATISTICAS.tables))
+    try:
+        # Substituição no próprio dicionário: os módulos importaram as referências
+        for target, value in zip((metadados.METADADOS, metadados.CHAVES_PRIMARIAS,
+                                  metadados.CHAVES_ESTRANGEIRAS),
+                                 (schema.metadata, schema.primary_keys, schema.foreign_keys)):
+            target.clear()
+            target.update(value)
+        ESTATISTICAS.tables = {}
+        ESTATISTICAS.refresh(directory)
+        reload_metadata_index()
+        yield schema
+    finally:
+        for target, value in zip((metadados.METADADOS, metadados.CHAVES_PRIMARIAS,
+                                  metadados.CHAVES_ESTRANGEIRAS, ESTATISTICAS.tables), saved):
+            target.clear()
+            target.update(value)
+        ESTATISTICAS.version += 1
+        reload_metadata_index()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos da aplicação são importados a partir de app/ (como em app/main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
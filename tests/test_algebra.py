@@ -0,0 +1,30 @@
+from utils.operators import Project, Scan, Select
+from utils.planner import build_plan
+
+
+def _base_projections(tree):
+    """Projeções aplicadas logo acima da seleção de uma tabela base."""
+    found = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Project) and isinstance(node.child, Select) and isinstance(node.child.child, Scan):
+            found.append(node)
+        stack.extend(node.children)
+    return found
+
+
+def test_no_projection_when_scan_already_reads_only_needed_columns():
+    # Pedido.ValorTotalPedido é filtrada e também projetada: nada a descartar após a seleção
+    plan = build_plan("SELECT Cliente.Nome, Pedido.idPedido, Pedido.ValorTotalPedido FROM Cliente "
+                      "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente "
+                      "WHERE Pedido.ValorTotalPedido = 0", with_graph=False)
+    assert not _base_projections(plan.optimized)
+
+
+def test_projection_drops_filter_only_columns():
+    plan = build_plan("SELECT Cliente.Nome, Pedido.idPedido FROM Cliente "
+                      "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente "
+                      "WHERE Cliente.TipoCliente_idTipoCliente = 1", with_graph=False)
+    [project] = _base_projections(plan.optimized)
+    assert [str(col) for col in project.columns] == ['Cliente.idCliente', 'Cliente.Nome']
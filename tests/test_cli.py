@@ -0,0 +1,38 @@
+import io
+import json
+from cli import iter_statements, run
+
+LOG = """
+SELECT Cliente.Nome FROM Cliente WHERE Cliente.Email = 'a;b@x.com';
+select Cliente.Nome  from Cliente where Cliente.Email = 'a;b@x.com';
+SELECT Pedido.idPedido, Status.Descricao FROM Pedido JOIN Status ON Pedido.Status_idStatus = Status.idStatus;
+SELECT Nada FROM Tabela;
+SELECT Produto.Nome FROM Produto WHERE Produto.Preco > 100
+"""
+
+
+def _run(workers):
+    out = io.StringIO()
+    statements = ((f"log:{n}", sql) for n, sql in enumerate(iter_statements(io.StringIO(LOG)), 1))
+    summary = run(statements, out, workers, chunk_size=1)
+    return summary, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_statements_split_outside_strings():
+    statements = list(iter_statements(io.StringIO(LOG)))
+    assert len(statements) == 5
+    assert statements[0].endswith("'a;b@x.com'")
+
+
+def test_run_with_process_pool():
+    summary, records = _run(workers=2)
+    assert summary == {'statements': 5, 'duplicates': 1, 'planned': 4, 'invalid': 1}
+    # Registros na ordem de entrada, com ids sequenciais das consultas únicas
+    assert [(r['id'], r['source'], r['valid']) for r in records] == [
+        (1, 'log:1', True), (2, 'log:3', True), (3, 'log:4', False), (4, 'log:5', True)]
+    assert 'Tabela inexistente: Tabela' in [error['message'] for error in records[2]['errors']]
+    assert records[1]['execution_plan'] and records[1]['estimated_rows'] > 0
+    serial = _run(workers=1)[1]
+    for record in records + serial:
+        del record['timings_ms']
+    assert records == serial
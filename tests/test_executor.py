@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from utils.executor import DATA_DIR, DataSource, execute
+from utils.planner import build_plan
+from utils.streaming import stream
+
+QUERIES = [
+    "SELECT Cliente.Nome, Pedido.idPedido, Status.Descricao FROM Cliente "
+    "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente "
+    "JOIN Status ON Pedido.Status_idStatus = Status.idStatus WHERE Pedido.ValorTotalPedido > 100",
+    "SELECT Produto.Nome, Categoria.Descricao, Pedido_has_Produto.Quantidade FROM Pedido_has_Produto "
+    "JOIN Produto ON Pedido_has_Produto.Produto_idProduto = Produto.idProduto "
+    "JOIN Categoria ON Produto.Categoria_idCategoria = Categoria.idCategoria "
+    "WHERE Categoria.idCategoria <> 2 AND Pedido_has_Produto.Quantidade >= 2",
+    "SELECT Cliente.Nome, Telefone.Numero FROM Cliente JOIN Telefone ON Cliente.idCliente = Telefone.Cliente_idCliente",
+    "SELECT Endereco.Cidade FROM Endereco WHERE Endereco.Cidade = 'Curitiba' OR Endereco.UF = 'SP'",
+]
+POSITIONS = (np.array([5, 99, 0, 5, 50, 51, 13, 14]), np.array([], dtype=np.int64))
+
+
+@pytest.fixture(params=['parquet', 'csv'])
+def source(request, tmp_path):
+    frame = pd.DataFrame({'idCliente': np.arange(100), 'Nome': [f"Cliente {i}" for i in range(100)]})
+    if request.param == 'parquet':
+        # Vários grupos de linhas, para que só parte deles seja lida
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                       tmp_path / 'Cliente.parquet', row_group_size=7)
+    else:
+        frame.to_csv(tmp_path / 'Cliente.csv', index=False)
+    return DataSource(str(tmp_path))
+
+
+@pytest.mark.parametrize('positions', POSITIONS)
+def test_rows_match_take_without_caching(source, positions):
+    rows = source.rows('Cliente', positions, ('Nome', 'idCliente'))
+    assert not source._cache['Cliente'][2].columns
+    expected = DataSource(source.data_dir).load('Cliente', ('Nome', 'idCliente')).take(positions)
+    assert list(rows.columns) == list(expected.columns) and len(rows) == len(positions)
+    for name, array in expected.columns.items():
+        assert rows.column(name).tolist() == array.tolist()
+
+
+def test_key_index_does_not_cache_the_column(source):
+    index = source.index('Cliente', 'idCliente', 'hash')
+    assert source.index('Cliente', 'idCliente', 'hash') is index
+    assert not source._cache['Cliente'][2].columns
+
+
+def test_iter_rows_in_batches(source):
+    positions = np.array([0, 3, 6, 7, 20, 21, 22, 23, 98, 99])
+    batches = list(source.iter_rows('Cliente', positions, 3, ('idCliente',)))
+    assert max(map(len, batches)) <= 3
+    assert [i for batch in batches for i in batch.column('Cliente.idCliente').tolist()] == positions.tolist()
+    assert not source._cache['Cliente'][2].columns
+
+
+def _sqlite(sql):
+    with sqlite3.connect(':memory:') as connection:
+        for name in os.listdir(DATA_DIR):
+            if name.endswith('.csv'):
+                pd.read_csv(os.path.join(DATA_DIR, name)).to_sql(name[:-4], connection)
+        return sorted(connection.execute(sql))
+
+
+@pytest.mark.parametrize('sql', QUERIES)
+def test_plans_match_sqlite(sql):
+    plan = build_plan(sql, with_graph=False)
+    assert plan.is_valid, plan.errors
+    expected = _sqlite(sql)
+    assert expected
+    for relation in (execute(plan.optimized, DataSource(), results=None).relation,
+                     stream(plan.optimized, DataSource(), batch_size=7, results=None).collect()):
+        assert sorted(zip(*(array.tolist() for array in relation.columns.values()))) == expected
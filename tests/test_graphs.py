@@ -0,0 +1,37 @@
+import pytest
+from utils.graphs import operator_graph, render_graph
+from utils.planner import build_plan
+
+SQL = ("SELECT Cliente.Nome, Pedido.idPedido FROM Cliente "
+       "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente WHERE Cliente.TipoCliente_idTipoCliente = 1")
+
+
+@pytest.fixture
+def tree():
+    return build_plan(SQL, with_graph=False).optimized
+
+
+def test_graph_layout(tree):
+    graph = operator_graph(tree)
+    root = graph.nodes[-1]
+    assert root.type == 'projection' and root.y == 0
+    leaves = [node for node in graph.nodes if not node.children]
+    assert {node.label for node in leaves} == {'Cliente', 'Pedido'}
+    assert sorted(node.x for node in leaves) == [0.0, 1.0]
+    # Cada nó fica abaixo do seu operador (arestas no sentido do fluxo dos dados)
+    for child, parent in graph.edges:
+        assert graph.nodes[child].y < graph.nodes[parent].y
+
+
+def test_renders_are_cached_per_plan(tree):
+    dot = render_graph(tree, 'dot')
+    assert dot.startswith('digraph plano {') and dot.count('->') == len(operator_graph(tree).edges)
+    assert render_graph(build_plan(SQL, with_graph=False).optimized, 'dot') is dot
+    assert operator_graph(tree) is operator_graph(tree)
+    with pytest.raises(ValueError):
+        render_graph(tree, 'gif')
+
+
+def test_svg_render(tree):
+    pytest.importorskip('matplotlib')
+    assert render_graph(tree, 'svg').lstrip().startswith(b'<?xml')
@@ -0,0 +1,103 @@
+import pytest
+from models.query.parser import QueryParser
+from utils.join_order import CostModel, JoinEnumerator
+from utils.operators import Product, Scan
+
+GRAPHS = {
+    'chain': [
+        "Produto.Categoria_idCategoria = Categoria.idCategoria",
+        "Pedido_has_Produto.Produto_idProduto = Produto.idProduto",
+        "Pedido_has_Produto.Pedido_idPedido = Pedido.idPedido",
+        "Pedido.Cliente_idCliente = Cliente.idCliente",
+    ],
+    'star': [
+        "Endereco.Cliente_idCliente = Cliente.idCliente",
+        "Telefone.Cliente_idCliente = Cliente.idCliente",
+        "Pedido.Cliente_idCliente = Cliente.idCliente",
+        "Cliente.TipoCliente_idTipoCliente = TipoCliente.idTipoCliente",
+    ],
+    'cycle': [
+        "Pedido.Cliente_idCliente = Cliente.idCliente",
+        "Pedido.Status_idStatus = Status.idStatus",
+        "Status.Descricao = Endereco.Cidade",
+        "Endereco.Cliente_idCliente = Cliente.idCliente",
+    ],
+}
+ROWS = {'Categoria': 10, 'Produto': 500, 'Pedido_has_Produto': 20000, 'Pedido': 5000, 'Cliente': 800,
+        'Endereco': 1200, 'Telefone': 1500, 'TipoCliente': 3, 'Status': 6}
+
+
+class SizedCostModel(CostModel):
+    """Heurísticas de CostModel com tamanhos de tabela diferentes."""
+
+    def base_rows(self, table: str) -> float:
+        return float(ROWS[table])
+
+
+def _enumerator(conditions, **options):
+    preds = [QueryParser.parse_predicate(text) for text in conditions]
+    tables = list(dict.fromkeys(ref.table for pred in preds for ref in (pred.left, pred.right)))
+    join_conditions = [(pred, frozenset((pred.left.table, pred.right.table))) for pred in preds]
+    return JoinEnumerator(tables, {t: Scan(t) for t in tables}, join_conditions, SizedCostModel(), **options)
+
+
+def _connected(enumerator, mask) -> bool:
+    reached = mask & -mask
+    while True:
+        grown = reached | (enumerator._neighbors(reached) & mask)
+        if grown == reached:
+            return reached == mask
+        reached = grown
+
+
+def _all_plans(enumerator, mask, linear):
+    """Todas as árvores sem produto cartesiano (nas duas orientações de cada junção)."""
+    if mask.bit_count() == 1:
+        yield enumerator._leaf(mask.bit_length() - 1)
+        return
+    sub = (mask - 1) & mask
+    while sub:
+        rest = mask & ~sub
+        if (_connected(enumerator, sub) and _connected(enumerator, rest)
+                and (not linear or min(sub.bit_count(), rest.bit_count()) == 1)):
+            for left in _all_plans(enumerator, sub, linear):
+                for right in _all_plans(enumerator, rest, linear):
+                    yield enumerator._join(left, right)
+        sub = (sub - 1) & mask
+
+
+def _nodes(tree):
+    yield tree
+    for child in tree.children:
+        yield from _nodes(child)
+
+
+@pytest.mark.parametrize('bushy', [True, False])
+@pytest.mark.parametrize('graph', GRAPHS)
+def test_dp_matches_exhaustive_enumeration(graph, bushy):
+    enumerator = _enumerator(GRAPHS[graph], bushy=bushy)
+    everything = (1 << len(enumerator.tables)) - 1
+    best = min(plan.cost for plan in _all_plans(enumerator, everything, not bushy))
+    assert enumerator._dp(everything).cost == pytest.approx(best)
+    assert enumerator.best_plan().cost == pytest.approx(best)
+
+
+@pytest.mark.parametrize('bushy', [True, False])
+@pytest.mark.parametrize('graph', GRAPHS)
+def test_greedy_above_dp_threshold(graph, bushy, monkeypatch):
+    enumerator = _enumerator(GRAPHS[graph], bushy=bushy, dp_threshold=2)
+
+    def no_dp(component):
+        raise AssertionError("acima do limite a ordem deve ser gulosa")
+    monkeypatch.setattr(enumerator, '_dp', no_dp)
+    plan = enumerator.best_plan()
+    assert sorted(plan.tree.tables()) == sorted(enumerator.tables)
+    assert not any(isinstance(node, Product) for node in _nodes(plan.tree))
+
+
+@pytest.mark.parametrize('bushy', [True, False])
+def test_greedy_disconnected_falls_back_to_product(bushy):
+    enumerator = _enumerator(GRAPHS['chain'][:1] + GRAPHS['chain'][3:], bushy=bushy)
+    plan = enumerator._greedy((1 << len(enumerator.tables)) - 1)
+    assert sorted(plan.tree.tables()) == sorted(enumerator.tables)
+    assert sum(isinstance(node, Product) for node in _nodes(plan.tree)) == 1
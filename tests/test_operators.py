@@ -0,0 +1,40 @@
+import pickle
+import pytest
+from models.query.parser import QueryParser
+from utils.algebra import sql_to_algebra
+from utils.operators import Project, Scan, Select, ThetaJoin, explain, output_columns
+
+SQL = ("SELECT Cliente.Nome, Pedido.idPedido FROM Cliente "
+       "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente WHERE Cliente.TipoCliente_idTipoCliente = 1")
+
+
+def test_nodes_are_hash_consed_and_immutable():
+    pred = QueryParser.parse_predicate("Cliente.idCliente = Pedido.Cliente_idCliente")
+    join = ThetaJoin(pred, Scan('Cliente'), Scan('Pedido'))
+    assert ThetaJoin(pred, Scan('Cliente'), Scan('Pedido')) is join
+    assert Scan('Cliente', ('Nome',)) is not Scan('Cliente')
+    assert join.children == (Scan('Cliente'), Scan('Pedido'))
+    with pytest.raises(AttributeError):
+        join.predicate = None
+    with pytest.raises(TypeError):
+        Select(pred)
+    # Desserializar reconstrói pelo construtor: continua o mesmo objeto
+    assert pickle.loads(pickle.dumps(join)) is join
+
+
+def test_sql_to_algebra_tree():
+    tree = sql_to_algebra(QueryParser.parse(SQL))
+    assert isinstance(tree, Project) and isinstance(tree.child, Select)
+    assert tree.child.child.tables() == ('Cliente', 'Pedido')
+    # A mesma consulta gera a mesma árvore (subárvores compartilhadas)
+    assert sql_to_algebra(QueryParser.parse(SQL)) is tree
+    assert str(tree) == ("π[Cliente.Nome, Pedido.idPedido](σ[Cliente.TipoCliente_idTipoCliente = 1]"
+                         "(Cliente ⨝[Cliente.idCliente = Pedido.Cliente_idCliente] Pedido))")
+    assert [str(col) for col in output_columns(tree)] == ['Cliente.Nome', 'Pedido.idPedido']
+    assert explain(tree) == [
+        "1. Ler tabela: Cliente",
+        "2. Ler tabela: Pedido",
+        "3. Executar junção (nested loop): Cliente.idCliente = Pedido.Cliente_idCliente",
+        "4. Aplicar filtro: Cliente.TipoCliente_idTipoCliente = 1",
+        "5. Projetar colunas: Cliente.Nome, Pedido.idPedido",
+    ]
@@ -0,0 +1,50 @@
+import pytest
+from models.query.lexer import SQLSyntaxError, scan, tokenize
+from models.query.parser import QueryParser, _RecursiveDescent
+
+QUERIES = [
+    "SELECT * FROM Cliente",
+    "select c.*, p.idPedido from Cliente c join Pedido AS p on c.idCliente=p.Cliente_idCliente;",
+    "SELECT Nome FROM Cliente WHERE Cliente . idCliente >= 007 and Nome <> 'D''Ávila' LIMIT 5",
+    "SELECT a.b FROM t INNER JOIN u ON a.b != -0 AND u.c < 1.50 WHERE x = \"dupla\" ;",
+    "SELECT a FROM t WHERE a = 1 OR (b = 2 AND (c = 3 AND d = 4))",
+]
+ERRORS = [
+    ("SELECT t.from FROM t", 9),
+    ("SELECT from.x FROM t", 7),
+    ("SELECT a FROM t.x", 15),
+    ("SELECT a FROM t WHERE a.b.c = 1", 25),
+    ("SELECT a FROM t LIMIT -1", 22),
+    ("SELECT a, FROM t", 10),
+    ("SELECT a FROM t;;", 16),
+]
+
+
+@pytest.mark.parametrize('sql', QUERIES)
+def test_qualified_tokens_give_same_tree(sql):
+    fine = _RecursiveDescent(scan(sql, qualified=False)).query()
+    assert QueryParser.parse(sql) == fine
+    assert [col.pos for col in QueryParser.parse(sql).select] == [col.pos for col in fine.select]
+
+
+@pytest.mark.parametrize('sql, pos', ERRORS)
+def test_errors_match_token_grammar(sql, pos):
+    with pytest.raises(SQLSyntaxError) as fine:
+        _RecursiveDescent(scan(sql, qualified=False)).query()
+    with pytest.raises(SQLSyntaxError) as error:
+        QueryParser.parse(sql)
+    assert (error.value.message, error.value.pos) == (fine.value.message, pos)
+    assert QueryParser.parse_sql(sql) == {'select': [], 'from': '', 'joins': [], 'where': ''}
+
+
+@pytest.mark.parametrize('sql, pos', [("SELECT a FROM t WHERE a = 'x", 26), ("SELECT a ! b", 9), ("SELECT @", 7)])
+def test_lexer_error_position(sql, pos):
+    with pytest.raises(SQLSyntaxError) as error:
+        tokenize(sql)
+    assert error.value.pos == pos
+
+
+def test_tokens():
+    assert [tuple(tok) for tok in tokenize("select T.a<>'x' ")] == [
+        ('KEYWORD', 'SELECT', 0), ('NAME', 'T', 7), ('.', '.', 8), ('NAME', 'a', 9),
+        ('OP', '<>', 10), ('STRING', "'x'", 12), ('EOF', '', 16)]
@@ -0,0 +1,50 @@
+import pytest
+from models.db import metadados
+from models.db.estatisticas import ESTATISTICAS
+from models.db.metadata_index import metadata_index, reload_metadata_index
+from utils.plan_cache import PlanCache, PlanEntry, normalize_sql
+from utils.planner import plan_query
+
+SQL = "SELECT Status.Descricao FROM Status"
+
+
+@pytest.fixture
+def schema():
+    saved = dict(metadados.METADADOS)
+    yield metadados.METADADOS
+    metadados.METADADOS.clear()
+    metadados.METADADOS.update(saved)
+    reload_metadata_index()
+
+
+def test_normalized_key():
+    assert normalize_sql("select  Status.Descricao\nfrom Status ;") == normalize_sql(SQL + ';')
+    assert normalize_sql("SELECT Status . Descricao FROM Status") == normalize_sql(SQL)
+
+
+def test_metadata_change_invalidates(schema):
+    cache = PlanCache()
+    entry = PlanEntry({}, True)
+    cache.put(SQL, entry)
+    assert cache.get(SQL) is entry
+
+    schema['Nova'] = ['idNova']
+    reload_metadata_index()
+    assert cache.get(SQL) is None
+    assert cache.stats()['invalidations'] == 1
+
+    cache.put(SQL, entry)
+    ESTATISTICAS.version += 1
+    assert cache.get(SQL) is None
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_invalidate_rebuilds_metadata_index(schema):
+    cache = PlanCache()
+    assert not plan_query("SELECT Nova.idNova FROM Nova", cache).is_valid
+
+    schema['Nova'] = ['idNova']
+    cache.invalidate()
+    assert metadata_index().table('NOVA') == 'Nova'
+    assert plan_query("SELECT Nova.idNova FROM Nova", cache).is_valid
+    assert cache.stats()['invalidations'] == 1
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from models.query.parser import QueryParser
+from utils.executor import DATA_DIR, Relation, execute
+from utils.planner import build_plan
+from utils.predicates import compare, compile_predicate
+
+
+def test_compare_null_never_matches():
+    values = np.array(['Apto 203', None, np.nan, 'Casa'], dtype=object)
+    assert compare('<>', values, 'Casa').tolist() == [True, False, False, False]
+    assert compare('!=', values, 'Casa').tolist() == [True, False, False, False]
+    assert compare('=', values, 'Casa').tolist() == [False, False, False, True]
+    numbers = np.array([1.0, np.nan, 3.0])
+    assert compare('<>', numbers, 3).tolist() == [True, False, False]
+    assert compare('<>', numbers, numbers[::-1]).tolist() == [True, False, True]
+
+
+@pytest.mark.parametrize('condition', [
+    "Endereco.Complemento <> 'Apto 203'",
+    "Endereco.Complemento = 'Apto 203'",
+    "Endereco.Complemento > 'Apto 1'",
+    "Endereco.Complemento <> 'Apto 203' OR Endereco.idEndereco = 1",
+])
+def test_nullable_column_matches_sqlite(condition):
+    sql = f"SELECT Endereco.idEndereco FROM Endereco WHERE {condition}"
+    plan = build_plan(sql, with_graph=False)
+    assert plan.is_valid, plan.errors
+    rows = execute(plan.optimized, results=None).relation.column('Endereco.idEndereco')
+
+    with sqlite3.connect(':memory:') as connection:
+        pd.read_csv(os.path.join(DATA_DIR, 'Endereco.csv')).to_sql('Endereco', connection)
+        expected = [row[0] for row in connection.execute(sql)]
+    assert sorted(rows.tolist()) == sorted(expected)
+
+
+def _relation(size=500):
+    rng = np.random.default_rng(1)
+    return Relation({
+        'Produto.Preco': rng.integers(0, 100, size).astype(float),
+        'Produto.QuantEstoque': rng.integers(0, 10, size),
+        'Produto.Nome': rng.choice(np.array(['a', 'b', 'c', None], dtype=object), size),
+    })
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ("Produto.Preco < 50 AND Produto.QuantEstoque = 3 AND Produto.Nome <> 'b'",
+     lambda f: (f.Preco < 50) & (f.QuantEstoque == 3) & f.Nome.notna() & (f.Nome != 'b')),
+    ("Produto.Preco >= 90 OR Produto.QuantEstoque <= 1 OR Produto.Nome = 'c'",
+     lambda f: (f.Preco >= 90) | (f.QuantEstoque <= 1) | (f.Nome == 'c')),
+    ("(Produto.Preco > 10 OR Produto.Nome = 'a') AND Produto.Preco < Produto.QuantEstoque",
+     lambda f: ((f.Preco > 10) | (f.Nome == 'a')) & (f.Preco < f.QuantEstoque)),
+])
+def test_compiled_predicate_matches_reference(condition, expected):
+    relation = _relation()
+    frame = pd.DataFrame({name.split('.')[1]: array for name, array in relation.columns.items()})
+    predicate = compile_predicate(QueryParser.parse_predicate(condition))
+    assert predicate(relation).tolist() == expected(frame).tolist()
+    # Só as linhas pedidas, alinhadas a elas
+    rows = np.arange(0, 500, 7)
+    assert predicate(relation, rows).tolist() == expected(frame).to_numpy()[rows].tolist()
+
+
+def test_constant_folding_and_memoization():
+    relation = _relation(10)
+    always = compile_predicate(QueryParser.parse_predicate("1 = 1 OR Produto.Preco > 3"))
+    never = compile_predicate(QueryParser.parse_predicate("Produto.Preco > 3 AND 'a' = 'b'"))
+    assert (always.constant, never.constant) == (True, False)
+    assert always(relation).all() and not never(relation, np.arange(4)).any()
+    # Termo neutro descartado: resta só a comparação
+    reduced = compile_predicate(QueryParser.parse_predicate("2 > 1 AND Produto.Preco > 3"))
+    assert str(reduced.source) == 'Produto.Preco > 3'
+    pred = QueryParser.parse_predicate("Produto.Preco > 3")
+    assert compile_predicate(pred) is compile_predicate(pred)
@@ -0,0 +1,59 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+import pytest
+from utils.profiling import BUCKETS, profile_request, record, serve_metrics, timed
+
+APP = os.path.join(os.path.dirname(__file__), '..', 'app')
+
+
+def test_serve_metrics_output():
+    record('etapa "teste"', 0.004)
+    record('etapa "teste"', 100.0)
+    with pytest.raises(KeyError), timed('etapa_com_erro'):
+        raise KeyError
+    host, port = serve_metrics(0).server_address
+
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.read().decode('utf-8')
+    assert '# TYPE query_stage_seconds histogram' in text
+    assert '# TYPE query_stage_errors_total counter' in text
+    assert 'query_stage_errors_total{stage="etapa_com_erro"} 1' in text
+
+    tag = 'stage="etapa \\"teste\\""'
+    buckets = re.findall(rf'^query_stage_seconds_bucket{{{re.escape(tag)},le="([^"]+)"}} (\d+)$', text, re.M)
+    assert [le for le, _ in buckets] == [repr(b) for b in BUCKETS] + ['+Inf']
+    counts = [int(count) for _, count in buckets]
+    # Buckets acumulados: o último (+Inf) é a contagem total
+    assert counts == sorted(counts) and counts[0] == 0 and counts[-1] == 2
+    assert f'query_stage_seconds_count{{{tag}}} 2' in text
+    assert f'query_stage_seconds_sum{{{tag}}} 100.004' in text
+    assert text.endswith('\n')
+
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics.json") as response:
+        data = json.load(response)
+    entry = data['histograms']['query_stage_seconds']['etapa "teste"']
+    assert (entry['count'], entry['p50'], entry['p99']) == (2, 0.005, None)
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://{host}:{port}/outro")
+    assert serve_metrics(0) is serve_metrics(1)
+
+
+def test_profilers_imported_only_when_requested():
+    code = ("import sys\n"
+            "from utils.profiling import profile_request\n"
+            "with profile_request() as profile: pass\n"
+            "print(sorted({'cProfile', 'pstats', 'tracemalloc'} & set(sys.modules)))\n"
+            "with profile_request(cpu=True, memory=True) as profile: sum(range(1000))\n"
+            "print(bool(profile.cpu), profile.memory_peak is not None)\n")
+    output = subprocess.run([sys.executable, '-c', code], cwd=APP, capture_output=True, text=True, check=True)
+    assert output.stdout.splitlines() == ['[]', 'True True']
+
+    with profile_request() as profile:
+        record('parse', 0.5)
+    assert profile.stages == {'parse': 0.5} and profile.cpu == '' and profile.memory_peak is None
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from models.query.parser import QueryParser
+from utils.executor import DATA_DIR, DataSource, Relation, execute
+from utils.operators import Materialized, Scan, ThetaJoin
+from utils.planner import build_plan
+from utils.result_cache import ResultCache
+
+JOIN = ("SELECT Cliente.Nome, Pedido.idPedido, Pedido.ValorTotalPedido FROM Cliente "
+        "JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente WHERE Cliente.TipoCliente_idTipoCliente = 1")
+
+
+def _materialized(tree):
+    found, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Materialized):
+            found.append(node)
+        stack.extend(node.children)
+    return found
+
+
+def _rows(result):
+    return sorted(result.relation.to_pandas().itertuples(index=False))
+
+
+def test_subsumed_queries_reuse_the_join():
+    source, cache = DataSource(DATA_DIR), ResultCache()
+    first = build_plan(JOIN, with_graph=False).optimized
+    execute(first, source, cache)
+    assert cache.stats()['stores'] >= 1
+
+    # Mesma junção com um filtro a mais: a entrada serve, com o filtro residual por cima
+    narrower = build_plan(JOIN + " AND Pedido.ValorTotalPedido > 100", with_graph=False).optimized
+    result = execute(narrower, source, cache)
+    [node] = _materialized(result.tree)
+    assert str(node.residual) == 'Pedido.ValorTotalPedido > 100'
+    assert _rows(result) == _rows(execute(narrower, source, None))
+    assert cache.hits == 1
+
+    # Sem o filtro da entrada a junção não está contida nela: nada é reaproveitado
+    wider = build_plan(JOIN.split(' WHERE ')[0], with_graph=False).optimized
+    assert not _materialized(execute(wider, source, cache).tree)
+    assert cache.misses == 2
+
+
+def _join(value):
+    pred = QueryParser.parse_predicate(f"Cliente.idCliente = Pedido.Cliente_idCliente AND Pedido.idPedido > {value}")
+    return ThetaJoin(pred, Scan('Cliente', ('idCliente',)), Scan('Pedido', ('idPedido', 'Cliente_idCliente')))
+
+
+def _relation(rows):
+    names = ('Cliente.idCliente', 'Pedido.idPedido', 'Pedido.Cliente_idCliente')
+    return Relation({name: np.arange(rows) for name in names}, rows)
+
+
+def test_greedy_dual_size_eviction():
+    source = DataSource(DATA_DIR)
+    relation = _relation(50)    # 1200 bytes em Arrow
+    cache = ResultCache(max_bytes=5000)
+    versions = cache.versions(_join(0), source)
+
+    def store(value, cost):
+        cache.store(_join(value), relation, cost, versions, source)
+        return cache.match(_join(value), source).key
+
+    expensive = store(1, 1.0)
+    cheap = store(2, 0.01)
+    for value in (3, 4, 5):
+        store(value, 1.0)
+    # 5 x 1200 bytes não cabem: sai a entrada barata, e o relógio avança até ela
+    assert cache.stats()['evictions'] == 1 and cache.stats()['bytes'] == 4800
+    assert cheap not in cache._entries
+    assert cache._clock == pytest.approx(0.01 / 1200)
+
+    # O uso renova a prioridade: a próxima vítima é a entrada mais antiga sem uso
+    assert cache.load(expensive, source) is not None
+    store(6, 1.0)
+    assert cache.match(_join(3), source) is None
+    assert cache.match(_join(1), source).key == expensive
+    assert cache.stats()['evictions'] == 2
+
+    # Resultados maiores que 1/4 do orçamento não entram
+    cache.store(_join(7), _relation(100), 1.0, versions, source)
+    assert cache.match(_join(7), source) is None
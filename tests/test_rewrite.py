@@ -0,0 +1,51 @@
+import pytest
+from models.query.parser import QueryParser
+from utils.executor import execute
+from utils.operators import Empty
+from utils.planner import build_plan
+from utils.rewrite import rewrite_conjuncts
+
+
+def _rewrite(*conditions):
+    result = rewrite_conjuncts([QueryParser.parse_predicate(text) for text in conditions])
+    return result if result is None else [str(term) for term in result]
+
+
+@pytest.mark.parametrize('conditions', [
+    ("Cliente.idCliente = 1", "Cliente.idCliente = 2"),
+    ("Cliente.idCliente > 5", "Cliente.idCliente < 3"),
+    ("Cliente.idCliente > 5", "Cliente.idCliente <= 5"),
+    ("1 = 2",),
+    # Contradições vistas só através da classe de equivalência
+    ("Cliente.idCliente = Pedido.Cliente_idCliente", "Cliente.idCliente = 3", "Pedido.Cliente_idCliente > 4"),
+    ("Cliente.idCliente = 3", "Cliente.idCliente = Pedido.Cliente_idCliente", "Pedido.Cliente_idCliente <> 3"),
+    # Nenhum termo da disjunção é possível com a constante conhecida
+    ("Cliente.idCliente = 3", "Cliente.idCliente > 4 OR Cliente.idCliente < 1"),
+])
+def test_contradictions_return_none(conditions):
+    assert _rewrite(*conditions) is None
+
+
+def test_trivial_and_folded_conditions():
+    assert _rewrite("2 > 1") == []
+    assert _rewrite("5 < Cliente.idCliente", "Cliente.idCliente >= 7") == ["Cliente.idCliente >= 7"]
+    # Ramo falso da disjunção some; o outro vira termo simples
+    assert _rewrite("Cliente.idCliente = 3", "Cliente.idCliente > 4 OR Cliente.Nome = 'A'") == [
+        "Cliente.idCliente = 3", "Cliente.Nome = 'A'"]
+
+
+def test_transitive_constant_propagation():
+    assert _rewrite("Cliente.idCliente = 5", "Cliente.idCliente = Pedido.Cliente_idCliente") == [
+        "Cliente.idCliente = 5", "Pedido.Cliente_idCliente = 5", "Cliente.idCliente = Pedido.Cliente_idCliente"]
+    # Faixas atravessam a cadeia a = b = c; a igualdade implicada a = c não vira junção nova
+    assert _rewrite("A.x = B.y", "B.y = C.z", "C.z > 3", "A.x <= 10", "A.x > 5") == [
+        "A.x = B.y", "B.y = C.z",
+        "A.x > 5", "A.x <= 10", "B.y > 5", "B.y <= 10", "C.z > 5", "C.z <= 10"]
+
+
+def test_contradiction_yields_empty_plan():
+    plan = build_plan("SELECT Cliente.Nome FROM Cliente JOIN Pedido ON Cliente.idCliente = Pedido.Cliente_idCliente "
+                      "WHERE Cliente.idCliente = 1 AND Pedido.Cliente_idCliente = 2", with_graph=False)
+    assert isinstance(plan.optimized, Empty)
+    result = execute(plan.optimized).relation
+    assert result.num_rows == 0 and list(result.columns) == ['Cliente.Nome']
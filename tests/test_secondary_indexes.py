@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+from models.query.parser import QueryParser
+from utils.executor import DataSource, index_scan
+from utils.operators import IndexScan
+
+PREDICATE = QueryParser.parse_predicate("Produto.Preco >= 20 AND Produto.Preco < 60")
+
+
+def _write(path, prices, first=1, mode='w'):
+    frame = pd.DataFrame({'idProduto': range(first, first + len(prices)), 'Preco': prices})
+    frame.to_csv(path, mode=mode, header=mode == 'w', index=False)
+
+
+def _expected(path):
+    frame = pd.read_csv(path)
+    return sorted(frame.index[(frame.Preco >= 20) & (frame.Preco < 60)])
+
+
+@pytest.fixture
+def source(tmp_path):
+    _write(tmp_path / 'Produto.csv', [50.0, 10.0, 20.0, 75.5, 59.9, 20.0])
+    return DataSource(str(tmp_path))
+
+
+def test_search_and_index_scan(source):
+    assert source.secondary.search('Produto', 'Preco', PREDICATE).tolist() == _expected(source.path('Produto'))
+    node = IndexScan('Produto', 'Preco', 'sorted', PREDICATE, ('idProduto', 'Preco'))
+    assert index_scan(node, source).column('Produto.idProduto').tolist() == [1, 3, 5, 6]
+    # Nem a coluna lida para construir o índice nem as linhas do scan ficam em cache
+    assert not source._cache['Produto'][2].columns
+
+
+def test_append_merges_new_rows(source, monkeypatch):
+    path = source.path('Produto')
+    source.secondary.search('Produto', 'Preco', PREDICATE)
+    _write(path, [30.0, 5.0, 59.0], first=7, mode='a')
+
+    def full_read(*args, **kwargs):
+        raise AssertionError("append não deveria reler a tabela")
+    monkeypatch.setattr(source, 'column', full_read)
+    assert source.secondary.search('Produto', 'Preco', PREDICATE).tolist() == _expected(path)
+    assert source.secondary._manifest()['Produto.Preco']['rows'] == 9
+
+
+def test_rewrite_rebuilds_index(source):
+    path = source.path('Produto')
+    source.secondary.search('Produto', 'Preco', PREDICATE)
+    _write(path, [25.0, 100.0])
+    assert source.secondary.search('Produto', 'Preco', PREDICATE).tolist() == _expected(path)
+    assert source.secondary._manifest()['Produto.Preco']['rows'] == 2
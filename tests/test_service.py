@@ -0,0 +1,131 @@
+import threading
+import time
+import tracemalloc
+import pytest
+from utils.plan_cache import PlanCache
+from utils.service import QueryCancelled, QueryService
+
+QUERIES = (
+    "SELECT Cliente.Nome FROM Cliente WHERE Cliente.TipoCliente_idTipoCliente = 1",
+    "SELECT Pedido.idPedido FROM Pedido WHERE Pedido.ValorTotalPedido = 0",
+    "SELECT Status.Descricao FROM Status",
+)
+
+
+class RecordingService(QueryService):
+    """Registra o intervalo de execução de cada consulta."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.intervals = []
+        self._intervals_lock = threading.Lock()
+
+    def _run(self, job):
+        start = time.perf_counter()
+        # Dá tempo para outro worker começar junto, se o serviço deixar
+        time.sleep(0.05)
+        try:
+            return super()._run(job)
+        finally:
+            with self._intervals_lock:
+                self.intervals.append((job.options.profiled, start, time.perf_counter()))
+
+
+def test_profiled_jobs_run_alone():
+    service = RecordingService(workers=3, queue_size=8, plan_cache=PlanCache())
+    try:
+        jobs = [
+            service.submit(QUERIES[0], memory=True),
+            service.submit(QUERIES[1], cpu=True, memory=True),
+            service.submit(QUERIES[2]),
+        ]
+        results = [job.result(timeout=30) for job in jobs]
+    finally:
+        service.shutdown()
+
+    assert not tracemalloc.is_tracing()
+    for result in results[:2]:
+        assert result.profile.memory_peak is not None
+        assert result.profile.allocations
+    assert results[1].profile.cpu
+    assert results[2].profile.memory_peak is None
+
+    for profiled, start, end in service.intervals:
+        if not profiled:
+            continue
+        overlapping = [other for other in service.intervals
+                       if other[1] != start and other[1] < end and start < other[2]]
+        assert not overlapping
+
+
+class GatedService(QueryService):
+    """Segura cada consulta no início da execução até `gate` ser liberado."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = threading.Event()
+
+    def _run(self, job):
+        self.gate.wait(30)
+        return super()._run(job)
+
+
+def test_identical_queries_run_once():
+    service = GatedService(workers=1, queue_size=4, plan_cache=PlanCache())
+    try:
+        first = service.submit(QUERIES[2], session='a')
+        # Mesma forma normalizada: junta-se à consulta em andamento
+        second = service.submit("select Status.Descricao\n  from Status ;", session='b')
+        other = service.submit(QUERIES[1], session='c')
+        assert second is first and other is not first
+        service.gate.set()
+        assert (first.result(timeout=30).rows, other.result(timeout=30).rows) == (5, 11)
+    finally:
+        service.shutdown()
+    assert (service.submitted, service.deduplicated, service.completed) == (3, 1, 2)
+
+
+def test_resubmission_cancels_previous_query():
+    service = GatedService(workers=1, queue_size=4, plan_cache=PlanCache())
+    try:
+        running = service.submit(QUERIES[0], session='a')
+        while running.state == 'queued':
+            time.sleep(0.01)
+        queued = service.submit(QUERIES[1], session='b')
+        shared = service.submit(QUERIES[1], session='c')
+        # Reenvio da sessão: a consulta em execução é interrompida e a da fila,
+        # ainda esperada pela sessão c, continua
+        latest = service.submit(QUERIES[2], session='a')
+        service.cancel('b')
+        assert queued is shared and not queued.cancelled
+        service.gate.set()
+        with pytest.raises(QueryCancelled):
+            running.result(timeout=30)
+        assert shared.result(timeout=30).rows and latest.result(timeout=30).rows == 5
+
+        service.gate.clear()
+        waiting = service.submit(QUERIES[0], session='d')
+        while waiting.state == 'queued':
+            time.sleep(0.01)
+        dropped = service.submit(QUERIES[1], session='e')
+        service.cancel('e')
+        # Cancelada ainda na fila: termina sem executar
+        assert dropped.state == 'cancelled'
+        with pytest.raises(QueryCancelled):
+            dropped.result(timeout=0)
+        service.gate.set()
+        waiting.result(timeout=30)
+    finally:
+        service.shutdown()
+    assert service.cancelled == 2
+
+
+def test_streamed_batches_are_kept_on_the_job():
+    service = QueryService(workers=1, queue_size=1, plan_cache=PlanCache(), batch_size=8)
+    try:
+        job = service.submit("SELECT Pedido.idPedido FROM Pedido", max_rows=20)
+        result = job.result(timeout=30)
+    finally:
+        service.shutdown()
+    assert [len(batch) for batch in job.batches] == [8, 8, 4]
+    assert (len(result.relation), result.rows, result.truncated) == (20, job.rows, True)
@@ -0,0 +1,48 @@
+import os
+import pytest
+from models.db.estatisticas import ColumnStats, StatisticsCatalog
+from models.query.parser import QueryParser
+
+VALUES = [str(i) for i in range(1, 101)] + ['7'] * 20 + [''] * 10
+
+
+def _fallback(pred):
+    return -1.0
+
+
+def test_column_stats():
+    stats = ColumnStats.analyze(VALUES)
+    assert (stats.distinct, stats.min, stats.max) == (100, 1, 100)
+    assert stats.null_frac == pytest.approx(10 / 130)
+    assert stats.mcv == [(7, pytest.approx(21 / 130))]
+    assert stats.eq_selectivity(7) == pytest.approx(21 / 130)
+    assert stats.eq_selectivity(500) == 0.0
+    assert stats.eq_selectivity(8) == pytest.approx((1 - 10 / 130 - 21 / 130) / 99)
+    assert stats.range_selectivity('<=', 50) == pytest.approx(70 / 130, abs=0.05)
+
+
+def test_selectivity_and_incremental_refresh(tmp_path):
+    path = tmp_path / 'Status.csv'
+    path.write_text('idStatus,Descricao\n' + ''.join(f'{i},S{i % 4}\n' for i in range(1, 41)), encoding='utf-8')
+    catalog = StatisticsCatalog()
+    assert catalog.refresh(str(tmp_path)) == ['Status']
+    assert catalog.refresh(str(tmp_path)) == []
+    assert (catalog.row_count('STATUS'), catalog.version) == (40, 1)
+
+    def estimate(text):
+        return catalog.selectivity(QueryParser.parse_predicate(text), _fallback)
+    assert estimate("Status.Descricao = 'S1'") == pytest.approx(0.25)
+    assert estimate("Status.idStatus > 30") == pytest.approx(0.25, abs=0.05)
+    assert estimate("Status.Descricao = 'S1' OR 10 >= Status.idStatus") == pytest.approx(
+        0.25 + 0.25 - 0.25 * 0.25, abs=0.05)
+    # Sem estatísticas da coluna: usa o fallback
+    assert estimate("Status.Outra = 1") == -1.0
+
+    path.write_text('idStatus,Descricao\n1,S0\n', encoding='utf-8')
+    os.utime(path, (0, 0))
+    assert catalog.refresh(str(tmp_path)) == ['Status']
+    assert (catalog.row_count('Status'), catalog.version) == (1, 2)
+
+    catalog.save(str(tmp_path / 'estatisticas.json'))
+    loaded = StatisticsCatalog.load(str(tmp_path / 'estatisticas.json'))
+    assert loaded.table('Status').to_dict() == catalog.table('Status').to_dict()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from models.query.ast import ColumnRef
+from models.query.parser import QueryParser
+from utils.executor import DataSource, execute
+from utils.operators import HashJoin, IndexNestedLoopJoin, IndexScan, Scan
+from utils.streaming import stream
+
+JOIN = QueryParser.parse_predicate("Pedido.Cliente_idCliente = Cliente.idCliente")
+
+
+@pytest.fixture
+def source(tmp_path):
+    rng = np.random.default_rng(0)
+    ids = np.arange(1, 2001)
+    pd.DataFrame({'idCliente': ids, 'Nome': [f"Cliente {i}" for i in ids]}).to_csv(
+        tmp_path / 'Cliente.csv', index=False)
+    # Parte dos pedidos aponta para clientes inexistentes
+    pd.DataFrame({'idPedido': np.arange(1, 10001), 'Cliente_idCliente': rng.integers(1, 2101, 10000)}).to_csv(
+        tmp_path / 'Pedido.csv', index=False)
+    pd.DataFrame({'idProduto': np.arange(1, 5001), 'Preco': rng.integers(0, 1000, 5000) / 10}).to_csv(
+        tmp_path / 'Produto.csv', index=False)
+    return DataSource(str(tmp_path))
+
+
+def _rows(relation):
+    names = sorted(relation.columns)
+    return sorted(zip(*(relation.column(name).tolist() for name in names)))
+
+
+def test_grace_hash_join_matches_in_memory(source):
+    tree = HashJoin(JOIN, Scan('Pedido'), Scan('Cliente'), 'right')
+    expected = execute(tree, DataSource(source.data_dir), results=None).relation
+    pipeline = stream(tree, source, batch_size=256, memory_budget=4096, results=None)
+    result = pipeline.collect()
+    assert sum(operator.spilled_rows for operator in pipeline.stats()) > 0
+    assert pipeline.budget.used == 0
+    assert _rows(result) == _rows(expected)
+
+
+def test_index_operators_bypass_source_cache(source):
+    inlj = IndexNestedLoopJoin(JOIN, Scan('Pedido'), Scan('Cliente', ('idCliente', 'Nome')),
+                               ColumnRef('Cliente', 'idCliente'), 'hash')
+    pipeline = stream(inlj, source, batch_size=512, results=None)
+    result = pipeline.collect()
+    assert _rows(result) == _rows(execute(inlj, DataSource(source.data_dir), results=None).relation)
+    # O índice de chave conta no orçamento enquanto a junção roda
+    assert pipeline.budget.peak >= source.index('Cliente', 'idCliente', 'hash').nbytes > 0
+    assert pipeline.budget.used == 0
+
+    predicate = QueryParser.parse_predicate("Produto.Preco >= 10 AND Produto.Preco < 12.5")
+    scan = IndexScan('Produto', 'Preco', 'sorted', predicate, ('idProduto', 'Preco'))
+    batches = list(stream(scan, source, batch_size=16, results=None))
+    assert max(map(len, batches)) <= 16
+    frame = pd.read_csv(source.path('Produto'))
+    expected = frame.idProduto[(frame.Preco >= 10) & (frame.Preco < 12.5)].tolist()
+    assert [i for batch in batches for i in batch.column('Produto.idProduto').tolist()] == expected
+
+    # Só as colunas usadas para construir índices foram lidas, e nenhuma ficou em cache
+    assert not any(entry[2].columns for entry in source._cache.values())
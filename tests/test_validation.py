@@ -0,0 +1,19 @@
+import pytest
+from utils.planner import build_plan
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT c1.Nome FROM Cliente c1 JOIN Cliente c2 ON c1.idCliente = c2.idCliente",
+    "SELECT Cliente.Nome FROM Cliente JOIN Cliente ON Cliente.idCliente = Cliente.idCliente",
+])
+def test_self_join_is_rejected(sql):
+    plan = build_plan(sql, with_graph=False)
+    assert not plan.is_valid
+    assert [error.pos for error in plan.errors] == [sql.index('JOIN Cliente') + len('JOIN ')]
+    assert 'Tabela repetida: Cliente' in str(plan.errors[0])
+
+
+def test_distinct_tables_still_valid():
+    plan = build_plan("SELECT c.Nome FROM Cliente c JOIN Pedido p ON c.idCliente = p.Cliente_idCliente",
+                      with_graph=False)
+    assert plan.is_valid, plan.errors